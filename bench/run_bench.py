@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Host pipeline performance benchmarks.
+
+Measures ops/s and p50/p99/p999 latency of the hot paths, writes JSON and
+compares against a stored baseline. Exit status is 1 on a regression.
+
+    python3 bench/run_bench.py                      # run + compare to baseline
+    python3 bench/run_bench.py --save-baseline      # refresh bench/baseline.json
+    python3 bench/run_bench.py --only siphash24 --json out.json
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "policy"))
+sys.path.append(os.path.join(ROOT, "scripts"))
+
+from compiler import compile_policy, compile_policy_cached
+from chacha20 import chacha20_encrypt
+from siphash import siphash24
+from frame_codec import FrameEncoder, Packet
+from run_demo import SimulatedFirmware, CHACHA_KEY
+
+MAC_KEY = struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+POLICY_PATH = os.path.join(ROOT, "policy", "policy.dsl")
+
+
+def write_large_policy(path, rules):
+    # Same rule shapes as policy.dsl, all within compiler BOUNDS
+    with open(path, "w") as f:
+        for i in range(rules):
+            f.write(f"IF intent == {10 + i} AND conf >= {(i * 97) % 30000}\n")
+            if i % 3 == 0:
+                f.write("REQUIRE_PREV 1\n")
+            f.write(f"ACT {2 + i % 2} {(i % 61) - 30}\n\n")
+        f.write("DEFAULT DENY\n")
+
+
+# Each case takes the --scale factor and returns (callable, iterations);
+# the callable performs one op.
+
+def scaled(iterations, scale):
+    return max(10, int(iterations * scale))
+
+
+def calls(iterations):
+    # Ops run_case() performs: warm-up plus timed iterations
+    return iterations + max(1, iterations // 10)
+
+
+def case_chacha20_encrypt(scale):
+    data = bytes(range(40))
+    seq = iter(range(1, 1 << 62))
+    return lambda: chacha20_encrypt(data, CHACHA_KEY, next(seq), 0), scaled(5000, scale)
+
+
+def case_siphash24(scale):
+    data = bytes(range(56))
+    return lambda: siphash24(MAC_KEY, data), scaled(20000, scale)
+
+
+def case_frame_build(scale):
+    encoder = FrameEncoder(MAC_KEY, CHACHA_KEY)
+    seq = iter(range(1, 1 << 32))
+    return lambda: encoder.encode(next(seq), 0, 2, 30000, (30,)), scaled(5000, scale)
+
+
+def _frames(firmware, count):
+    # Fresh, in-order frames, encoded outside the timed op
+    encoder = FrameEncoder(firmware.MAC_KEY, CHACHA_KEY)
+    return [bytes(encoder.encode(s, s * 20, 5, 32767, (1,))[2:]) for s in range(1, count + 1)]
+
+
+def case_process_packet(scale):
+    # Legacy path: the same frames as process_frame, pre-unpacked into fields
+    firmware = SimulatedFirmware()
+    iterations = scaled(3000, scale)
+    pkts = [list(struct.unpack("<IHHIIHH18hQ", f)) for f in _frames(firmware, calls(iterations))]
+    it = iter(pkts)
+    return lambda: firmware.process_packet(next(it)), iterations
+
+
+def case_process_frame(scale):
+    firmware = SimulatedFirmware()
+    iterations = scaled(3000, scale)
+    it = iter(_frames(firmware, calls(iterations)))
+    return lambda: firmware.process_frame(next(it)), iterations
+
+
+def case_process_frames_1k(scale):
+    # One op = a 1000-frame replay batch
+    firmware = SimulatedFirmware()
+    iterations = scaled(40, scale)
+    frames = _frames(firmware, 1000 * calls(iterations))
+    it = iter([b"".join(frames[i : i + 1000]) for i in range(0, len(frames), 1000)])
+    return lambda: firmware.process_frames(next(it)), iterations
+
+
+def case_decision_vm(scale):
+    firmware = SimulatedFirmware()
+    p = Packet()
+    p.intent_id, p.conf_q15 = 3, 20000
+    return lambda: firmware.decision_vm(p), scaled(20000, scale)
+
+
+def case_compile_policy_small(scale):
+    return lambda: compile_policy(POLICY_PATH), scaled(3000, scale)
+
+
+def _large_policy_file():
+    fd, path = tempfile.mkstemp(suffix=".dsl")
+    os.close(fd)
+    atexit.register(os.remove, path)
+    write_large_policy(path, 5000)
+    return path
+
+
+def case_compile_policy_large(scale):
+    path = _large_policy_file()
+    return lambda: compile_policy(path), scaled(30, scale)
+
+
+def case_compile_policy_cached(scale):
+    path = _large_policy_file()
+    cache_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, cache_dir, True)
+    return lambda: compile_policy_cached(path, cache_dir), scaled(3000, scale)
+
+
+CASES = {
+    "chacha20_encrypt": case_chacha20_encrypt,
+    "siphash24": case_siphash24,
+    "frame_build": case_frame_build,
+    "process_packet": case_process_packet,
+    "process_frame": case_process_frame,
+    "process_frames_1k": case_process_frames_1k,
+    "decision_vm": case_decision_vm,
+    "compile_policy_small": case_compile_policy_small,
+    "compile_policy_large": case_compile_policy_large,
+    "compile_policy_cached": case_compile_policy_cached,
+}
+
+
+def percentile(sorted_ns, q):
+    idx = min(len(sorted_ns) - 1, int(q * len(sorted_ns)))
+    return sorted_ns[idx]
+
+
+def run_case(name, scale=1.0):
+    op, iterations = CASES[name](scale)
+    samples = [0] * iterations
+    clock = time.perf_counter_ns
+
+    for _ in range(max(1, iterations // 10)):
+        op()
+    start = clock()
+    for i in range(iterations):
+        t0 = clock()
+        op()
+        samples[i] = clock() - t0
+    total = clock() - start
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_s": iterations / (total / 1e9),
+        "p50_us": percentile(samples, 0.50) / 1e3,
+        "p99_us": percentile(samples, 0.99) / 1e3,
+        "p999_us": percentile(samples, 0.999) / 1e3,
+        "max_us": samples[-1] / 1e3,
+    }
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if cur["ops_per_s"] < base["ops_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{name}: ops/s {cur['ops_per_s']:.0f} < baseline {base['ops_per_s']:.0f}"
+            )
+        if cur["p99_us"] > base["p99_us"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p99 {cur['p99_us']:.1f} us > baseline {base['p99_us']:.1f} us"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boreal host pipeline benchmarks")
+    parser.add_argument("--only", nargs="*", choices=sorted(CASES), help="cases to run")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25,
+        help="allowed relative slowdown before flagging a regression",
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="iteration multiplier")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or CASES:
+        r = run_case(name, args.scale)
+        results[name] = r
+        print(
+            f"{name:<22} {r['ops_per_s']:>12.0f} ops/s  p50 {r['p50_us']:>9.1f} us  "
+            f"p99 {r['p99_us']:>9.1f} us  p999 {r['p999_us']:>9.1f} us"
+        )
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": int(time.time()),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
 // SHA256: 5d44d75d7204afacd21b29f89185959cc0b48dab6e1137a01d4f05cf7faf558c
+// Layout: linear
 const uint8_t POLICY_BC[] = {0x1, 0x5, 0x0, 0x0, 0x0, 0x2, 0x1, 0x1, 0x0, 0x1, 0x2, 0x0, 0x20, 0x4e, 0x4, 0x1, 0x2, 0x2, 0x1e, 0x0, 0x1, 0x3, 0x0, 0x98, 0x3a, 0x2, 0x3, 0xf1, 0xff, 0x3, 0xff};
 const size_t POLICY_LEN = 31;
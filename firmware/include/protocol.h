@@ -18,11 +18,61 @@ typedef struct {
 } pkt_t;
 #pragma pack(pop)
 
+// pkt_t.version selects the layout of the encrypted body (offsets 16..56):
+// 1 = one intent (intent_id, conf_q15, aux[18]), 2 = pkt_batch_t records
+#define PKT_VERSION_SINGLE 1
+#define PKT_VERSION_BATCH 2
+#define BATCH_MAX_RECORDS 9
+
+#pragma pack(push, 1)
+// Actuator values come from the policy's ACT, so a record carries no value
+typedef struct {
+  uint16_t intent_id;
+  uint16_t conf_q15;
+} intent_rec_t;
+
+// Same header, nonce, MAC and 64-byte size as pkt_t; records are evaluated
+// in order, each through decision_vm() and gate_allow()
+typedef struct {
+  uint32_t magic;
+  uint16_t version; // PKT_VERSION_BATCH
+  uint16_t model_id;
+  uint32_t seq;
+  uint32_t t_ms;
+  uint8_t count; // records in use, <= BATCH_MAX_RECORDS
+  uint8_t reserved;
+  intent_rec_t rec[BATCH_MAX_RECORDS];
+  uint16_t pad;
+  uint64_t mac;
+} pkt_batch_t;
+#pragma pack(pop)
+
+_Static_assert(sizeof(pkt_t) == 64, "pkt_t must fill one SPI frame");
+_Static_assert(sizeof(pkt_batch_t) == sizeof(pkt_t), "batch layout must match pkt_t");
+
 typedef struct {
   uint8_t act;
   int16_t v0;
 } action_t;
 
+// Anti-replay window: frames up to REPLAY_WINDOW behind the newest accepted
+// seq are still accepted once each (override with -DREPLAY_WINDOW=N)
+#ifndef REPLAY_WINDOW
+#define REPLAY_WINDOW 64
+#endif
+#define REPLAY_WORDS ((REPLAY_WINDOW + 31) / 32 + 1)
+
+typedef struct {
+  uint32_t top; // highest accepted seq
+  uint32_t bitmap[REPLAY_WORDS];
+  uint32_t advances;
+  uint32_t duplicates;
+  uint32_t too_old;
+} replay_window_t;
+
+void replay_init(replay_window_t *w);
+int replay_accept(replay_window_t *w, uint32_t seq);
+
 uint64_t siphash24(const uint8_t *in, size_t inlen, const uint64_t k[2]);
 void chacha20_encrypt(uint8_t *data, size_t len, const uint32_t key[8],
                       uint64_t nonce, uint32_t counter);
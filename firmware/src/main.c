@@ -26,7 +26,7 @@ const uint32_t CHACHA_KEY[8] = {0x01020304, 0x05060708, 0x090a0b0c, 0x0d0e0f10,
 #define Q_SIZE 8
 volatile pkt_t RX_Q[Q_SIZE];
 volatile uint8_t q_w = 0, q_r = 0;
-uint32_t last_seq = 0;
+replay_window_t replay;
 
 // ==========================================
 // CORE 1: Insecure IO & SPI Polling
@@ -49,6 +49,22 @@ void core1_main(void) {
 // ==========================================
 // CORE 0: Hard Real-Time Deterministic VM
 // ==========================================
+static void execute_intent(const pkt_t *p) {
+  // 3. VM Policy & Software Gate
+  action_t act = decision_vm(p);
+  if (gate_allow(&act, p)) {
+    // 4. Actuate
+    if (act.act == 1) {
+      hw_gpio_set(act.act, act.v0); // Brake via GPIO
+    } else if (act.act >= 2) {
+      motor_control_execute_action(&act); // Motor control for move/turn
+    }
+
+    // 5. Strobe the RTL Watchdog
+    hw_strobe_hardware_watchdog_pin();
+  }
+}
+
 int main(void) {
   hw_multicore_launch_core1(core1_main);
 
@@ -56,6 +72,7 @@ int main(void) {
   hw_irq_disable_all_core0();
 
   motor_control_init();
+  replay_init(&replay);
 
   while (1) {
     if (q_r != q_w) {
@@ -70,23 +87,23 @@ int main(void) {
       // Offset 16 = intent_id, conf_q15, aux[18]. Total 40 bytes.
       chacha20_encrypt(((uint8_t *)&p) + 16, 40, CHACHA_KEY, p.seq, 0);
 
-      // 2. Anti-Replay
-      if (p.magic != MAGIC_WORD || p.seq <= last_seq)
+      // 2. Anti-Replay (sliding window, tolerates reordered frames)
+      if (p.magic != MAGIC_WORD || !replay_accept(&replay, p.seq))
         continue;
-      last_seq = p.seq;
-
-      // 3. VM Policy & Software Gate
-      action_t act = decision_vm(&p);
-      if (gate_allow(&act, &p)) {
-        // 4. Actuate
-        if (act.act == 1) {
-          hw_gpio_set(act.act, act.v0); // Brake via GPIO
-        } else if (act.act >= 2) {
-          motor_control_execute_action(&act); // Motor control for move/turn
-        }
 
-        // 5. Strobe the RTL Watchdog
-        hw_strobe_hardware_watchdog_pin();
+      // 3-5. One intent, or each record of a batch frame in order
+      if (p.version == PKT_VERSION_SINGLE) {
+        execute_intent(&p);
+      } else if (p.version == PKT_VERSION_BATCH) {
+        pkt_batch_t b;
+        memcpy(&b, &p, sizeof b);
+        if (b.count > BATCH_MAX_RECORDS)
+          continue;
+        for (uint8_t i = 0; i < b.count; i++) {
+          p.intent_id = b.rec[i].intent_id;
+          p.conf_q15 = b.rec[i].conf_q15;
+          execute_intent(&p);
+        }
       }
 
       // Run motor control loop (assume packet rate ~50 Hz)
@@ -0,0 +1,35 @@
+#include "../include/protocol.h"
+#include <string.h>
+
+// Ring of 32-bit words indexed by seq >> 5 with one spare word (RFC 6479):
+// accept/reject are O(1) and advancing only clears the words skipped over.
+
+void replay_init(replay_window_t *w) {
+  memset(w, 0, sizeof(*w));
+  w->bitmap[0] = 1; // seq 0 is never valid
+}
+
+int replay_accept(replay_window_t *w, uint32_t seq) {
+  if (seq > w->top) {
+    uint32_t old = w->top >> 5;
+    uint32_t skip = (seq >> 5) - old;
+    if (skip > REPLAY_WORDS)
+      skip = REPLAY_WORDS;
+    for (uint32_t i = 1; i <= skip; i++)
+      w->bitmap[(old + i) % REPLAY_WORDS] = 0;
+    w->top = seq;
+    w->advances++;
+  } else if (w->top - seq >= REPLAY_WINDOW) {
+    w->too_old++;
+    return 0;
+  }
+
+  uint32_t index = (seq >> 5) % REPLAY_WORDS;
+  uint32_t bit = 1u << (seq & 31);
+  if (w->bitmap[index] & bit) {
+    w->duplicates++;
+    return 0;
+  }
+  w->bitmap[index] |= bit;
+  return 1;
+}
@@ -2,12 +2,14 @@
 #include "../include/policy_bin.h" // Auto-generated by host/compiler.py
 
 static uint32_t last_move_ms = 0;
+static int move_seen = 0; // last_move_ms is valid
 static uint8_t prev_act_id = 0;
 
 #define OP_IF 0x01
 #define OP_ACT 0x02
 #define OP_DENY 0x03
 #define OP_REQUIRE_PREV 0x04
+#define OP_DISPATCH 0x05
 #define OP_END 0xFF
 
 action_t decision_vm(const pkt_t* p) {
@@ -45,6 +47,28 @@ action_t decision_vm(const pkt_t* p) {
             out.act = 0;
             prev_act_id = 0;
             return out;
+        } else if (op == OP_DISPATCH) {
+            // Jump table: base, count, default, offset[count] (all u16 LE).
+            // Jumps straight to this intent's rule block, or to a shared DENY.
+            // A table entry or target outside the policy denies, as OP_DENY.
+            size_t target = POLICY_LEN;
+            if (pc + 6 <= POLICY_LEN) {
+                uint16_t base = POLICY_BC[pc] | (POLICY_BC[pc+1]<<8);
+                uint16_t count = POLICY_BC[pc+2] | (POLICY_BC[pc+3]<<8);
+                target = POLICY_BC[pc+4] | (POLICY_BC[pc+5]<<8);
+                if (p->intent_id >= base && (uint16_t)(p->intent_id - base) < count) {
+                    size_t entry = pc + 6 + 2 * (size_t)(p->intent_id - base);
+                    target = entry + 1 < POLICY_LEN
+                        ? (size_t)(POLICY_BC[entry] | (POLICY_BC[entry+1]<<8)) : POLICY_LEN;
+                }
+            }
+            if (target >= POLICY_LEN) {
+                out.act = 0;
+                prev_act_id = 0;
+                return out;
+            }
+            pc = target;
+            cond_failed = 0;
         } else if (op == OP_END) {
             break;
         }
@@ -56,8 +80,11 @@ int gate_allow(const action_t* a, const pkt_t* p) {
     if (a->act == 0) return 0; // Explicitly denied
     // Safety Envelope: Rate-limit MOVE to 50Hz (20ms)
     if (a->act == 2) {
-        if (p->t_ms - last_move_ms < 20) return 0;
+        // Signed delta: a reordered MOVE older than the last one is < 20 too,
+        // so last_move_ms never moves backwards
+        if (move_seen && (int32_t)(p->t_ms - last_move_ms) < 20) return 0;
         last_move_ms = p->t_ms;
+        move_seen = 1;
     }
     return 1;
 }
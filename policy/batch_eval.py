@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Vectorized policy evaluation for offline log auditing.
+
+``evaluate_batch`` returns exactly what calling the firmware VM once per
+record would (first-match IF/REQUIRE_PREV/ACT, DEFAULT DENY, 32-step
+budget, prev_act_id carried between records), without a Python loop over
+records:
+
+1. Every decision is tabulated once per (intent class, conf bucket,
+   prev class) using the reference interpreter; records are mapped onto
+   that table with searchsorted.
+2. The prev_act_id dependency is a tiny state machine. Each record is a
+   function prev class -> prev class; these functions are numbered inside
+   their (small) closure under composition, so a blocked parallel prefix
+   scan over 1-D codes with a composition lookup table yields the state
+   entering every record in a few whole-array passes.
+"""
+import numpy as np
+
+from policy_vm import run_policy, decision_classes, unused_value
+
+
+def decision_table(bc):
+    """Tabulate every distinct decision of a policy.
+
+    Returns a dict with the class boundaries, ``act``/``v0``/``next_prev``
+    arrays indexed ``[intent_class, conf_bucket, prev_class]``, and the
+    transition-function code of every ``[intent_class, conf_bucket]`` cell.
+    """
+    thresholds, intents, req_acts = decision_classes(bc)
+    intent_ids = sorted(intents)
+    other_intent = unused_value(intents, 1 << 16)
+    intent_reps = intent_ids + ([other_intent] if other_intent is not None else [])
+
+    prev_vals = sorted(req_acts)  # always includes 0
+    other_prev = unused_value(req_acts, 256)
+    prev_reps = prev_vals + ([other_prev] if other_prev is not None else [])
+    conf_reps = [0] + thresholds
+
+    n_i, n_c, n_p = len(intent_reps), len(conf_reps), len(prev_reps)
+    act = np.zeros((n_i, n_c, n_p), dtype=np.uint8)
+    v0 = np.zeros((n_i, n_c, n_p), dtype=np.int16)
+    next_state = np.zeros((n_i, n_c, n_p), dtype=np.intp)
+    next_prev = np.zeros((n_i, n_c, n_p), dtype=np.int16)  # -1 = unchanged
+
+    def prev_class(value):
+        return prev_vals.index(value) if value in req_acts else n_p - 1
+
+    for a, intent in enumerate(intent_reps):
+        for b, conf in enumerate(conf_reps):
+            for c, prev in enumerate(prev_reps):
+                act_id, value, new_prev = run_policy(bc, intent, conf, prev)
+                act[a, b, c] = act_id
+                v0[a, b, c] = value
+                next_state[a, b, c] = c if new_prev is None else prev_class(new_prev)
+                next_prev[a, b, c] = -1 if new_prev is None else new_prev
+
+    # Number each cell's transition function within the closure
+    fns, compose = _transition_monoid(
+        {tuple(int(x) for x in next_state[a, b]) for a in range(n_i) for b in range(n_c)}, n_p
+    )
+    index = {f: i for i, f in enumerate(fns)}
+    fn_code = np.array(
+        [[index[tuple(int(x) for x in next_state[a, b])] for b in range(n_c)] for a in range(n_i)],
+        dtype=np.intp,
+    )
+
+    return {
+        "intents": np.array(intent_ids, dtype=np.int64),
+        "thresholds": np.array(thresholds, dtype=np.int64),
+        "prev_vals": prev_vals,
+        "prev_class": prev_class,
+        "act": act,
+        "v0": v0,
+        "next_prev": next_prev,
+        "fn_code": fn_code,
+        "fns": np.array(fns, dtype=np.intp),
+        "compose": compose,
+    }
+
+
+def _transition_monoid(fns, k):
+    # Closure of the transition functions (tuples over k states) under
+    # composition; element 0 is the identity. compose[g, f] = g after f.
+    identity = tuple(range(k))
+    elems = [identity] + sorted(f for f in fns if f != identity)
+    index = {f: i for i, f in enumerate(elems)}
+    i = 0
+    while i < len(elems):
+        for j in range(i + 1):
+            for g, f in ((elems[i], elems[j]), (elems[j], elems[i])):
+                h = tuple(g[x] for x in f)
+                if h not in index:
+                    index[h] = len(elems)
+                    elems.append(h)
+        i += 1
+    compose = np.empty((len(elems), len(elems)), dtype=np.intp)
+    for gi, g in enumerate(elems):
+        for fi, f in enumerate(elems):
+            compose[gi, fi] = index[tuple(g[x] for x in f)]
+    return elems, compose
+
+
+def _prefix_compose(codes, compose, block=1024):
+    # Inclusive prefix: out[i] = f_i after ... after f_0. Hillis-Steele
+    # within blocks, then the block totals are scanned recursively.
+    n = len(codes)
+    pad = -n % block
+    if pad:
+        codes = np.concatenate([codes, np.zeros(pad, dtype=codes.dtype)])
+    prefix = codes.reshape(-1, block).copy()
+    d = 1
+    while d < block:
+        prefix[:, d:] = compose[prefix[:, d:], prefix[:, :-d]]
+        d <<= 1
+    if prefix.shape[0] > 1:
+        totals = _prefix_compose(prefix[:, -1], compose, block)
+        before = np.zeros_like(totals)
+        before[1:] = totals[:-1]
+        prefix = compose[prefix, before[:, None]]
+    return prefix.reshape(-1)[:n]
+
+
+def evaluate_batch(bc, intent_id, conf_q15, prev_act_id=0, chunk=1 << 20):
+    """Evaluate a policy over recorded packets.
+
+    ``intent_id`` and ``conf_q15`` are equal-length integer arrays. Returns
+    ``(act, v0, final_prev_act_id)`` where ``act``/``v0`` hold the VM's
+    decision for every record in order.
+    """
+    intent_id = np.asarray(intent_id, dtype=np.int64)
+    conf_q15 = np.asarray(conf_q15, dtype=np.int64)
+    if intent_id.shape != conf_q15.shape or intent_id.ndim != 1:
+        raise ValueError("intent_id and conf_q15 must be 1-D arrays of equal length")
+
+    table = decision_table(bc)
+    intents = table["intents"]
+    n_other = len(intents)
+
+    acts = np.empty(intent_id.shape, dtype=np.uint8)
+    values = np.empty(intent_id.shape, dtype=np.int16)
+    state = table["prev_class"](prev_act_id)
+    prev = prev_act_id
+
+    # Chunking bounds the scan's temporary buffers for huge logs
+    for start in range(0, len(intent_id), chunk):
+        ids = intent_id[start : start + chunk]
+        confs = conf_q15[start : start + chunk]
+
+        pos = np.searchsorted(intents, ids)
+        hit = pos < len(intents)
+        hit[hit] = intents[pos[hit]] == ids[hit]
+        i_cls = np.where(hit, pos, n_other)
+        c_cls = np.searchsorted(table["thresholds"], confs, side="right")
+
+        prefix = _prefix_compose(table["fn_code"][i_cls, c_cls], table["compose"])
+        states = np.empty(len(ids), dtype=np.intp)
+        states[0] = state
+        states[1:] = table["fns"][prefix[:-1], state]
+
+        acts[start : start + chunk] = table["act"][i_cls, c_cls, states]
+        values[start : start + chunk] = table["v0"][i_cls, c_cls, states]
+        new_prev = table["next_prev"][i_cls, c_cls, states]
+
+        changed = np.flatnonzero(new_prev >= 0)
+        if len(changed):
+            prev = int(new_prev[changed[-1]])
+        state = int(table["fns"][prefix[-1], state])
+
+    return acts, values, prev
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from compiler import compile_policy_cached
+
+    parser = argparse.ArgumentParser(description="Re-score recorded intents against a policy")
+    parser.add_argument("policy", help="policy DSL file")
+    parser.add_argument("log", help=".npz with intent_id and conf_q15 arrays")
+    parser.add_argument("--prev", type=int, default=0, help="initial prev_act_id")
+    args = parser.parse_args()
+
+    data = np.load(args.log)
+    t0 = time.perf_counter()
+    act, v0, prev = evaluate_batch(
+        compile_policy_cached(args.policy), data["intent_id"], data["conf_q15"], args.prev
+    )
+    dt = time.perf_counter() - t0
+    print(f"{len(act)} decisions in {dt:.2f}s, final prev_act_id={prev}")
+    for a, count in zip(*np.unique(act, return_counts=True)):
+        print(f"  act {a}: {count}")
@@ -1,55 +1,538 @@
 import struct
 import hashlib
+import os
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
 
 OP_IF = 0x01
 OP_SET = 0x02
 OP_DENY = 0x03
 OP_REQUIRE_PREV = 0x04
+OP_DISPATCH = 0x05
 OP_END = 0xFF
 
 # Physical Hardware Limits (Min, Max)
 BOUNDS = {1: (0, 1), 2: (-50, 50), 3: (-30, 30)}
 
+# Bump whenever the emitted bytecode changes for the same source
+BC_FORMAT = 2
 
-def compile_policy(filepath):
+CACHE_DIR = os.environ.get(
+    "BOREAL_POLICY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "boreal", "policy")
+)
+# In-process LRU of compiled policies, keyed by (source key, cache dir)
+MEMORY_CACHE_ENTRIES = 32
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+# VM step budget (firmware/src/vm.c: steps++ < 32)
+MAX_STEPS = 32
+
+# Largest intent_id range a dispatch jump table may cover (2 bytes/entry)
+MAX_DISPATCH_SPAN = 4096
+
+# One "IF ... [REQUIRE_PREV ...] ACT" block of the DSL
+Rule = namedtuple("Rule", "intent conf reqs act param")
+
+_IF = struct.Struct("<BHH")
+_SET = struct.Struct("<BBh")
+
+
+def compile_policy(filepath, dispatch=None):
     with open(filepath, "r") as f:
-        lines = [
-            line_str.split("#")[0].strip()
-            for line_str in f
-            if line_str.split("#")[0].strip()
-        ]
+        return compile_source(f.read(), dispatch)
+
+
+def compile_source(source, dispatch=None):
+    # dispatch=None picks the jump-table layout only when the linear one
+    # would put rules beyond the VM step budget, with a warning; True/False
+    # force it.
+    if dispatch:
+        return emit_dispatch(parse_rules(source))
 
     bc = bytearray()
     has_default = False
+    steps = 0
+    intents = []
+    pack_if = _IF.pack
 
-    for line in lines:
+    for line in _policy_lines(source):
         parts = line.split()
-        if parts[0] == "IF":
-            bc += bytes([OP_IF]) + struct.pack("<HH", int(parts[3]), int(parts[7]))
-        elif parts[0] == "REQUIRE_PREV":
-            bc += bytes([OP_REQUIRE_PREV, int(parts[1])])
-        elif parts[0] == "ACT":
-            act, param = int(parts[1]), int(parts[2])
-            if act not in BOUNDS or not (BOUNDS[act][0] <= param <= BOUNDS[act][1]):
-                raise ValueError(
-                    f"FATAL: Actuator {act} param {param} out of physical bounds!"
-                )
-            bc += bytes([OP_SET, act]) + struct.pack("<h", param)
-        elif parts[0] == "DEFAULT" and parts[1] == "DENY":
-            bc += bytes([OP_DENY])
+        op = parts[0]
+        if op == "IF":
+            intent = int(parts[3])
+            intents.append(intent)
+            bc += pack_if(OP_IF, intent, int(parts[7]))
+        elif op == "REQUIRE_PREV":
+            bc += bytes((OP_REQUIRE_PREV, int(parts[1])))
+            steps += 1
+        elif op == "ACT":
+            bc += _act_bytes(int(parts[1]), int(parts[2]))
+            steps += 1
+        elif op == "DEFAULT" and parts[1] == "DENY":
+            bc += bytes((OP_DENY,))
             has_default = True
             break
 
     if not has_default:
         raise ValueError("FATAL: Policy MUST end with DEFAULT DENY.")
+    bc += bytes((OP_END,))
+    steps += len(intents)
+
+    # Rules past the step budget are dead in the linear layout; switch to the
+    # jump table when the intents are dense enough for one. Any other reason
+    # the jump table cannot be built (a malformed rule block, bytecode over
+    # 64 KiB) is an error rather than a silent fallback.
+    if (
+        dispatch is None and steps > MAX_STEPS and intents
+        and max(intents) - min(intents) < MAX_DISPATCH_SPAN
+    ):
+        warnings.warn(
+            f"Policy takes {steps} VM steps in the linear layout (budget {MAX_STEPS}); "
+            "compiling it with the dispatch layout"
+        )
+        return emit_dispatch(parse_rules(source))
+    return bc
+
+
+def _act_bytes(act, param):
+    if act not in BOUNDS or not (BOUNDS[act][0] <= param <= BOUNDS[act][1]):
+        raise ValueError(f"FATAL: Actuator {act} param {param} out of physical bounds!")
+    return _SET.pack(OP_SET, act, param)
+
+
+def emit_dispatch(rules):
+    """Jump-table layout: one OP_DISPATCH, then a rule block per intent.
+
+    OP_DISPATCH base:u16 count:u16 default:u16 offset:u16[count] jumps to
+    the block for ``intent_id - base`` (absolute pc), or to ``default``, a
+    shared DENY, when the intent has no rules. Each block holds that
+    intent's rules in source order followed by DENY, so first-match
+    semantics are unchanged while decisions cost 1 + block steps.
+    """
+    groups = {}
+    for rule in rules:
+        groups.setdefault(rule.intent, []).append(rule)
+    base = min(groups) if groups else 0
+    count = max(groups) - base + 1 if groups else 0
+    if count > MAX_DISPATCH_SPAN:
+        raise ValueError(
+            f"FATAL: intent ids span {count} values; dispatch supports {MAX_DISPATCH_SPAN}"
+        )
+
+    header_len = 7 + 2 * count
+    bc = bytearray(header_len)
+    default = len(bc)
+    bc += bytes([OP_DENY])
+    offsets = {}
+    for intent, block in groups.items():
+        offsets[intent] = len(bc)
+        for rule in block:
+            bc += bytes([OP_IF]) + struct.pack("<HH", rule.intent, rule.conf)
+            for req in rule.reqs:
+                bc += bytes([OP_REQUIRE_PREV, req])
+            bc += _act_bytes(rule.act, rule.param)
+        bc += bytes([OP_DENY])
     bc += bytes([OP_END])
+    if len(bc) > 0xFFFF:
+        raise ValueError("FATAL: dispatch policy exceeds 64 KiB of bytecode")
+
+    struct.pack_into("<BHHH", bc, 0, OP_DISPATCH, base, count, default)
+    struct.pack_into(
+        f"<{count}H", bc, 7, *(offsets.get(base + k, default) for k in range(count))
+    )
     return bc
 
 
+def _policy_lines(source):
+    # Non-empty lines with comments stripped
+    lines = []
+    for line in source.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def parse_rules(source):
+    # Rule-level view of a policy for the optimizer. Only well-formed
+    # "IF, REQUIRE_PREV*, ACT" blocks followed by DEFAULT DENY are accepted.
+    rules = []
+    cur = None
+    for line in _policy_lines(source):
+        parts = line.split()
+        if parts[0] == "IF":
+            if cur is not None:
+                raise ValueError(f"Rule for intent {cur[0]} has no ACT")
+            cur = [int(parts[3]), int(parts[7]), []]
+        elif parts[0] == "REQUIRE_PREV":
+            if cur is None:
+                raise ValueError("REQUIRE_PREV outside of an IF block")
+            cur[2].append(int(parts[1]))
+        elif parts[0] == "ACT":
+            if cur is None:
+                raise ValueError("ACT outside of an IF block")
+            rules.append(Rule(cur[0], cur[1], tuple(cur[2]), int(parts[1]), int(parts[2])))
+            cur = None
+        elif parts[0] == "DEFAULT" and parts[1] == "DENY":
+            if cur is not None:
+                raise ValueError(f"Rule for intent {cur[0]} has no ACT")
+            return rules
+    raise ValueError("FATAL: Policy MUST end with DEFAULT DENY.")
+
+
+def emit_rules(rules):
+    # Same bytecode compile_source() produces for these rules in this order
+    lines = []
+    for r in rules:
+        lines.append(f"IF intent == {r.intent} AND conf >= {r.conf}")
+        lines.extend(f"REQUIRE_PREV {req}" for req in r.reqs)
+        lines.append(f"ACT {r.act} {r.param}")
+    lines.append("DEFAULT DENY")
+    return compile_source("\n".join(lines), dispatch=False)
+
+
+def _rule_ops(rule):
+    return 2 + len(rule.reqs)  # IF + REQUIRE_PREV* + ACT
+
+
+def _covers(rule, prev):
+    return all(prev == req or prev == 0 for req in rule.reqs)
+
+
+def optimize_rules(rules, profile=None):
+    """Optimizer pass over parsed rules.
+
+    1. Drops rules that can never fire because earlier rules for the same
+       intent already match every (conf, prev_act) they match; this also
+       removes duplicate IF blocks.
+    2. With a profile ({intent: count}), reorders intent groups so hot,
+       short groups come first. Rules for different intents never match
+       the same packet, so only same-intent order matters for first-match
+       semantics, and that order is preserved.
+
+    Returns ``(rules, removed)`` where ``removed`` lists (rule, reason).
+    """
+    # prev_act_id classes: 0, every REQUIRE_PREV target, and "anything else"
+    other = -1
+    prevs = {0, other} | {req for r in rules for req in r.reqs}
+
+    kept, removed = [], []
+    for rule in rules:
+        earlier = [k for k in kept if k.intent == rule.intent]
+        shadowed = all(
+            any(k.conf <= rule.conf and _covers(k, prev) for k in earlier)
+            for prev in prevs
+            if _covers(rule, prev)
+        )
+        if shadowed and earlier:
+            removed.append((rule, "shadowed by earlier rules for this intent"))
+        else:
+            kept.append(rule)
+
+    if not profile:
+        return kept, removed
+
+    groups = {}
+    for rule in kept:
+        groups.setdefault(rule.intent, []).append(rule)
+
+    # Smith's rule: order by hits per VM op, ties keep source order
+    order = sorted(
+        enumerate(groups),
+        key=lambda item: (
+            -profile.get(item[1], 0) / sum(_rule_ops(r) for r in groups[item[1]]),
+            item[0],
+        ),
+    )
+    return [r for _, intent in order for r in groups[intent]], removed
+
+
+def step_report(rules, profile=None, dispatch=False):
+    """Per-intent VM step counts for a rule order.
+
+    ``best`` is the steps executed when the intent's first rule fires,
+    ``worst`` when every rule for it fails and the VM reaches a DENY.
+    Rules whose ACT lies beyond the 32-step budget are listed in
+    ``cut_off``; packets that would reach them get act 0 instead. With
+    ``dispatch`` the counts are for the emit_dispatch() layout.
+    """
+    report = {"intents": {}, "cut_off": [], "deny_steps": 0}
+    pos = 0
+    block_end = {}
+    unconditional_end = {}
+    for rule in rules:
+        if dispatch:
+            pos = block_end.get(rule.intent, 1)  # OP_DISPATCH is step 1
+        pos += _rule_ops(rule)
+        block_end[rule.intent] = pos
+        report["intents"].setdefault(rule.intent, {"best": pos, "worst": None})
+        if rule.conf == 0 and not rule.reqs and rule.intent not in unconditional_end:
+            unconditional_end[rule.intent] = pos
+        if pos > MAX_STEPS:
+            report["cut_off"].append(rule)
+    report["deny_steps"] = 2 if dispatch else pos + 1
+    for intent, info in report["intents"].items():
+        deny = block_end[intent] + 1 if dispatch else report["deny_steps"]
+        info["worst"] = unconditional_end.get(intent, deny)
+
+    if profile:
+        total = sum(profile.values())
+        default = {"best": report["deny_steps"], "worst": report["deny_steps"]}
+        for key in ("best", "worst"):
+            report[f"expected_{key}"] = (
+                sum(n * report["intents"].get(i, default)[key] for i, n in profile.items()) / total
+                if total
+                else 0.0
+            )
+    return report
+
+
+def optimize_policy(filepath, profile=None, dispatch=None):
+    # Returns (bytecode, report) for the optimized rule order; dispatch
+    # has the same meaning as in compile_source()
+    with open(filepath, "r") as f:
+        rules = parse_rules(f.read())
+    optimized, removed = optimize_rules(rules, profile)
+    report = {
+        "removed": removed,
+        "before": step_report(rules, profile),
+        "after": step_report(optimized, profile),
+    }
+    if dispatch is None:
+        dispatch = bool(report["after"]["cut_off"])
+    if dispatch:
+        report["after"] = step_report(optimized, profile, dispatch=True)
+        return emit_dispatch(optimized), report
+    return emit_rules(optimized), report
+
+
+def load_profile(path):
+    # Intent-frequency profile: JSON {"intent": count} or an .npz/.npy
+    # recording with an intent_id array (as used by batch_eval)
+    if path.endswith((".npz", ".npy")):
+        import numpy as np
+
+        data = np.load(path)
+        ids = data["intent_id"] if path.endswith(".npz") else data
+        values, counts = np.unique(ids, return_counts=True)
+        return {int(v): int(c) for v, c in zip(values, counts)}
+    import json
+
+    with open(path) as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+def policy_cache_key(source_bytes):
+    # Content address: DSL source + the BOUNDS table it was checked against
+    h = hashlib.sha256()
+    h.update(f"bc{BC_FORMAT}|{sorted(BOUNDS.items())}|".encode())
+    h.update(source_bytes)
+    return h.hexdigest()
+
+
+def validate_bytecode(bc):
+    """Check compiled bytecode before it reaches a VM; raises ValueError.
+
+    Every op must be known with its operands inside the buffer, every ACT
+    within BOUNDS, every dispatch target on an op inside the policy, and
+    the program must end with DENY, END.
+    """
+    ops, targets = [], []
+    pc = 0
+    while pc < len(bc):
+        op = bc[pc]
+        ops.append(pc)
+        if op == OP_IF:
+            size = 5
+        elif op == OP_SET:
+            size = 4
+        elif op == OP_REQUIRE_PREV:
+            size = 2
+        elif op in (OP_DENY, OP_END):
+            size = 1
+        elif op == OP_DISPATCH:
+            count = bc[pc + 3] | (bc[pc + 4] << 8) if pc + 5 <= len(bc) else 0
+            size = 7 + 2 * count
+            if pc + size <= len(bc):
+                # default, then one offset per intent
+                targets.extend(struct.unpack_from(f"<{count + 1}H", bc, pc + 5))
+        else:
+            raise ValueError(f"Unknown opcode 0x{op:02x} at {pc}")
+        if pc + size > len(bc):
+            raise ValueError(f"Truncated opcode 0x{op:02x} at {pc}")
+        if op == OP_SET:
+            _, act, param = _SET.unpack_from(bc, pc)
+            _act_bytes(act, param)
+        pc += size
+    if len(ops) < 2 or bc[ops[-1]] != OP_END or bc[ops[-2]] != OP_DENY:
+        raise ValueError("Policy bytecode must end with DENY, END")
+    bad = set(targets) - set(ops)
+    if bad:
+        raise ValueError(f"DISPATCH target {min(bad)} is not an op in the policy")
+
+
+def compile_policy_cached(filepath, cache_dir=None):
+    """compile_policy() backed by an in-process and on-disk bytecode cache.
+
+    An in-process hit skips parsing and bounds checking; only the source is
+    read and hashed. The disk cache is user-writable, so a disk hit is
+    re-checked with validate_bytecode() and recompiled if it fails. Cache
+    files are written atomically, so concurrent simulator processes can
+    share one cache directory.
+    """
+    with open(filepath, "rb") as f:
+        source = f.read()
+    cache_dir = cache_dir or CACHE_DIR
+    key = (policy_cache_key(source), cache_dir)
+    with _memory_lock:
+        bc = _memory_cache.get(key)
+        if bc is not None:
+            _memory_cache.move_to_end(key)
+            return bytearray(bc)
+
+    cache_file = os.path.join(cache_dir, key[0] + ".bin")
+    bc = _read_cache_file(cache_file)
+    if bc is None:
+        bc = bytes(compile_source(source.decode()))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(bc)
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass  # read-only or missing cache dir: still return the bytecode
+
+    with _memory_lock:
+        _memory_cache[key] = bc
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+    return bytearray(bc)
+
+
+def _read_cache_file(path):
+    # Returns the cached bytecode, or None on a miss or an invalid blob
+    try:
+        with open(path, "rb") as f:
+            bc = f.read()
+    except OSError:
+        return None
+    try:
+        validate_bytecode(bc)
+    except ValueError as exc:
+        warnings.warn(f"Ignoring invalid cached policy {path}: {exc}")
+        return None
+    return bc
+
+
+class PolicyWatcher:
+    """Recompile a DSL file when it changes and hand the bytecode to a target.
+
+    Polls the file's mtime/size every ``interval`` seconds and only
+    recompiles when the content hash differs. ``on_change(bc)`` receives the
+    new bytecode; a policy that fails to compile is reported through
+    ``last_error`` and the running policy is kept.
+    """
+
+    def __init__(self, filepath, on_change, interval=0.5, cache_dir=None):
+        self.filepath = filepath
+        self.on_change = on_change
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.reloads = 0
+        self.last_error = None
+        self._stat = None
+        self._key = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.poll()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="policy-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        # Returns True when a new policy was swapped in
+        try:
+            st = os.stat(self.filepath)
+            stat = (st.st_mtime_ns, st.st_size)
+            if stat == self._stat:
+                return False
+            self._stat = stat
+            with open(self.filepath, "rb") as f:
+                key = policy_cache_key(f.read())
+            if key == self._key:
+                return False
+            bc = compile_policy_cached(self.filepath, self.cache_dir)
+        except (OSError, ValueError) as exc:
+            self.last_error = exc
+            return False
+        self._key = key
+        self.last_error = None
+        self.on_change(bc)
+        self.reloads += 1
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+
+def print_step_report(title, report):
+    print(f"{title}: DEFAULT DENY at step {report['deny_steps']}")
+    for intent, info in report["intents"].items():
+        print(f"  intent {intent}: best {info['best']} steps, worst {info['worst']} steps")
+    if "expected_best" in report:
+        print(
+            f"  expected: {report['expected_best']:.2f} steps (first rule hits), "
+            f"{report['expected_worst']:.2f} (all rules miss)"
+        )
+    for rule in report["cut_off"]:
+        print(f"  WARNING: rule {tuple(rule)} is beyond the {MAX_STEPS}-step budget")
+
+
 if __name__ == "__main__":
-    bc = compile_policy("policy.dsl")
-    with open("policy_bin.h", "w") as f:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile policy.dsl to policy_bin.h")
+    parser.add_argument("policy", nargs="?", default="policy.dsl")
+    parser.add_argument("-o", "--output", default="policy_bin.h")
+    parser.add_argument("--optimize", action="store_true", help="run the optimizer pass")
+    parser.add_argument("--profile", help="intent-frequency profile (.json or .npz)")
+    parser.add_argument(
+        "--layout", choices=["auto", "linear", "dispatch"], default="auto",
+        help="auto uses the intent jump table only when rules exceed the step budget",
+    )
+    args = parser.parse_args()
+    dispatch = {"auto": None, "linear": False, "dispatch": True}[args.layout]
+
+    if args.optimize or args.profile:
+        profile = load_profile(args.profile) if args.profile else None
+        bc, report = optimize_policy(args.policy, profile, dispatch)
+        for rule, reason in report["removed"]:
+            print(f"Removed {tuple(rule)}: {reason}")
+        print_step_report("Source order", report["before"])
+        print_step_report("Optimized", report["after"])
+    else:
+        bc = compile_policy(args.policy, dispatch)
+
+    layout = "dispatch" if bc[0] == OP_DISPATCH else "linear"
+    with open(args.output, "w") as f:
         f.write(f"// SHA256: {hashlib.sha256(bc).hexdigest()}\n")
+        f.write(f"// Layout: {layout}\n")
         f.write(f"const uint8_t POLICY_BC[] = {{{', '.join(hex(b) for b in bc)}}};\n")
         f.write(f"const size_t POLICY_LEN = {len(bc)};\n")
-    print("Compiled successfully to policy_bin.h")
+    print(f"Compiled successfully to {args.output} ({layout} layout)")
@@ -0,0 +1,117 @@
+"""Reference policy VM shared by the simulator, batch evaluator and verifier.
+
+run_policy() interprets compiled bytecode exactly as firmware/src/vm.c does;
+the helpers below read a policy's conditions without running it.
+"""
+from compiler import OP_IF, OP_SET, OP_DENY, OP_REQUIRE_PREV, OP_DISPATCH, OP_END
+
+MAX_STEPS = 32
+
+
+def run_policy(bc, intent_id, conf_q15, prev_act_id):
+    # Reference interpreter (mirrors firmware/src/vm.c). Returns
+    # (act, v0, new_prev) with new_prev None when prev_act_id is untouched.
+    pc = 0
+    steps = 0
+    cond_failed = False
+    while pc < len(bc) and steps < MAX_STEPS:
+        op = bc[pc]
+        pc += 1
+        if op == OP_IF:
+            i = bc[pc] | (bc[pc + 1] << 8)
+            c = bc[pc + 2] | (bc[pc + 3] << 8)
+            pc += 4
+            cond_failed = False
+            if not (intent_id == i and conf_q15 >= c):
+                cond_failed = True
+        elif op == OP_REQUIRE_PREV:
+            req_act = bc[pc]
+            pc += 1
+            if prev_act_id != req_act and prev_act_id != 0:
+                cond_failed = True
+        elif op == OP_SET:
+            act_id = bc[pc]
+            v0 = bc[pc + 1] | (bc[pc + 2] << 8)
+            if v0 > 0x7FFF:
+                v0 -= 0x10000
+            pc += 3
+            if not cond_failed:
+                return act_id, v0, act_id
+        elif op == OP_DENY:
+            return 0, 0, 0
+        elif op == OP_DISPATCH:
+            # A table entry or target outside the policy denies, as in vm.c
+            target = len(bc)
+            if pc + 6 <= len(bc):
+                base = bc[pc] | (bc[pc + 1] << 8)
+                count = bc[pc + 2] | (bc[pc + 3] << 8)
+                target = bc[pc + 4] | (bc[pc + 5] << 8)
+                k = intent_id - base
+                if 0 <= k < count:
+                    entry = pc + 6 + 2 * k
+                    target = bc[entry] | (bc[entry + 1] << 8) if entry + 1 < len(bc) else len(bc)
+            if target >= len(bc):
+                return 0, 0, 0
+            pc = target
+            cond_failed = False
+        elif op == OP_END:
+            break
+        steps += 1
+    return 0, 0, None
+
+
+def policy_conditions(bc):
+    """Per-intent IF thresholds and REQUIRE_PREV targets of a policy.
+
+    Returns ``({intent_id: set(conf thresholds)}, req_acts)``, leaving out
+    ops the step budget never lets the VM reach. Jump tables are skipped;
+    every rule block they point at is scanned like linear code.
+    """
+    conds, req_acts = {}, set()
+    pc = 0
+    step = 0
+    while pc < len(bc):
+        op = bc[pc]
+        pc += 1
+        if op == OP_IF:
+            if step < MAX_STEPS:
+                intent = bc[pc] | (bc[pc + 1] << 8)
+                conds.setdefault(intent, set()).add(bc[pc + 2] | (bc[pc + 3] << 8))
+            pc += 4
+        elif op == OP_REQUIRE_PREV:
+            if step < MAX_STEPS:
+                req_acts.add(bc[pc])
+            pc += 1
+        elif op == OP_SET:
+            pc += 3
+        elif op == OP_DENY:
+            step = 0  # a dispatch block ends here; the next starts at step 1
+        elif op == OP_DISPATCH:
+            pc += 6 + 2 * (bc[pc + 2] | (bc[pc + 3] << 8))
+        elif op == OP_END:
+            break
+        step += 1
+    return conds, req_acts
+
+
+def decision_classes(bc):
+    """Input classes that fully determine a decision.
+
+    Returns ``(thresholds, intents, req_acts)``: the sorted distinct IF
+    confidence thresholds, the IF intent ids, and the REQUIRE_PREV targets
+    plus 0. Two inputs that agree on which intent they match, which side of
+    every threshold conf_q15 falls, and whether prev_act_id is 0/a target
+    always get the same decision.
+    """
+    conds, req_acts = policy_conditions(bc)
+    thresholds = set().union(*conds.values())
+    return sorted(thresholds), frozenset(conds), frozenset(req_acts | {0})
+
+
+def unused_value(used, limit):
+    # Smallest value in range(limit) not in ``used``, standing for the
+    # "any other intent / prev_act_id" class; None if every value is used
+    for v in range(limit):
+        if v not in used:
+            return v
+    return None
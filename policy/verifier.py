@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Exhaustive static verifier for compiled policies.
+
+A decision depends on the intent only through which IF intents it equals,
+on conf_q15 only through which of that intent's IF thresholds it clears,
+and on prev_act_id only through whether it is 0, a REQUIRE_PREV target or
+anything else. Evaluating the reference VM once per such class gives the
+complete decision map over all 65536 x 65536 x 256 inputs, which the
+queries below work from.
+"""
+import sys
+import time
+from collections import namedtuple
+
+from policy_vm import run_policy, policy_conditions, unused_value
+
+CONF_MAX = 0xFFFF
+
+# A box of inputs sharing one decision. intent is an intent id or None (any
+# intent the policy never names); prevs is a frozenset of prev_act_id values,
+# None standing for every value not listed. next_prev None = unchanged.
+Region = namedtuple("Region", "intent conf_lo conf_hi prevs act v0 next_prev")
+
+# A box of inputs where two policies decide differently; old/new are
+# (act, v0, next_prev) triples.
+Change = namedtuple("Change", "intent conf_lo conf_hi prevs old new")
+
+
+def _partition(policies):
+    # Joint input classes of one or more compiled policies
+    conds, req_acts = {}, {0}
+    for bc in policies:
+        c, r = policy_conditions(bc)
+        for intent, thresholds in c.items():
+            conds.setdefault(intent, set()).update(thresholds)
+        req_acts |= r
+
+    intents = [(i, i, sorted(conds[i] | {0})) for i in sorted(conds)]
+    other = unused_value(conds, 1 << 16)
+    if other is not None:
+        intents.append((None, other, [0]))
+
+    prevs = [(p, p) for p in sorted(req_acts)]
+    other = unused_value(req_acts, 256)
+    if other is not None:
+        prevs.append((None, other))
+    return intents, prevs
+
+
+def _boxes(policies, keep=None):
+    # Yields (intent, conf_lo, conf_hi, {decisions: prevs}) with adjacent
+    # conf buckets merged when every prev class decides the same way.
+    intents, prevs = _partition(policies)
+    for label, rep, bounds in intents:
+        box = None
+        for k, lo in enumerate(bounds):
+            hi = bounds[k + 1] - 1 if k + 1 < len(bounds) else CONF_MAX
+            groups = {}
+            for prev_label, prev in prevs:
+                decisions = tuple(run_policy(bc, rep, lo, prev) for bc in policies)
+                if keep is None or keep(decisions):
+                    groups.setdefault(decisions, []).append(prev_label)
+            if box is not None and box[3] == groups:
+                box[2] = hi
+                continue
+            if box is not None and box[3]:
+                yield tuple(box)
+            box = [label, lo, hi, groups]
+        if box is not None and box[3]:
+            yield tuple(box)
+
+
+def _prev_set(labels, n_classes):
+    return None if len(labels) == n_classes else frozenset(labels)
+
+
+def decision_map(bc):
+    """Complete decision map of a policy as a list of Regions."""
+    n_prev = len(_partition([bc])[1])
+    regions = []
+    for intent, lo, hi, groups in _boxes([bc]):
+        for (decision,), prevs in groups.items():
+            regions.append(Region(intent, lo, hi, _prev_set(prevs, n_prev), *decision))
+    return regions
+
+
+def reachable(bc, act):
+    """Regions of the input space whose decision is ``act``."""
+    return [r for r in decision_map(bc) if r.act == act]
+
+
+def reachable_acts(bc, start_prev=0, avoid=()):
+    """Acts reachable over packet sequences starting from ``start_prev``.
+
+    Decisions whose act is in ``avoid`` are never taken, so this answers
+    "can act X fire without act Y ever firing first". Returns
+    ``{act: [(intent_id, conf_q15), ...]}`` with a shortest witness sequence
+    for every reachable act (0 = deny).
+    """
+    intents, _ = _partition([bc])
+    inputs = [(rep, lo) for _, rep, bounds in intents for lo in bounds]
+    avoid = set(avoid)
+
+    paths = {start_prev: []}
+    found = {}
+    frontier = [start_prev]
+    while frontier:
+        nxt = []
+        for prev in frontier:
+            for intent, conf in inputs:
+                act, _, new_prev = run_policy(bc, intent, conf, prev)
+                if act in avoid:
+                    continue
+                path = paths[prev] + [(intent, conf)]
+                found.setdefault(act, path)
+                state = prev if new_prev is None else new_prev
+                if state not in paths:
+                    paths[state] = path
+                    nxt.append(state)
+        frontier = nxt
+    return dict(sorted(found.items()))
+
+
+def diff_policies(old_bc, new_bc):
+    """Input boxes where two policies decide differently, as Changes."""
+    n_prev = len(_partition([old_bc, new_bc])[1])
+    changes = []
+    for intent, lo, hi, groups in _boxes([old_bc, new_bc], keep=lambda d: d[0] != d[1]):
+        for (old, new), prevs in groups.items():
+            changes.append(Change(intent, lo, hi, _prev_set(prevs, n_prev), old, new))
+    return changes
+
+
+def format_inputs(intent, lo, hi, prevs):
+    intent = "other" if intent is None else str(intent)
+    if prevs is None:
+        prev = "any"
+    else:
+        prev = ",".join(str(p) for p in sorted(prevs, key=lambda p: (p is None, p or 0)))
+        prev = prev.replace("None", "other")
+    return f"intent {intent:>5}  conf {lo:>5}..{hi:<5}  prev {prev}"
+
+
+def format_decision(act, v0, next_prev):
+    if act == 0:
+        text = "DENY"
+    else:
+        text = f"ACT {act} {v0}"
+    return text + ("" if next_prev is None else f" (prev->{next_prev})")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from compiler import compile_policy
+
+    parser = argparse.ArgumentParser(description="Exhaustively verify a safety policy")
+    parser.add_argument("policy", help="policy DSL file")
+    parser.add_argument("--reach", type=int, action="append", help="list inputs reaching this act")
+    parser.add_argument("--avoid", type=int, nargs="*", default=[], help="acts that may not fire on the way")
+    parser.add_argument("--start-prev", type=int, default=0, help="prev_act_id at boot")
+    parser.add_argument("--forbid", type=int, nargs="*", default=[], help="fail if any of these acts is reachable")
+    parser.add_argument("--diff", metavar="OLD", help="compare against a previous policy version")
+    parser.add_argument("--fail-on-diff", action="store_true", help="fail if --diff finds any change")
+    parser.add_argument("--map", action="store_true", help="print the full decision map")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    bc = compile_policy(args.policy)
+    status = 0
+
+    if args.map:
+        for r in decision_map(bc):
+            print(f"{format_inputs(r.intent, r.conf_lo, r.conf_hi, r.prevs)}  -> {format_decision(r.act, r.v0, r.next_prev)}")
+
+    for act in args.reach or []:
+        regions = reachable(bc, act)
+        print(f"act {act}: {len(regions)} region(s)")
+        for r in regions:
+            print(f"  {format_inputs(r.intent, r.conf_lo, r.conf_hi, r.prevs)}  -> {format_decision(r.act, r.v0, r.next_prev)}")
+
+    found = reachable_acts(bc, args.start_prev, args.avoid)
+    avoiding = f" without act(s) {', '.join(map(str, args.avoid))}" if args.avoid else ""
+    print(f"Reachable from prev_act_id={args.start_prev}{avoiding}: {sorted(found)}")
+    for act, path in found.items():
+        print(f"  act {act}: " + " -> ".join(f"({i}, {c})" for i, c in path))
+    for act in args.forbid:
+        if act in found:
+            print(f"FAIL: forbidden act {act} is reachable")
+            status = 1
+
+    if args.diff:
+        changes = diff_policies(compile_policy(args.diff), bc)
+        print(f"{len(changes)} change(s) vs {args.diff}")
+        for c in changes:
+            print(f"  {format_inputs(c.intent, c.conf_lo, c.conf_hi, c.prevs)}  {format_decision(*c.old)} -> {format_decision(*c.new)}")
+        if changes and args.fail_on_diff:
+            status = 1
+
+    print(f"Verified in {1e3 * (time.perf_counter() - t0):.1f} ms")
+    sys.exit(status)
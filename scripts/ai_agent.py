@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
-import time, struct, spidev
+import asyncio
+import json
+import time, struct
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from siphash import siphash24
-from chacha20 import chacha20_encrypt
+from frame_codec import FrameEncoder
+from keystream_cache import KeystreamCache
+from spi_transport import make_transport
+from frame_trace import TraceWriter
+from deadline_loop import DeadlineLoop
 
 # 128-bit Shared Secret
 MAC_KEY = struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
@@ -23,38 +28,107 @@ CHACHA_KEY = struct.pack(
     0x1D1E1F20,
 )
 
-spi = spidev.SpiDev()
-spi.open(0, 0)
-spi.max_speed_hz = 10_000_000
-spi.mode = 0
+# "spidev:BUS.DEV" (default), "loopback" (in-process simulator) or "file:PATH"
+spi = make_transport(os.environ.get("BOREAL_TRANSPORT", "spidev:0.0")).open()
 SEQ = 0
 
+# Optional capture of every transmitted frame (replay with frame_trace.py)
+TRACE = TraceWriter(os.environ["BOREAL_TRACE"]) if os.environ.get("BOREAL_TRACE") else None
 
-def send_to_boreal(intent_id, conf_q15, aux_data):
+# Keystream for upcoming sequence numbers (nonce = SEQ) is built in background
+KEYSTREAM = KeystreamCache(CHACHA_KEY, 40, first_nonce=SEQ + 1).start()
+ENCODER = FrameEncoder(MAC_KEY, CHACHA_KEY, KEYSTREAM)
+
+
+def send_to_boreal(intent_id, conf_q15, aux_data, t_ms=None):
     global SEQ
     SEQ += 1
 
-    # Encrypt-then-MAC payload
-    aux = (aux_data + [0] * 18)[:18]  # Pad to 18 elements
+    # Encrypt-then-MAC into the encoder's reusable SPI frame buffer
+    if t_ms is None:
+        t_ms = int(time.time() * 1000)
+    frame = ENCODER.encode(SEQ, t_ms, intent_id, conf_q15, aux_data)
+    spi.transfer(frame)
+    if TRACE is not None:
+        TRACE.write(frame)
 
-    plaintext = struct.pack("<HH18h", intent_id, conf_q15, *aux)
-    ciphertext = chacha20_encrypt(plaintext, CHACHA_KEY, SEQ, 0)
 
-    header = struct.pack(
-        "<IHHII", 0xB0A1E1A1, 1, 1, SEQ, int(time.time() * 1000) & 0xFFFFFFFF
-    )
+def send_batch_to_boreal(records):
+    # Up to 9 (intent_id, conf_q15) records under one nonce, MAC and transfer
+    global SEQ
+    SEQ += 1
+
+    frame = ENCODER.encode_records(SEQ, int(time.time() * 1000), records)
+    spi.transfer(frame)
+    if TRACE is not None:
+        TRACE.write(frame)
+
+
+def ai_inference():
+    # [INSERT AI INFERENCE HERE]
+    # Example: Model detects a person (Intent 2) with 85% conf (27851)
+    return 2, 27851, [30]
 
-    payload = header + ciphertext
 
-    # Cryptographic MAC + SPI Frame
-    mac = siphash24(MAC_KEY, payload)
-    frame = bytes([0x01, 64]) + payload + mac
-    spi.xfer2(list(frame))
+async def control_loop(rate_hz=50.0, overrun="skip", stats_every_s=None, duration_s=None,
+                       spin_s=0.0):
+    """Send the latest inference result on every deadline of a DeadlineLoop.
+
+    Inference runs in a worker thread, overlapping the encode and transfer
+    of the previous result. Each tick sends whatever finished last and
+    starts the next inference if the previous one is done; ticks that
+    resend an older result count as ``stale``. Frames are stamped with
+    their deadline rather than the send time, so t_ms advances by exactly
+    one period and the 20 ms MOVE gate sees no jitter.
+    """
+    loop = asyncio.get_running_loop()
+    clock = DeadlineLoop(rate_hz, overrun, spin_s=spin_s)
+    epoch_ms = time.time() * 1000 - loop.time() * 1000
+    state = {"inference": loop.run_in_executor(None, ai_inference), "decision": None, "stale": 0}
+
+    def tick(k, deadline):
+        pending = state["inference"]
+        if pending.done():
+            state["decision"] = pending.result()
+            state["inference"] = loop.run_in_executor(None, ai_inference)
+        elif state["decision"] is not None:
+            state["stale"] += 1
+        if state["decision"] is not None:
+            intent_id, conf_q15, aux = state["decision"]
+            send_to_boreal(intent_id, conf_q15, aux, t_ms=int(epoch_ms + deadline * 1000))
+
+    async def report():
+        while True:
+            await asyncio.sleep(stats_every_s)
+            print(json.dumps(dict(clock.stats(), stale=state["stale"])), file=sys.stderr, flush=True)
+
+    reporter = asyncio.ensure_future(report()) if stats_every_s else None
+    try:
+        await clock.run(tick, duration_s)
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+    return dict(clock.stats(), stale=state["stale"])
 
 
 if __name__ == "__main__":
-    while True:
-        # [INSERT AI INFERENCE HERE]
-        # Example: Model detects a person (Intent 2) with 85% conf (27851)
-        send_to_boreal(intent_id=2, conf_q15=27851, aux_data=[30])
-        time.sleep(0.02)  # 50 Hz control loop
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Send AI intents to Boreal on a fixed cadence")
+    parser.add_argument("--rate", type=float, default=50.0, help="frames per second (50-200)")
+    parser.add_argument("--overrun", choices=("skip", "catch-up"), default="skip")
+    parser.add_argument("--stats-every", type=float, metavar="S", help="print loop stats to stderr")
+    parser.add_argument("--duration", type=float, help="seconds to run (default: forever)")
+    parser.add_argument(
+        "--spin-ms", type=float, default=0.0,
+        help="poll the event loop before each deadline for sub-ms jitter; keeps a core busy (0 = sleep only)",
+    )
+    args = parser.parse_args()
+
+    try:
+        stats = asyncio.run(control_loop(
+            args.rate, args.overrun, args.stats_every, args.duration, args.spin_ms / 1000.0
+        ))
+        print(json.dumps(stats, indent=2))
+    except KeyboardInterrupt:
+        pass
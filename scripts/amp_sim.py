@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Dual-core AMP model of the firmware: core 1 -> RX_Q ring -> core 0.
+
+Core 1 pushes every arriving SPI frame into a SpscRing with the same
+full/empty rule as RX_Q in main.c (a push onto a full ring drops the new
+frame); core 0 pops and runs the real SimulatedFirmware receive path.
+
+run_amp() runs both cores on the virtual clock. Core 0 service time is a
+modeled per-frame cost (``core0_us`` plus optional exponential jitter),
+not host time, since the host runs the pipeline far slower than the MCU.
+run_threaded() runs a real producer thread and consumer thread against
+the same ring to exercise it concurrently. ``--sweep`` raises the packet
+rate for each ring size and reports where core 0 starts falling behind.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from frame_codec import FrameEncoder
+from run_demo import DEFAULT_POLICY, INTENTS, SimulatedFirmware
+from sim_clock import EventScheduler
+
+KNEE_DROP_RATE = 0.001  # core 0 is "behind" once this fraction of frames is dropped
+
+
+def arrival_times(rate_hz, duration_s, arrivals="periodic", rng=None):
+    # Frame arrival times (ms) at core 1
+    period = 1000.0 / rate_hz
+    end = duration_s * 1000.0
+    if arrivals == "periodic":
+        return [k * period for k in range(int(end / period))]
+    if arrivals != "poisson":
+        raise ValueError(f"arrivals must be 'periodic' or 'poisson', not {arrivals!r}")
+    rng = rng or random.Random(0)
+    times, t = [], rng.expovariate(1.0 / period)
+    while t < end:
+        times.append(t)
+        t += rng.expovariate(1.0 / period)
+    return times
+
+
+def encode_stream(firmware, times, seed=0):
+    # One authenticated pkt_t per arrival, stamped with its arrival time
+    rng = random.Random(seed)
+    picks = [rng.choice(INTENTS) for _ in times]
+    encoder = FrameEncoder(firmware.MAC_KEY, firmware.CHACHA_KEY)
+    return encoder.encode_batch(
+        range(1, len(times) + 1), [int(t) for t in times],
+        [p[0] for p in picks], [p[1] for p in picks], [[30]] * len(times),
+    )
+
+
+def run_amp(rate_hz, duration_s=10.0, q_size=8, core0_us=50.0, core0_jitter_us=0.0,
+            arrivals="periodic", seed=0, policy_path=None):
+    """Simulate ``duration_s`` of traffic at ``rate_hz`` on the virtual clock.
+
+    Returns the ring statistics (occupancy, drops, dwell) together with
+    core 0 utilization and the firmware's receive counters.
+    """
+    firmware = SimulatedFirmware(policy_path or DEFAULT_POLICY, q_size=q_size)
+    firmware.set_log_level(logging.ERROR)
+    firmware.timers.enabled = False
+    rng = random.Random(seed)
+    times = arrival_times(rate_hz, duration_s, arrivals, rng)
+    frames = encode_stream(firmware, times, seed)
+    sched = EventScheduler()
+    ring = firmware.rx_queue
+    busy = [False, 0.0]  # core 0 running, busy ms
+
+    def service_ms():
+        jitter = rng.expovariate(1.0 / core0_jitter_us) if core0_jitter_us else 0.0
+        return (core0_us + jitter) / 1000.0
+
+    def core0():
+        if not firmware.core0_poll(sched.now_ms / 1000.0):
+            busy[0] = False
+            return
+        cost = service_ms()
+        busy[1] += cost
+        sched.call_later(cost, core0)
+
+    def core1(i):
+        firmware.core1_receive(frames[i], sched.now_ms / 1000.0)
+        if not busy[0]:
+            busy[0] = True
+            core0()
+
+    for i, t in enumerate(times):
+        sched.call_at(t, core1, i)
+    sched.run()
+
+    elapsed = max(sched.now_ms, duration_s * 1000.0)
+    out = ring.stats()
+    out.update({
+        "rate_hz": rate_hz,
+        "arrivals": arrivals,
+        "core0_us": core0_us,
+        "core0_jitter_us": core0_jitter_us,
+        "offered_load": round(len(times) * (core0_us + core0_jitter_us) / 1000.0 / elapsed, 4),
+        "core0_utilization": round(busy[1] / elapsed, 4),
+        "rx": dict(firmware.counters),
+    })
+    return out
+
+
+def run_threaded(rate_hz, duration_s=2.0, q_size=8, seed=0, policy_path=None):
+    """Core 1 and core 0 as real threads sharing the ring, without a lock.
+
+    Core 0 runs the Python receive path flat out, so the rate at which it
+    falls behind here is the host's, not the MCU's.
+    """
+    firmware = SimulatedFirmware(policy_path or DEFAULT_POLICY, q_size=q_size)
+    firmware.set_log_level(logging.ERROR)
+    firmware.timers.enabled = False
+    times = arrival_times(rate_hz, duration_s)
+    frames = encode_stream(firmware, times, seed)
+    done = threading.Event()
+    now = time.perf_counter
+
+    def core1():
+        t0 = now()
+        for i, t in enumerate(times):
+            delay = t0 + t / 1000.0 - now()
+            if delay > 0:
+                time.sleep(delay)
+            firmware.core1_receive(frames[i], now())
+        done.set()
+
+    def core0():
+        while True:
+            if not firmware.core0_poll(now()):
+                if done.is_set() and not len(firmware.rx_queue):
+                    return
+                time.sleep(0)
+
+    threads = [threading.Thread(target=core1), threading.Thread(target=core0)]
+    t0 = now()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out = firmware.rx_queue.stats()
+    out.update({"rate_hz": rate_hz, "wall_seconds": round(now() - t0, 3), "rx": dict(firmware.counters)})
+    return out
+
+
+def sweep(rates, q_sizes, **kwargs):
+    """run_amp() over every (q_size, rate); returns rows and the knee rate per ring size."""
+    rows, knees = [], {}
+    for q in q_sizes:
+        knees[q] = None
+        for rate in sorted(rates):
+            r = run_amp(rate, q_size=q, **kwargs)
+            rows.append(r)
+            if knees[q] is None and r["drop_rate"] > KNEE_DROP_RATE:
+                knees[q] = rate
+    return rows, knees
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dual-core AMP model of the Boreal RX_Q ring")
+    parser.add_argument("--rate", type=float, default=50.0, help="frames per second into core 1")
+    parser.add_argument("--duration", type=float, help="simulated seconds (default: 10, or 1 per --sweep point)")
+    parser.add_argument("--q-size", type=int, default=8, help="ring slots (Q_SIZE; holds Q_SIZE - 1)")
+    parser.add_argument("--core0-us", type=float, default=50.0, help="modeled core 0 cost per frame")
+    parser.add_argument("--jitter-us", type=float, default=0.0, help="mean exponential extra cost per frame")
+    parser.add_argument("--arrivals", choices=("periodic", "poisson"), default="periodic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threaded", action="store_true", help="real producer/consumer threads, host speed")
+    parser.add_argument("--sweep", action="store_true", help="find the rate at which core 0 falls behind")
+    parser.add_argument("--rates", default="5000,10000,15000,17500,19000,20000,22500")
+    parser.add_argument("--q-sizes", default="4,8,16,64")
+    args = parser.parse_args()
+
+    duration = args.duration or (1.0 if args.sweep else 10.0)
+    if args.threaded:
+        print(json.dumps(run_threaded(args.rate, duration, args.q_size, args.seed), indent=2))
+        return
+    model = {"core0_us": args.core0_us, "core0_jitter_us": args.jitter_us,
+             "arrivals": args.arrivals, "seed": args.seed}
+    if not args.sweep:
+        print(json.dumps(run_amp(args.rate, duration, args.q_size, **model), indent=2))
+        return
+
+    rows, knees = sweep(
+        [float(r) for r in args.rates.split(",")], [int(q) for q in args.q_sizes.split(",")],
+        duration_s=duration, **model,
+    )
+    print(f"{'q_size':>6}{'rate_hz':>10}{'load':>8}{'util':>8}{'drops':>8}{'drop%':>8}"
+          f"{'depth':>7}{'max':>5}{'dwell p99':>11}  (us)")
+    for r in rows:
+        print(f"{r['slots']:>6}{r['rate_hz']:>10g}{r['offered_load']:>8.3f}{r['core0_utilization']:>8.3f}"
+              f"{r['drops']:>8}{100 * r['drop_rate']:>8.2f}{r['mean_depth']:>7.2f}{r['max_depth']:>5}"
+              f"{r['dwell']['p99_us']:>11.1f}")
+    for q, rate in knees.items():
+        print(f"Q_SIZE {q}: " + (f"falls behind at {rate:g} Hz" if rate else "keeps up at every rate tried"))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@ from rclpy.lifecycle import Node, State, TransitionCallbackReturn
 from rclpy.qos import QoSProfile, ReliabilityPolicy, HistoryPolicy
 from geometry_msgs.msg import Twist, TransformStamped
 from nav_msgs.msg import Odometry
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from rcl_interfaces.msg import SetParametersResult
 from tf2_ros import TransformBroadcaster
 import struct
 import time
-import spidev
 import math
 import os
 import sys
@@ -15,9 +16,17 @@ import sys
 # Add scripts paths to allow module importing when executed via ROS 2
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import SipHash and ChaCha20
-from siphash import siphash24
-from chacha20 import chacha20_encrypt
+# Import frame encoder (ChaCha20 + SipHash) and keystream pre-generation
+from frame_codec import FrameEncoder
+from keystream_cache import KeystreamCache
+from tx_worker import TransmitWorker
+from spi_transport import make_transport
+from frame_trace import TraceWriter
+from stage_timers import StageTimers
+
+# Latency budgets the diagnostics are graded against (firmware/src/vm.c, main.c)
+RATE_LIMIT_WINDOW_MS = 20.0
+WATCHDOG_TIMEOUT_MS = 200.0
 
 
 class BorealBridge(Node):
@@ -32,6 +41,14 @@ class BorealBridge(Node):
         self.spi = None
         self.MAC_KEY = None
         self.CHACHA_KEY = None
+        self.keystream = None
+        self.encoder = None
+        self.tx_worker = None
+        self.batch_intents = False
+        self.trace = None
+        self.timers = StageTimers(("queue", "pack", "encrypt", "mac", "spi", "total"))
+        self.diagnostics_publisher = None
+        self.diagnostics_timer = None
         self.SEQ = 0
         self.x = 0.0
         self.y = 0.0
@@ -39,8 +56,40 @@ class BorealBridge(Node):
         self.vx = 0.0
         self.vy = 0.0
         self.vtheta = 0.0
+        self.last_pose_time = 0.0
+        self.cmd_deadline = 0.0
+        self.cmd_vel_timeout = 0.2
+        self.odom_keepalive = 1.0
+        self.odom_msg = None
+        self.tf_msg = None
+        self.last_published = None
+        self.last_publish_time = 0.0
         self.timer = None
 
+        # SPI transmit worker: latest /cmd_vel wins, capped at the gate's 50 Hz.
+        # Commands are keyed by intent: a newer one replaces a pending one of
+        # the same intent, and tx_mailbox_depth intents may be pending at once
+        # (1 = a new intent drops whatever is pending)
+        self.declare_parameter("max_tx_rate_hz", 50.0)
+        self.declare_parameter("tx_mailbox_depth", 1)
+        # Send commands as batch frames (pkt_t version 2) of the records
+        # that take effect
+        self.declare_parameter("batch_intents", False)
+        # "spidev:BUS.DEV", "loopback" (in-process simulator) or "file:PATH"
+        self.declare_parameter("transport", "spidev:0.0")
+        self.declare_parameter("spi_max_speed_hz", 10_000_000)
+        # Record every transmitted frame to a binary trace (frame_trace.py)
+        self.declare_parameter("trace_path", "")
+        # Per-stage latency histograms on /diagnostics; switchable at runtime
+        self.declare_parameter("latency_timers", True)
+        self.declare_parameter("diagnostics_period_s", 1.0)
+        # Odometry: publish rate, republish interval for an unchanged pose,
+        # and how long a /cmd_vel twist is dead-reckoned (firmware watchdog)
+        self.declare_parameter("odom_rate_hz", 20.0)
+        self.declare_parameter("odom_keepalive_s", 1.0)
+        self.declare_parameter("cmd_vel_timeout_s", 0.2)
+        self.add_on_set_parameters_callback(self.on_set_parameters)
+
     def on_configure(self, state: State) -> TransitionCallbackReturn:
         self.get_logger().info("BorealBridge: on_configure")
 
@@ -66,6 +115,7 @@ class BorealBridge(Node):
             Odometry, "/odom", qos_profile_sensor_data
         )
         self.tf_broadcaster = TransformBroadcaster(self)
+        self.diagnostics_publisher = self.create_publisher(DiagnosticArray, "/diagnostics", 10)
 
         # SPI Setup (from ai_agent.py)
         self.MAC_KEY = struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
@@ -80,12 +130,35 @@ class BorealBridge(Node):
             0x191A1B1C,
             0x1D1E1F20,
         )
-        self.spi = spidev.SpiDev()
-        self.spi.open(0, 0)
-        self.spi.max_speed_hz = 10_000_000
-        self.spi.mode = 0
+        self.spi = make_transport(
+            self.get_parameter("transport").value,
+            max_speed_hz=self.get_parameter("spi_max_speed_hz").value,
+        )
+        self.spi.open()
+        trace_path = self.get_parameter("trace_path").value
+        if trace_path:
+            self.trace = TraceWriter(trace_path)
+            self.get_logger().info(f"Capturing frames to {trace_path}")
         self.SEQ = 0
 
+        # Pre-generate keystream for upcoming sequence numbers (nonce = SEQ)
+        self.keystream = KeystreamCache(self.CHACHA_KEY, 40, first_nonce=self.SEQ + 1)
+        self.keystream.start()
+        self.encoder = FrameEncoder(self.MAC_KEY, self.CHACHA_KEY, self.keystream)
+        self.timers.enabled = self.get_parameter("latency_timers").value
+        self.timers.reset()
+        self.encoder.timers = self.timers
+
+        # cmd_vel_callback only enqueues; SPI I/O happens on the worker thread
+        self.batch_intents = self.get_parameter("batch_intents").value
+        self.tx_worker = TransmitWorker(
+            self.send_batch_to_boreal if self.batch_intents else self.send_to_boreal,
+            max_rate_hz=self.get_parameter("max_tx_rate_hz").value,
+            capacity=self.get_parameter("tx_mailbox_depth").value,
+            timers=self.timers,
+        )
+        self.tx_worker.start()
+
         # Odom state (stub - no encoders yet)
         self.x = 0.0
         self.y = 0.0
@@ -93,13 +166,33 @@ class BorealBridge(Node):
         self.vx = 0.0
         self.vy = 0.0
         self.vtheta = 0.0
+        self.last_pose_time = time.monotonic()
+        self.cmd_deadline = 0.0
+        self.cmd_vel_timeout = self.get_parameter("cmd_vel_timeout_s").value
+        self.odom_keepalive = self.get_parameter("odom_keepalive_s").value
+
+        # Messages are built once and updated in place; odom and TF share
+        # one header (and so one stamp) and one orientation
+        self.odom_msg = Odometry()
+        self.odom_msg.header.frame_id = "odom"
+        self.odom_msg.child_frame_id = "base_link"
+        self.tf_msg = TransformStamped()
+        self.tf_msg.header = self.odom_msg.header
+        self.tf_msg.child_frame_id = self.odom_msg.child_frame_id
+        self.tf_msg.transform.rotation = self.odom_msg.pose.pose.orientation
+        self.last_published = None
 
         return TransitionCallbackReturn.SUCCESS
 
     def on_activate(self, state: State) -> TransitionCallbackReturn:
         self.get_logger().info("BorealBridge: on_activate")
         # Timer for odom publishing
-        self.timer = self.create_timer(0.05, self.publish_odom)  # 20 Hz
+        self.timer = self.create_timer(
+            1.0 / self.get_parameter("odom_rate_hz").value, self.publish_odom
+        )
+        self.diagnostics_timer = self.create_timer(
+            self.get_parameter("diagnostics_period_s").value, self.publish_diagnostics
+        )
         return TransitionCallbackReturn.SUCCESS
 
     def on_deactivate(self, state: State) -> TransitionCallbackReturn:
@@ -107,15 +200,34 @@ class BorealBridge(Node):
         if self.timer:
             self.destroy_timer(self.timer)
             self.timer = None
+        if self.diagnostics_timer:
+            self.destroy_timer(self.diagnostics_timer)
+            self.diagnostics_timer = None
         return TransitionCallbackReturn.SUCCESS
 
     def on_cleanup(self, state: State) -> TransitionCallbackReturn:
         self.get_logger().info("BorealBridge: on_cleanup")
         self.destroy_subscription(self.subscription)
         self.destroy_publisher(self.odom_publisher)
+        self.destroy_publisher(self.diagnostics_publisher)
         del self.tf_broadcaster  # TransformBroadcaster doesn't have a destroy method
+        if self.tx_worker:
+            self.tx_worker.stop()
+            self.get_logger().info(f"SPI transmit worker: {self.tx_worker.stats()}")
+            if self.timers.enabled:
+                self.get_logger().info(f"Transmit latency:\n{self.timers.format()}")
+            self.tx_worker = None
         if self.spi:
+            self.get_logger().info(f"SPI transport: {self.spi.stats()}")
             self.spi.close()
+        if self.trace:
+            self.get_logger().info(f"Frame trace: {self.trace.records} records")
+            self.trace.close()
+            self.trace = None
+        if self.keystream:
+            self.get_logger().info(f"Keystream cache: {self.keystream.stats()}")
+            self.keystream.stop()
+            self.keystream = None
         return TransitionCallbackReturn.SUCCESS
 
     def on_shutdown(self, state: State) -> TransitionCallbackReturn:
@@ -145,62 +257,120 @@ class BorealBridge(Node):
         # Confidence: assume high
         conf_q15 = 32767  # Max Q15
 
-        # Send to Boreal
-        self.send_to_boreal(intent_id, conf_q15, [value])
+        # Hand off to the transmit worker; a newer command replaces a pending
+        # one of the same intent
+        if self.batch_intents:
+            # The policy's TURN action overrides the MOVE targets, so a MOVE
+            # record ahead of a TURN would only cost bandwidth and a VM step
+            self.tx_worker.submit((intent_id, conf_q15), key=intent_id)
+        else:
+            self.tx_worker.submit(intent_id, conf_q15, (value,), key=intent_id)
 
-        # Update odom estimate (dead reckoning)
-        dt = 0.05
+        # Update odom estimate (dead reckoning): the previous twist applied
+        # until now, the new one from now until the next command or timeout
+        now = time.monotonic()
+        self.integrate_pose(now)
         self.vx = msg.linear.x
         self.vtheta = msg.angular.z
-        self.x += self.vx * dt * math.cos(self.theta)
-        self.y += self.vx * dt * math.sin(self.theta)
-        self.theta += self.vtheta * dt
+        self.cmd_deadline = now + self.cmd_vel_timeout
+
+    def integrate_pose(self, now):
+        # Advance the pose at the current twist up to monotonic time ``now``;
+        # past cmd_deadline the firmware watchdog has stopped the motors
+        dt = min(now, self.cmd_deadline) - self.last_pose_time
+        self.last_pose_time = now
+        if dt > 0.0 and (self.vx or self.vtheta):
+            heading = self.theta + 0.5 * self.vtheta * dt  # midpoint heading
+            self.x += self.vx * dt * math.cos(heading)
+            self.y += self.vx * dt * math.sin(heading)
+            self.theta += self.vtheta * dt
+        if now >= self.cmd_deadline:
+            self.vx = self.vtheta = 0.0
 
     def send_to_boreal(self, intent_id, conf_q15, aux_data):
         self.SEQ += 1
 
-        # Encrypt-then-MAC payload
-        aux = (aux_data + [0] * 18)[:18]  # Pad to 18 elements
-
-        plaintext = struct.pack("<HH18h", intent_id, conf_q15, *aux)
-        ciphertext = chacha20_encrypt(plaintext, self.CHACHA_KEY, self.SEQ, 0)
-
-        header = struct.pack(
-            "<IHHII", 0xB0A1E1A1, 1, 1, self.SEQ, int(time.time() * 1000) & 0xFFFFFFFF
+        # Encrypt-then-MAC into the encoder's reusable SPI frame buffer
+        frame = self.encoder.encode(
+            self.SEQ, int(time.time() * 1000), intent_id, conf_q15, aux_data
         )
+        self.spi.transfer(frame)
+        if self.timers.enabled:
+            self.timers.lap("spi")
+        if self.trace is not None:
+            self.trace.write(frame)
+
+    def on_set_parameters(self, params):
+        for param in params:
+            if param.name == "latency_timers":
+                self.timers.enabled = bool(param.value)
+            elif param.name == "odom_keepalive_s":
+                self.odom_keepalive = param.value
+            elif param.name == "cmd_vel_timeout_s":
+                self.cmd_vel_timeout = param.value
+        return SetParametersResult(successful=True)
+
+    def publish_diagnostics(self):
+        # One status per stage; graded against the gate window and watchdog
+        if not self.timers.enabled:
+            return
+        msg = DiagnosticArray()
+        msg.header.stamp = self.get_clock().now().to_msg()
+        for stage, s in self.timers.snapshot().items():
+            status = DiagnosticStatus()
+            status.name = f"boreal_bridge: {stage} latency"
+            status.hardware_id = "boreal"
+            if s["max_us"] > WATCHDOG_TIMEOUT_MS * 1e3:
+                status.level = DiagnosticStatus.ERROR
+                status.message = "max exceeds watchdog timeout"
+            elif s["p999_us"] > RATE_LIMIT_WINDOW_MS * 1e3:
+                status.level = DiagnosticStatus.WARN
+                status.message = "p999 exceeds rate-limit window"
+            else:
+                status.level = DiagnosticStatus.OK
+                status.message = "OK"
+            status.values = [KeyValue(key=k, value=str(v)) for k, v in s.items()]
+            msg.status.append(status)
+        self.diagnostics_publisher.publish(msg)
+
+    def send_batch_to_boreal(self, *records):
+        self.SEQ += 1
 
-        payload = header + ciphertext
-
-        # Cryptographic MAC + SPI Frame
-        mac = siphash24(self.MAC_KEY, payload)
-        frame = bytes([0x01, 64]) + payload + mac
-        self.spi.xfer2(list(frame))
+        # All records share one nonce, MAC and SPI transfer
+        frame = self.encoder.encode_records(self.SEQ, int(time.time() * 1000), records)
+        self.spi.transfer(frame)
+        if self.timers.enabled:
+            self.timers.lap("spi")
+        if self.trace is not None:
+            self.trace.write(frame)
 
     def publish_odom(self):
         # Publish odometry (stub implementation)
-        msg = Odometry()
+        now = time.monotonic()
+        self.integrate_pose(now)
+        state = (self.x, self.y, self.theta, self.vx, self.vtheta)
+        if state == self.last_published and now - self.last_publish_time < self.odom_keepalive:
+            return  # pose unchanged; skip odom and TF until the keepalive
+        self.last_published = state
+        self.last_publish_time = now
+
+        msg = self.odom_msg
         msg.header.stamp = self.get_clock().now().to_msg()
-        msg.header.frame_id = "odom"
-        msg.child_frame_id = "base_link"
-
-        msg.pose.pose.position.x = self.x
-        msg.pose.pose.position.y = self.y
-        msg.pose.pose.orientation.z = math.sin(self.theta / 2)
-        msg.pose.pose.orientation.w = math.cos(self.theta / 2)
-
+        pose = msg.pose.pose
+        pose.position.x = self.x
+        pose.position.y = self.y
+        pose.orientation.z = math.sin(self.theta / 2)
+        pose.orientation.w = math.cos(self.theta / 2)
         msg.twist.twist.linear.x = self.vx
         msg.twist.twist.angular.z = self.vtheta
 
         if self.odom_publisher is not None and self.odom_publisher.is_activated:
             self.odom_publisher.publish(msg)
 
-        # Broadcast transform
-        t = TransformStamped()
-        t.header = msg.header
-        t.child_frame_id = msg.child_frame_id
-        t.transform.translation.x = msg.pose.pose.position.x
-        t.transform.translation.y = msg.pose.pose.position.y
-        t.transform.rotation = msg.pose.pose.orientation
+        # Broadcast transform (header and rotation are shared with msg)
+        t = self.tf_msg
+        t.transform.translation.x = self.x
+        t.transform.translation.y = self.y
         self.tf_broadcaster.sendTransform(t)
 
 
@@ -1,59 +1,244 @@
 import struct
 
+try:
+    import numpy as np
+except ImportError:  # batch engine is optional on the robot
+    np = None
 
-def ROTL32(v, c):
-    return ((v << c) & 0xFFFFFFFF) | (v >> (32 - c))
 
-
-def quarter_round(x, a, b, c, d):
-    x[a] = (x[a] + x[b]) & 0xFFFFFFFF
-    x[d] = ROTL32(x[d] ^ x[a], 16)
-    x[c] = (x[c] + x[d]) & 0xFFFFFFFF
-    x[b] = ROTL32(x[b] ^ x[c], 12)
-    x[a] = (x[a] + x[b]) & 0xFFFFFFFF
-    x[d] = ROTL32(x[d] ^ x[a], 8)
-    x[c] = (x[c] + x[d]) & 0xFFFFFFFF
-    x[b] = ROTL32(x[b] ^ x[c], 7)
+SIGMA = (0x61707865, 0x3320646E, 0x79622D32, 0x6B206574)
+_BLOCK = struct.Struct("<16I")
 
 
 def chacha20_block(key, nonce, counter):
-    x = [
-        0x61707865,
-        0x3320646E,
-        0x79622D32,
-        0x6B206574,
-        key[0],
-        key[1],
-        key[2],
-        key[3],
-        key[4],
-        key[5],
-        key[6],
-        key[7],
-        counter,
-        nonce & 0xFFFFFFFF,
-        (nonce >> 32) & 0xFFFFFFFF,
-        0,
-    ]
-    initial = list(x)
+    # The 20 rounds on 16 locals with the quarter rounds unrolled, so no
+    # list indexing or function calls per step
+    M = 0xFFFFFFFF
+    j12, j13, j14 = counter, nonce & M, (nonce >> 32) & M
+    x0, x1, x2, x3 = SIGMA
+    x4, x5, x6, x7, x8, x9, x10, x11 = key
+    x12, x13, x14, x15 = j12, j13, j14, 0
     for _ in range(10):
-        quarter_round(x, 0, 4, 8, 12)
-        quarter_round(x, 1, 5, 9, 13)
-        quarter_round(x, 2, 6, 10, 14)
-        quarter_round(x, 3, 7, 11, 15)
-        quarter_round(x, 0, 5, 10, 15)
-        quarter_round(x, 1, 6, 11, 12)
-        quarter_round(x, 2, 7, 8, 13)
-        quarter_round(x, 3, 4, 9, 14)
-    return [(x[i] + initial[i]) & 0xFFFFFFFF for i in range(16)]
+        # Column round
+        x0 = (x0 + x4) & M
+        t = x12 ^ x0
+        x12 = ((t << 16) & M) | (t >> 16)
+        x8 = (x8 + x12) & M
+        t = x4 ^ x8
+        x4 = ((t << 12) & M) | (t >> 20)
+        x0 = (x0 + x4) & M
+        t = x12 ^ x0
+        x12 = ((t << 8) & M) | (t >> 24)
+        x8 = (x8 + x12) & M
+        t = x4 ^ x8
+        x4 = ((t << 7) & M) | (t >> 25)
+        x1 = (x1 + x5) & M
+        t = x13 ^ x1
+        x13 = ((t << 16) & M) | (t >> 16)
+        x9 = (x9 + x13) & M
+        t = x5 ^ x9
+        x5 = ((t << 12) & M) | (t >> 20)
+        x1 = (x1 + x5) & M
+        t = x13 ^ x1
+        x13 = ((t << 8) & M) | (t >> 24)
+        x9 = (x9 + x13) & M
+        t = x5 ^ x9
+        x5 = ((t << 7) & M) | (t >> 25)
+        x2 = (x2 + x6) & M
+        t = x14 ^ x2
+        x14 = ((t << 16) & M) | (t >> 16)
+        x10 = (x10 + x14) & M
+        t = x6 ^ x10
+        x6 = ((t << 12) & M) | (t >> 20)
+        x2 = (x2 + x6) & M
+        t = x14 ^ x2
+        x14 = ((t << 8) & M) | (t >> 24)
+        x10 = (x10 + x14) & M
+        t = x6 ^ x10
+        x6 = ((t << 7) & M) | (t >> 25)
+        x3 = (x3 + x7) & M
+        t = x15 ^ x3
+        x15 = ((t << 16) & M) | (t >> 16)
+        x11 = (x11 + x15) & M
+        t = x7 ^ x11
+        x7 = ((t << 12) & M) | (t >> 20)
+        x3 = (x3 + x7) & M
+        t = x15 ^ x3
+        x15 = ((t << 8) & M) | (t >> 24)
+        x11 = (x11 + x15) & M
+        t = x7 ^ x11
+        x7 = ((t << 7) & M) | (t >> 25)
+        # Diagonal round
+        x0 = (x0 + x5) & M
+        t = x15 ^ x0
+        x15 = ((t << 16) & M) | (t >> 16)
+        x10 = (x10 + x15) & M
+        t = x5 ^ x10
+        x5 = ((t << 12) & M) | (t >> 20)
+        x0 = (x0 + x5) & M
+        t = x15 ^ x0
+        x15 = ((t << 8) & M) | (t >> 24)
+        x10 = (x10 + x15) & M
+        t = x5 ^ x10
+        x5 = ((t << 7) & M) | (t >> 25)
+        x1 = (x1 + x6) & M
+        t = x12 ^ x1
+        x12 = ((t << 16) & M) | (t >> 16)
+        x11 = (x11 + x12) & M
+        t = x6 ^ x11
+        x6 = ((t << 12) & M) | (t >> 20)
+        x1 = (x1 + x6) & M
+        t = x12 ^ x1
+        x12 = ((t << 8) & M) | (t >> 24)
+        x11 = (x11 + x12) & M
+        t = x6 ^ x11
+        x6 = ((t << 7) & M) | (t >> 25)
+        x2 = (x2 + x7) & M
+        t = x13 ^ x2
+        x13 = ((t << 16) & M) | (t >> 16)
+        x8 = (x8 + x13) & M
+        t = x7 ^ x8
+        x7 = ((t << 12) & M) | (t >> 20)
+        x2 = (x2 + x7) & M
+        t = x13 ^ x2
+        x13 = ((t << 8) & M) | (t >> 24)
+        x8 = (x8 + x13) & M
+        t = x7 ^ x8
+        x7 = ((t << 7) & M) | (t >> 25)
+        x3 = (x3 + x4) & M
+        t = x14 ^ x3
+        x14 = ((t << 16) & M) | (t >> 16)
+        x9 = (x9 + x14) & M
+        t = x4 ^ x9
+        x4 = ((t << 12) & M) | (t >> 20)
+        x3 = (x3 + x4) & M
+        t = x14 ^ x3
+        x14 = ((t << 8) & M) | (t >> 24)
+        x9 = (x9 + x14) & M
+        t = x4 ^ x9
+        x4 = ((t << 7) & M) | (t >> 25)
+    return (
+        (x0 + SIGMA[0]) & M, (x1 + SIGMA[1]) & M, (x2 + SIGMA[2]) & M, (x3 + SIGMA[3]) & M,
+        (x4 + key[0]) & M, (x5 + key[1]) & M, (x6 + key[2]) & M, (x7 + key[3]) & M,
+        (x8 + key[4]) & M, (x9 + key[5]) & M, (x10 + key[6]) & M, (x11 + key[7]) & M,
+        (x12 + j12) & M, (x13 + j13) & M, (x14 + j14) & M, x15,
+    )
 
 
-def chacha20_encrypt(data, key_bytes, nonce, counter=0):
+def chacha20_keystream(key_bytes, nonce, length, counter=0):
     key = struct.unpack("<8I", key_bytes)
-    out = bytearray()
-    for i in range(0, len(data), 64):
-        block = struct.pack("<16I", *chacha20_block(key, nonce, counter))
-        counter += 1
-        chunk = data[i : i + 64]
-        out.extend(b ^ k for b, k in zip(chunk, block))
-    return bytes(out)
+    blocks = []
+    for _ in range((length + 63) // 64):
+        blocks.append(_BLOCK.pack(*chacha20_block(key, nonce, counter)))
+        counter = (counter + 1) & 0xFFFFFFFF
+    return b"".join(blocks)[:length]
+
+
+def keystream_xor(data, ks):
+    # Whole-buffer XOR against the keystream instead of a per-byte generator
+    n = len(data)
+    return (
+        int.from_bytes(data, "little") ^ int.from_bytes(ks[:n], "little")
+    ).to_bytes(n, "little")
+
+
+def chacha20_encrypt(data, key_bytes, nonce, counter=0):
+    return keystream_xor(data, chacha20_keystream(key_bytes, nonce, len(data), counter))
+
+
+# ---------------------------------------------------------------------------
+# NumPy batch engine: the 20 rounds run on uint32 lanes, one lane per
+# (nonce, block counter) pair, so many frames share each Python-level op.
+# ---------------------------------------------------------------------------
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("NumPy is required for the batch ChaCha20 engine")
+
+
+def _rotl32_np(v, c):
+    return (v << c) | (v >> (32 - c))
+
+
+def _quarter_round_np(x, a, b, c, d):
+    x[a] += x[b]
+    x[d] = _rotl32_np(x[d] ^ x[a], 16)
+    x[c] += x[d]
+    x[b] = _rotl32_np(x[b] ^ x[c], 12)
+    x[a] += x[b]
+    x[d] = _rotl32_np(x[d] ^ x[a], 8)
+    x[c] += x[d]
+    x[b] = _rotl32_np(x[b] ^ x[c], 7)
+
+
+def chacha20_keystream_batch(key_bytes, nonces, nblocks=1, counter=0):
+    """Keystream for every nonce in ``nonces``.
+
+    Returns a ``(len(nonces), nblocks * 64)`` uint8 array; row ``i`` equals
+    ``chacha20_keystream(key_bytes, nonces[i], nblocks * 64, counter)``.
+    The block counter wraps at 32 bits like ``state[12]++`` in firmware.
+    """
+    _require_numpy()
+    nonces = np.asarray(nonces, dtype=np.uint64).reshape(-1)
+    n = nonces.shape[0]
+    counters = (counter + np.arange(nblocks, dtype=np.uint64)) & 0xFFFFFFFF
+
+    state = np.empty((16, n, nblocks), dtype=np.uint32)
+    state[0:4] = np.array(SIGMA, dtype=np.uint32)[:, None, None]
+    state[4:12] = np.array(struct.unpack("<8I", key_bytes), dtype=np.uint32)[
+        :, None, None
+    ]
+    state[12] = counters.astype(np.uint32)[None, :]
+    state[13] = (nonces & 0xFFFFFFFF).astype(np.uint32)[:, None]
+    state[14] = (nonces >> 32).astype(np.uint32)[:, None]
+    state[15] = 0
+
+    lanes = state.reshape(16, -1)
+    x = [row.copy() for row in lanes]
+    for _ in range(10):
+        _quarter_round_np(x, 0, 4, 8, 12)
+        _quarter_round_np(x, 1, 5, 9, 13)
+        _quarter_round_np(x, 2, 6, 10, 14)
+        _quarter_round_np(x, 3, 7, 11, 15)
+        _quarter_round_np(x, 0, 5, 10, 15)
+        _quarter_round_np(x, 1, 6, 11, 12)
+        _quarter_round_np(x, 2, 7, 8, 13)
+        _quarter_round_np(x, 3, 4, 9, 14)
+
+    out = np.stack(x) + lanes
+    out = np.ascontiguousarray(out.T, dtype="<u4")
+    return out.view(np.uint8).reshape(n, nblocks * 64)
+
+
+def _as_frame_matrix(data):
+    if isinstance(data, np.ndarray):
+        buf = data
+    else:
+        data = list(data)
+        if not data:
+            return np.empty((0, 0), dtype=np.uint8)
+        width = len(data[0])
+        if any(len(d) != width for d in data):
+            raise ValueError("batch plaintexts must all have the same length")
+        buf = np.frombuffer(b"".join(data), dtype=np.uint8).reshape(len(data), width)
+    if buf.dtype != np.uint8 or buf.ndim != 2:
+        raise ValueError("batch data must be a 2-D uint8 array or equal-length bytes")
+    return buf
+
+
+def chacha20_encrypt_batch(data, key_bytes, nonces, counter=0):
+    """Encrypt (or decrypt) N equal-length buffers under N nonces.
+
+    ``data`` is an ``(N, L)`` uint8 array or a sequence of N bytes objects
+    of length L. Returns a new ``(N, L)`` uint8 array whose rows match
+    ``chacha20_encrypt(data[i], key_bytes, nonces[i], counter)``.
+    """
+    _require_numpy()
+    buf = _as_frame_matrix(data)
+    n, length = buf.shape
+    if len(nonces) != n:
+        raise ValueError("need exactly one nonce per buffer")
+    if n == 0 or length == 0:
+        return buf.copy()
+    ks = chacha20_keystream_batch(key_bytes, nonces, (length + 63) // 64, counter)
+    return buf ^ ks[:, :length]
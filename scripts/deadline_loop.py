@@ -0,0 +1,91 @@
+import asyncio
+import inspect
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stage_timers import LatencyHistogram
+
+
+class DeadlineLoop:
+    """Periodic asyncio loop on absolute monotonic deadlines.
+
+    Tick k is due at ``start + k * period``, so the time a tick takes never
+    pushes later ticks back. A tick that ends after the next deadline is an
+    overrun. With ``overrun="skip"`` the deadlines already missed are dropped
+    and the loop waits for the next one. With ``"catch-up"`` they run back
+    to back, at most ``max_catch_up`` of them, and any beyond that are
+    skipped. ``spin_s`` polls the last stretch before each deadline to get
+    below the event loop's timer resolution. The poll yields to the event
+    loop on every pass, but still keeps a core busy, so it is off by default.
+    """
+
+    def __init__(self, rate_hz, overrun="skip", max_catch_up=3, spin_s=0.0):
+        if overrun not in ("skip", "catch-up"):
+            raise ValueError(f"overrun policy must be 'skip' or 'catch-up', not {overrun!r}")
+        self.period = 1.0 / rate_hz
+        self.overrun = overrun
+        self.max_catch_up = max_catch_up
+        self.spin_s = spin_s
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter = LatencyHistogram()  # tick start - deadline, ns
+        self.busy = LatencyHistogram()  # tick duration, ns
+        self.start = None
+        self.elapsed = 0.0
+        self._running = False
+
+    def stop(self):
+        self._running = False
+
+    async def run(self, tick, duration_s=None):
+        """Call ``tick(k, deadline)`` every period (awaited if it is a coroutine)."""
+        loop = asyncio.get_running_loop()
+        period = self.period
+        self.start = start = loop.time()
+        end_k = None if duration_s is None else int(duration_s / period)
+        k = 0
+        self._running = True
+        while self._running and (end_k is None or k < end_k):
+            deadline = start + k * period
+            delay = deadline - loop.time()
+            if delay > self.spin_s:
+                await asyncio.sleep(delay - self.spin_s)
+            while loop.time() < deadline:
+                await asyncio.sleep(0)
+
+            t0 = loop.time()
+            result = tick(k, deadline)
+            if inspect.isawaitable(result):
+                await result
+            t1 = loop.time()
+            self.jitter.record(max(0, int((t0 - deadline) * 1e9)))
+            self.busy.record(int((t1 - t0) * 1e9))
+            self.ticks += 1
+            k += 1
+
+            late = t1 - (start + k * period)
+            if late > 0:
+                self.overruns += 1
+                missed = int(late // period) + 1  # deadlines already in the past
+                drop = missed if self.overrun == "skip" else max(0, missed - self.max_catch_up)
+                k += drop
+                self.skipped += drop
+        self._running = False
+        self.elapsed = loop.time() - start
+
+    def stats(self):
+        # loop.time() is time.monotonic() on the default event loop
+        elapsed = time.monotonic() - self.start if self._running else self.elapsed
+        return {
+            "rate_hz": round(1.0 / self.period, 3),
+            "ticks": self.ticks,
+            "achieved_hz": round(self.ticks / elapsed, 3) if elapsed else None,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "jitter": self.jitter.summary(),
+            "tick_time": self.busy.summary(),
+        }
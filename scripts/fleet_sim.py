@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Fleet load/soak test: many SimulatedFirmware robots across a process pool.
+
+Every robot gets its own keys, intent stream and sequence space, derived
+from the fleet seed and its id. Robots are grouped into shards; a worker
+runs a shard on the virtual clock and returns only summed counters,
+per-robot anomalies and exported latency histograms, so IPC stays at a
+few KB per shard whatever the fleet size.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from run_demo import DEFAULT_POLICY, SimulatedFirmware, run_simulation
+from stage_timers import StageTimers
+
+COUNTERS = ("accepted", "denied", "auth_failed", "rejected")
+REPLAY_COUNTERS = ("duplicates", "too_old")
+
+
+def robot_keys(fleet_seed, robot_id):
+    # Per-robot MAC (128-bit) and ChaCha20 (256-bit) keys
+    digest = hashlib.blake2b(
+        f"{fleet_seed}:{robot_id}".encode(), digest_size=48, person=b"boreal-fleet"
+    ).digest()
+    return digest[:16], digest[16:]
+
+
+def robot_seed(fleet_seed, robot_id):
+    return int.from_bytes(
+        hashlib.blake2b(f"{fleet_seed}:{robot_id}".encode(), digest_size=8, person=b"boreal-intent").digest(),
+        "little",
+    )
+
+
+def run_shard(shard):
+    """Simulate robots ``shard["robots"]`` one after another; returns aggregates."""
+    logging.getLogger("boreal.sim").setLevel(logging.ERROR)
+    totals = dict.fromkeys(COUNTERS + REPLAY_COUNTERS + ("frames_sent", "watchdog_trips"), 0)
+    timers = StageTimers()
+    anomalies = []
+    sim_seconds = 0.0
+    t0 = time.perf_counter()
+    for robot_id in shard["robots"]:
+        mac_key, chacha_key = robot_keys(shard["seed"], robot_id)
+        fw = SimulatedFirmware(shard["policy"], mac_key=mac_key, chacha_key=chacha_key)
+        fw.timers.enabled = shard["timers"]
+        summary = run_simulation(
+            shard["duration_s"], robot_seed(shard["seed"], robot_id), firmware=fw,
+            ai_period_ms=shard["period_ms"], replay_rate=shard["replay_rate"],
+            corrupt_rate=shard["corrupt_rate"],
+        )
+        for key in COUNTERS:
+            totals[key] += summary["rx"][key]
+        for key in REPLAY_COUNTERS:
+            totals[key] += summary["replay"][key]
+        totals["frames_sent"] += summary["frames_sent"]
+        totals["watchdog_trips"] += summary["watchdog_trips"]
+        sim_seconds += summary["sim_seconds"]
+        if fw.timers.enabled:
+            timers.merge(fw.timers.export())
+        if summary["watchdog_trips"] or summary["rx"]["auth_failed"] > summary["faults"]["corrupted"]:
+            anomalies.append({"robot": robot_id, "rx": summary["rx"], "watchdog_trips": summary["watchdog_trips"]})
+    return {
+        "totals": totals,
+        "robot_seconds": sim_seconds,
+        "busy_seconds": time.perf_counter() - t0,
+        "latency": timers.export(),
+        "anomalies": anomalies,
+    }
+
+
+def run_fleet(robots, duration_s, seed=0, workers=None, rate_hz=50.0, shards=None,
+              policy_path=None, timers=True, replay_rate=0.0, corrupt_rate=0.0):
+    """Simulate ``robots`` robots for ``duration_s`` simulated seconds each.
+
+    Robots are dealt round-robin into ``shards`` (default 4 per worker) and
+    run on a pool of ``workers`` processes (default: all cores). Returns a
+    fleet summary with summed counters and merged latency histograms.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = max(1, min(robots, shards or 4 * workers))
+    tasks = [
+        {
+            "robots": range(i, robots, shards),
+            "seed": seed,
+            "duration_s": duration_s,
+            "period_ms": max(1, round(1000.0 / rate_hz)),
+            "policy": policy_path or DEFAULT_POLICY,
+            "timers": timers,
+            "replay_rate": replay_rate,
+            "corrupt_rate": corrupt_rate,
+        }
+        for i in range(shards)
+    ]
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        results = [run_shard(t) for t in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(run_shard, tasks))
+    wall = time.perf_counter() - t0
+
+    totals = dict.fromkeys(results[0]["totals"], 0)
+    latency = StageTimers()
+    anomalies = []
+    robot_seconds = busy = 0.0
+    for r in results:
+        for key, value in r["totals"].items():
+            totals[key] += value
+        latency.merge(r["latency"])
+        anomalies += r["anomalies"]
+        robot_seconds += r["robot_seconds"]
+        busy += r["busy_seconds"]
+    return {
+        "robots": robots,
+        "workers": workers,
+        "shards": shards,
+        "rate_hz": rate_hz,
+        "sim_seconds": duration_s,
+        "wall_seconds": round(wall, 3),
+        "frames_per_s": round(totals["frames_sent"] / wall, 1) if wall else None,
+        # > 1: this machine could run the whole fleet live at rate_hz
+        "realtime_factor": round(robot_seconds / robots / wall, 2) if wall else None,
+        "parallel_efficiency": round(busy / wall / workers, 3) if wall else None,
+        "totals": totals,
+        "latency": latency.snapshot() if timers else None,
+        "anomalies": sorted(anomalies, key=lambda a: a["robot"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of Boreal robots on a process pool")
+    parser.add_argument("--robots", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60.0, help="simulated seconds per robot")
+    parser.add_argument("--rate", type=float, default=50.0, help="frames per second per robot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--shards", type=int, help="work units (default: 4 per worker)")
+    parser.add_argument("--policy", help="policy DSL for every robot")
+    parser.add_argument("--no-timers", action="store_true", help="disable per-stage latency timers")
+    parser.add_argument("--replay-rate", type=float, default=0.0, help="fraction of frames replayed")
+    parser.add_argument("--corrupt-rate", type=float, default=0.0, help="fraction of frames corrupted")
+    args = parser.parse_args()
+
+    summary = run_fleet(
+        args.robots, args.duration, args.seed, args.workers, args.rate, args.shards,
+        args.policy, not args.no_timers, args.replay_rate, args.corrupt_rate,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
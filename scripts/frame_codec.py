@@ -0,0 +1,253 @@
+import struct
+
+from chacha20 import chacha20_keystream, chacha20_keystream_batch, keystream_xor
+from siphash import siphash24, siphash24_batch
+
+try:
+    import numpy as np
+except ImportError:  # batch encode/decode is optional on the robot
+    np = None
+
+# SPI frame = [cmd, len] + pkt_t (firmware/include/protocol.h)
+FRAME_CMD = 0x01
+MAGIC_WORD = 0xB0A1E1A1
+PKT_LEN = 64
+FRAME_LEN = 2 + PKT_LEN
+AUX_SLOTS = 18
+
+# Byte offsets into the SPI frame buffer
+PKT_OFF = 2  # start of pkt_t
+BODY_OFF = 18  # intent_id: start of the encrypted region
+AUX_OFF = 22  # aux[18]
+MAC_OFF = 58  # mac, over pkt_t[0:56]
+BODY_LEN = MAC_OFF - BODY_OFF
+
+SPI_HEADER = struct.Struct("<BBIHHII")  # cmd, len, magic, version, model_id, seq, t_ms
+PKT_HEADER = struct.Struct("<IHHII")  # magic, version, model_id, seq, t_ms
+INTENT = struct.Struct("<HH")  # intent_id, conf_q15
+AUX = struct.Struct("<h")
+
+ZERO_AUX = bytes(2 * AUX_SLOTS)
+ZERO_BODY = bytes(BODY_LEN)
+
+# pkt_t.version selects the body layout (protocol.h): one intent, or up to
+# BATCH_MAX (intent_id, conf_q15) records under one nonce and MAC
+VERSION_SINGLE = 1
+VERSION_BATCH = 2
+BATCH_MAX = 9
+BATCH_REC = struct.Struct("<HH")
+BATCH_REC_OFF = BODY_OFF + 2  # after count, reserved
+
+# pkt_t as a NumPy record, for batch encode/decode
+PKT_DTYPE = None if np is None else np.dtype([
+    ("magic", "<u4"), ("version", "<u2"), ("model_id", "<u2"), ("seq", "<u4"),
+    ("t_ms", "<u4"), ("intent_id", "<u2"), ("conf_q15", "<u2"),
+    ("aux", "<i2", (AUX_SLOTS,)), ("mac", "<u8"),
+])
+
+
+class _FrameBuffer:
+    """Preallocated SPI frame laid out like ``[cmd, len] + pkt_t``.
+
+    The memoryview windows are created once so encoding and decoding only
+    write into ``buf``; no lists, dicts or tuples are built per frame.
+    """
+
+    def __init__(self, mac_key, chacha_key, keystream=None):
+        self.mac_key = mac_key
+        self.chacha_key = chacha_key
+        self.keystream = keystream  # optional KeystreamCache, nonce = seq
+        self.timers = None  # optional StageTimers (stage_timers.py)
+
+        self.buf = bytearray(FRAME_LEN)
+        self.view = memoryview(self.buf)
+        self.pkt = self.view[PKT_OFF:]
+        self.signed = self.view[PKT_OFF:MAC_OFF]
+        self.body = self.view[BODY_OFF:MAC_OFF]
+        self.mac = self.view[MAC_OFF:]
+
+    def _crypt_body(self, seq):
+        if self.keystream is not None:
+            ks = self.keystream.take(seq)
+        else:
+            ks = chacha20_keystream(self.chacha_key, seq, BODY_LEN)
+        self.body[:] = keystream_xor(self.body, ks)
+
+
+class FrameEncoder(_FrameBuffer):
+    def __init__(self, mac_key, chacha_key, keystream=None, version=1, model_id=1):
+        super().__init__(mac_key, chacha_key, keystream)
+        self.version = version
+        self.model_id = model_id
+
+    def encode(self, seq, t_ms, intent_id, conf_q15, aux=()):
+        """Build an Encrypt-then-MAC frame in place and return ``buf``.
+
+        The returned bytearray is reused by the next call; hand it straight
+        to the SPI layer (``spi.xfer2(buf)``) before encoding again.
+        """
+        tm = self.timers
+        if tm is not None and tm.enabled:
+            tm.start()
+        else:
+            tm = None
+        buf = self.buf
+        SPI_HEADER.pack_into(
+            buf, 0, FRAME_CMD, PKT_LEN, MAGIC_WORD, self.version, self.model_id,
+            seq, t_ms & 0xFFFFFFFF,
+        )
+        INTENT.pack_into(buf, BODY_OFF, intent_id, conf_q15)
+        buf[AUX_OFF:MAC_OFF] = ZERO_AUX
+        for i in range(min(len(aux), AUX_SLOTS)):
+            AUX.pack_into(buf, AUX_OFF + 2 * i, aux[i])
+        if tm:
+            tm.lap("pack")
+
+        self._crypt_body(seq)
+        if tm:
+            tm.lap("encrypt")
+        self.mac[:] = siphash24(self.mac_key, self.signed)
+        if tm:
+            tm.lap("mac")
+        return buf
+
+    def encode_records(self, seq, t_ms, records):
+        """Like encode(), for a batch frame of ``(intent_id, conf_q15)`` records.
+
+        Up to BATCH_MAX records share one header, nonce and MAC, and the
+        firmware evaluates them in order.
+        """
+        if len(records) > BATCH_MAX:
+            raise ValueError(f"a batch frame holds at most {BATCH_MAX} records")
+        tm = self.timers
+        if tm is not None and tm.enabled:
+            tm.start()
+        else:
+            tm = None
+        buf = self.buf
+        SPI_HEADER.pack_into(
+            buf, 0, FRAME_CMD, PKT_LEN, MAGIC_WORD, VERSION_BATCH, self.model_id,
+            seq, t_ms & 0xFFFFFFFF,
+        )
+        buf[BODY_OFF:MAC_OFF] = ZERO_BODY
+        buf[BODY_OFF] = len(records)
+        for i, (intent_id, conf_q15) in enumerate(records):
+            BATCH_REC.pack_into(buf, BATCH_REC_OFF + BATCH_REC.size * i, intent_id, conf_q15)
+        if tm:
+            tm.lap("pack")
+
+        self._crypt_body(seq)
+        if tm:
+            tm.lap("encrypt")
+        self.mac[:] = siphash24(self.mac_key, self.signed)
+        if tm:
+            tm.lap("mac")
+        return buf
+
+    def encode_batch(self, seq, t_ms, intent_id, conf_q15, aux=None):
+        """Vectorized encode() of N frames (needs NumPy).
+
+        Arguments are length-N arrays, ``aux`` an optional ``(N, k)`` array
+        with k <= 18. Returns an ``(N, 64)`` uint8 array of ``pkt_t``
+        records (no SPI header); row ``i`` equals ``encode(...)[2:]``.
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for encode_batch")
+        seq = np.asarray(seq, dtype=np.uint32).reshape(-1)
+        rec = np.zeros(len(seq), dtype=PKT_DTYPE)
+        rec["magic"] = MAGIC_WORD
+        rec["version"] = self.version
+        rec["model_id"] = self.model_id
+        rec["seq"] = seq
+        rec["t_ms"] = np.asarray(t_ms, dtype=np.int64) & 0xFFFFFFFF
+        rec["intent_id"] = intent_id
+        rec["conf_q15"] = conf_q15
+        if aux is not None:
+            aux = np.asarray(aux, dtype=np.int16).reshape(len(seq), -1)[:, :AUX_SLOTS]
+            rec["aux"][:, : aux.shape[1]] = aux
+
+        rows = rec.view(np.uint8).reshape(len(seq), PKT_LEN)
+        body = BODY_OFF - PKT_OFF
+        rows[:, body : body + BODY_LEN] ^= chacha20_keystream_batch(self.chacha_key, seq)[:, :BODY_LEN]
+        rows[:, body + BODY_LEN :] = siphash24_batch(self.mac_key, rows[:, : body + BODY_LEN])
+        return rows
+
+
+def unpack_records(body):
+    """Records of a decrypted batch body (``pkt_t`` bytes 16..56), or None if malformed."""
+    count = body[0]
+    if count > BATCH_MAX:
+        return None
+    return [BATCH_REC.unpack_from(body, 2 + BATCH_REC.size * i) for i in range(count)]
+
+
+class Packet:
+    """Decoded ``pkt_t`` fields; ``aux`` is an int16 view of the aux array.
+
+    For a batch frame ``records`` holds its ``(intent_id, conf_q15)``
+    tuples (None if malformed) and ``intent_id``/``conf_q15`` are not used.
+    """
+
+    __slots__ = (
+        "magic", "version", "model_id", "seq", "t_ms", "intent_id", "conf_q15", "aux", "records",
+    )
+
+    def __init__(self, aux=None):
+        self.magic = self.version = self.model_id = self.seq = self.t_ms = 0
+        self.intent_id = self.conf_q15 = 0
+        self.aux = aux
+        self.records = None
+
+
+class FrameDecoder(_FrameBuffer):
+    """Authenticate and decrypt frames into a preallocated buffer.
+
+    ``decode()`` accepts a full SPI frame or a bare 64-byte ``pkt_t``, or no
+    argument when ``buf`` was already filled in place (e.g. ``readinto``).
+    It returns the reused ``packet`` record, or None when the frame is
+    malformed or fails authentication.
+    """
+
+    def __init__(self, mac_key, chacha_key, keystream=None):
+        super().__init__(mac_key, chacha_key, keystream)
+        # Host and MCU are both little-endian, matching pkt_t's wire order
+        self.packet = Packet(self.view[AUX_OFF:MAC_OFF].cast("h"))
+
+    def decode(self, frame=None):
+        tm = self.timers
+        if tm is not None and tm.enabled:
+            tm.start()
+        else:
+            tm = None
+        if frame is not None:
+            n = len(frame)
+            if n == FRAME_LEN:
+                self.view[:] = frame
+            elif n == PKT_LEN:
+                self.pkt[:] = frame
+                self.buf[0] = FRAME_CMD
+                self.buf[1] = PKT_LEN
+            else:
+                return None
+        if self.buf[0] != FRAME_CMD or self.buf[1] != PKT_LEN:
+            return None
+
+        # 1. Authenticate (MAC over first 56 bytes of pkt_t)
+        authentic = siphash24(self.mac_key, self.signed) == self.mac
+        if tm:
+            tm.lap("mac_verify")
+        if not authentic:
+            return None
+
+        # 2. Decrypt intent_id, conf_q15, aux[18] in place
+        p = self.packet
+        p.magic, p.version, p.model_id, p.seq, p.t_ms = PKT_HEADER.unpack_from(self.buf, PKT_OFF)
+        self._crypt_body(p.seq)
+        if p.version == VERSION_BATCH:
+            p.records = unpack_records(self.body)
+        else:
+            p.intent_id, p.conf_q15 = INTENT.unpack_from(self.buf, BODY_OFF)
+            p.records = None
+        if tm:
+            tm.lap("decrypt")
+        return p
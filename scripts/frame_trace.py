@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""Append-only binary capture of host -> Boreal frames, with replay.
+
+A trace is a 64-byte header followed by fixed 72-byte records: the
+capture time (``time.time_ns()``) and the raw, still encrypted ``pkt_t``.
+Every ``index_every`` records the writer appends ``(first t_ns, min seq,
+max seq)`` for the finished block to a sidecar ``PATH.idx``, so a reader
+can mmap a multi-GB capture and seek by time or seq while touching only a
+few pages. A missing or short index is rebuilt from the records.
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from frame_codec import FRAME_CMD, FRAME_LEN, PKT_LEN, PKT_DTYPE
+
+try:
+    import numpy as np
+except ImportError:  # capture works without NumPy; reading needs it
+    np = None
+
+TRACE_MAGIC = b"BORTRACE"
+TRACE_VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")  # magic, version, record size, index_every, created ns
+HEADER_LEN = 64
+RECORD = struct.Struct("<Q64s")  # capture t_ns, pkt_t
+RECORD_LEN = RECORD.size
+INDEX = struct.Struct("<QII")  # first t_ns, min seq, max seq of one block
+SEQ_OFF = 8 + 8  # pkt_t.seq within a record
+DEFAULT_INDEX_EVERY = 1024
+
+REC_DTYPE = None if np is None else np.dtype([("t_ns", "<u8"), ("pkt", PKT_DTYPE)])
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def _pkt_bytes(frame):
+    # Accept a full SPI frame or a bare pkt_t
+    if len(frame) == FRAME_LEN:
+        if frame[0] != FRAME_CMD or frame[1] != PKT_LEN:
+            raise ValueError("not a pkt_t SPI frame")
+        return bytes(frame[2:])
+    if len(frame) == PKT_LEN:
+        return bytes(frame)
+    raise ValueError(f"frame must be {PKT_LEN} or {FRAME_LEN} bytes, got {len(frame)}")
+
+
+def _block_entries(t_ns, seq, index_every):
+    # One INDEX entry per whole block of the given columns
+    entries = []
+    for i in range(0, len(seq) - index_every + 1, index_every):
+        s = seq[i : i + index_every]
+        entries.append((int(t_ns[i]), int(s.min()), int(s.max())))
+    return entries
+
+
+class TraceWriter:
+    """Append frames to a trace; reopening an existing trace continues it.
+
+    A record torn by a crash is truncated away on reopen, and the index is
+    rebuilt if it is behind the records.
+    """
+
+    def __init__(self, path, index_every=DEFAULT_INDEX_EVERY, buffering=1 << 16):
+        self.path = path
+        self.records = 0
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_LEN
+        if exists:
+            with open(path, "rb") as f:
+                index_every = _read_header(f.read(HEADER_LEN), path)
+            size = os.path.getsize(path)
+            self.records = (size - HEADER_LEN) // RECORD_LEN
+            if (size - HEADER_LEN) % RECORD_LEN:
+                os.truncate(path, HEADER_LEN + self.records * RECORD_LEN)
+        self.index_every = index_every
+
+        self.f = open(path, "ab", buffering=buffering)
+        if not exists:
+            self.f.truncate(0)
+            self.f.write(HEADER.pack(
+                TRACE_MAGIC, TRACE_VERSION, RECORD_LEN, index_every, time.time_ns()
+            ).ljust(HEADER_LEN, b"\0"))
+
+        # Blocks already indexed; the tail block is re-read to resume min/max
+        self._block_t = 0
+        self._block_lo = self._block_hi = None
+        if self.records:
+            reader = FrameTrace(path)
+            reader.write_index()
+            tail = self.records - self.records % index_every
+            for i in range(tail, self.records):
+                self._track(reader.t_ns(i), reader.seq(i), i)
+            reader.close()
+        else:
+            with open(index_path(path), "wb"):
+                pass
+        self.idx = open(index_path(path), "ab")
+
+    def _track(self, t_ns, seq, n):
+        if n % self.index_every == 0:
+            self._block_t, self._block_lo, self._block_hi = t_ns, seq, seq
+        elif seq < self._block_lo:
+            self._block_lo = seq
+        elif seq > self._block_hi:
+            self._block_hi = seq
+
+    def write(self, frame, t_ns=None):
+        """Record one SPI frame or bare ``pkt_t`` (copied, so buffers may be reused)."""
+        if t_ns is None:
+            t_ns = time.time_ns()
+        pkt = _pkt_bytes(frame)
+        seq = struct.unpack_from("<I", pkt, 8)[0]
+        self.f.write(RECORD.pack(t_ns, pkt))
+        self._track(t_ns, seq, self.records)
+        self.records += 1
+        if self.records % self.index_every == 0:
+            self.idx.write(INDEX.pack(self._block_t, self._block_lo, self._block_hi))
+
+    def extend(self, records):
+        """Append a ``REC_DTYPE`` array (e.g. a FrameTrace slice) in bulk."""
+        records = np.ascontiguousarray(records, dtype=REC_DTYPE)
+        k = self.index_every
+        head = min(len(records), -self.records % k)
+        for rec in records[:head]:
+            self.write(rec["pkt"].tobytes(), int(rec["t_ns"]))
+        body = records[head:]
+        whole = len(body) - len(body) % k
+        if whole:
+            self.f.write(body[:whole].tobytes())
+            self.idx.write(b"".join(
+                INDEX.pack(*e) for e in _block_entries(body["t_ns"], body["pkt"]["seq"], k)
+            ))
+            self.records += whole
+        for rec in body[whole:]:
+            self.write(rec["pkt"].tobytes(), int(rec["t_ns"]))
+
+    def flush(self):
+        self.f.flush()
+        self.idx.flush()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.idx.close()
+            self.f = self.idx = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(data, path):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: truncated trace header")
+    magic, version, rec_len, index_every, _ = HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION or rec_len != RECORD_LEN:
+        raise ValueError(f"{path}: not a version {TRACE_VERSION} frame trace")
+    return index_every
+
+
+class FrameTrace:
+    """Read-only, memory-mapped view of a trace (needs NumPy).
+
+    ``records`` is a zero-copy ``REC_DTYPE`` array over the mapping, so
+    slicing it only pages in the records actually used.
+    """
+
+    def __init__(self, path):
+        if np is None:
+            raise RuntimeError("NumPy is required to read frame traces")
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_LEN)
+            self.index_every = _read_header(header, path)
+            self.created_ns = HEADER.unpack_from(header)[4]
+            size = os.fstat(f.fileno()).st_size
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        n = (size - HEADER_LEN) // RECORD_LEN
+        self.records = np.frombuffer(self.mm, dtype=REC_DTYPE, count=n, offset=HEADER_LEN)
+        self._index = self._load_index()
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        self.records = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def t_ns(self, i):
+        return struct.unpack_from("<Q", self.mm, HEADER_LEN + i * RECORD_LEN)[0]
+
+    def seq(self, i):
+        return struct.unpack_from("<I", self.mm, HEADER_LEN + i * RECORD_LEN + SEQ_OFF)[0]
+
+    def _load_index(self):
+        # Index entries for every whole block; rebuild the ones the file lacks
+        blocks = len(self) // self.index_every
+        try:
+            with open(index_path(self.path), "rb") as f:
+                data = f.read(blocks * INDEX.size)
+                self._index_trailing = bool(f.read(1))
+        except FileNotFoundError:
+            data = b""
+            self._index_trailing = False
+        index = [INDEX.unpack_from(data, i) for i in range(0, len(data) - INDEX.size + 1, INDEX.size)]
+        self.index_rebuilt = len(index) < blocks
+        if self.index_rebuilt:
+            rest = self.records[len(index) * self.index_every : blocks * self.index_every]
+            index += _block_entries(rest["t_ns"], rest["pkt"]["seq"], self.index_every)
+        return index
+
+    def write_index(self):
+        """Rewrite ``PATH.idx`` if it is missing or out of step with the records."""
+        if self.index_rebuilt or self._index_trailing:
+            with open(index_path(self.path), "wb") as f:
+                f.write(b"".join(INDEX.pack(*e) for e in self._index))
+            self.index_rebuilt = self._index_trailing = False
+
+    def find_time(self, t_ns):
+        """Index of the first record captured at or after ``t_ns``."""
+        k = self.index_every
+        block = max(bisect.bisect_right(self._index, (t_ns,)) - 1, 0)
+        lo, hi = block * k, len(self)
+        if block + 1 < len(self._index):
+            hi = (block + 1) * k
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.t_ns(mid) < t_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_seq(self, seq):
+        """Index of the first record with a seq >= ``seq`` (len() if none).
+
+        Blocks whose indexed max seq is below ``seq`` are skipped without
+        being read, so this holds across host restarts that reset seq.
+        """
+        k = self.index_every
+        start = len(self._index) * k
+        for b, (_, _, hi) in enumerate(self._index):
+            if hi >= seq:
+                start = b * k
+                break
+        stop = min(start + k, len(self))
+        hits = np.flatnonzero(self.records["pkt"]["seq"][start:stop] >= seq)
+        return start + int(hits[0]) if len(hits) else len(self)
+
+    def frames(self, start=0, stop=None):
+        """``(N, 64)`` uint8 view of the ``pkt_t`` records in ``[start, stop)``."""
+        rows = self.records[start:stop].view(np.uint8).reshape(-1, RECORD_LEN)
+        return rows[:, 8:]
+
+    def summary(self):
+        n = len(self)
+        out = {
+            "path": self.path,
+            "records": n,
+            "bytes": HEADER_LEN + n * RECORD_LEN,
+            "index_every": self.index_every,
+            "index_blocks": len(self._index),
+            "index_rebuilt": self.index_rebuilt,
+        }
+        if n:
+            t0, t1 = self.t_ns(0), self.t_ns(n - 1)
+            out.update(
+                first_t_ns=t0,
+                duration_s=(t1 - t0) / 1e9,
+                first_seq=self.seq(0),
+                last_seq=self.seq(n - 1),
+            )
+        return out
+
+
+def replay(trace, firmware, start=0, stop=None, speed=1.0, batch=4096):
+    """Feed records ``[start, stop)`` of ``trace`` into ``firmware``.
+
+    ``speed`` scales the recorded inter-frame gaps (1.0 = as captured);
+    ``speed=0`` replays flat out through ``process_frames`` in batches.
+    Returns the number of frames fed.
+    """
+    stop = len(trace) if stop is None else min(stop, len(trace))
+    if start >= stop:
+        return 0
+    if not speed:
+        for i in range(start, stop, batch):
+            firmware.process_frames(np.ascontiguousarray(trace.frames(i, min(i + batch, stop))))
+        return stop - start
+
+    t0 = trace.t_ns(start)
+    wall0 = time.monotonic_ns()
+    for i in range(start, stop):
+        delay = (trace.t_ns(i) - t0) / speed - (time.monotonic_ns() - wall0)
+        if delay > 0:
+            time.sleep(delay / 1e9)
+        firmware.process_frame(trace.frames(i, i + 1)[0].tobytes())
+    return stop - start
+
+
+def _position(trace, seq=None, t_s=None, default=0):
+    # --from/--to: seq number, or seconds after the first record
+    if seq is not None:
+        return trace.find_seq(seq)
+    if t_s is not None:
+        return trace.find_time(trace.t_ns(0) + int(t_s * 1e9)) if len(trace) else 0
+    return default
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect, slice and replay Boreal frame traces")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("info", "replay", "slice"):
+        p = sub.add_parser(name)
+        p.add_argument("trace")
+        if name == "info":
+            continue
+        if name == "slice":
+            p.add_argument("output")
+        p.add_argument("--from-seq", type=int)
+        p.add_argument("--to-seq", type=int, help="stop before the first frame with this seq")
+        p.add_argument("--from-time", type=float, metavar="S", help="seconds after trace start")
+        p.add_argument("--to-time", type=float, metavar="S")
+        p.add_argument("--count", type=int, help="at most this many frames")
+        if name == "replay":
+            p.add_argument("--speed", type=float, default=1.0,
+                           help="multiple of recorded speed; 0 = as fast as possible")
+            p.add_argument("--verbose", action="store_true", help="log every frame")
+    args = parser.parse_args()
+
+    trace = FrameTrace(args.trace)
+    trace.write_index()
+    if args.cmd == "info":
+        print(json.dumps(trace.summary(), indent=2))
+        sys.exit(0)
+
+    t0 = time.perf_counter()
+    start = _position(trace, args.from_seq, args.from_time)
+    stop = _position(trace, args.to_seq, args.to_time, len(trace))
+    if args.count is not None:
+        stop = min(stop, start + args.count)
+    stop = max(start, stop)
+    seek_ms = (time.perf_counter() - t0) * 1e3
+
+    t0 = time.perf_counter()
+    if args.cmd == "slice":
+        with TraceWriter(args.output, trace.index_every) as out:
+            chunk = 1 << 20
+            for i in range(start, stop, chunk):
+                out.extend(trace.records[i : min(i + chunk, stop)])
+        result = {"records": stop - start}
+    else:
+        import logging
+
+        from run_demo import SimulatedFirmware
+
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        fw = SimulatedFirmware()
+        if not args.verbose:
+            fw.set_log_level(logging.ERROR)
+        fed = replay(trace, fw, start, stop, args.speed)
+        result = {"frames": fed, "counters": fw.counters, "replay": fw.replay.stats()}
+    dt = time.perf_counter() - t0
+    result.update(start=start, stop=stop, seek_ms=seek_ms, wall_seconds=dt)
+    print(json.dumps(result, indent=2))
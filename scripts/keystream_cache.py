@@ -0,0 +1,103 @@
+import threading
+
+from chacha20 import chacha20_keystream, chacha20_keystream_batch, keystream_xor, np
+
+
+class KeystreamCache:
+    """Bounded ChaCha20 keystream cache filled ahead of the sequence counter.
+
+    The host uses SEQ as the nonce and only ever increments it, so the
+    keystream for the next ``depth`` frames can be generated by a background
+    worker. ``take(nonce)`` pops that entry (evicting it and anything older)
+    and falls back to computing inline on a miss.
+    """
+
+    def __init__(self, key_bytes, length=40, depth=64, first_nonce=1, counter=0):
+        self.key_bytes = key_bytes
+        self.length = length
+        self.depth = depth
+        self.counter = counter
+        self.hits = 0
+        self.misses = 0
+
+        self._cache = {}
+        self._next = first_nonce  # lowest nonce still expected
+        self._fill = first_nonce  # lowest nonce not yet generated
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(
+                target=self._worker, name="keystream-cache", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def take(self, nonce):
+        with self._cond:
+            ks = self._cache.pop(nonce, None)
+            # Nonces are monotonic: anything below this one can never be used
+            for stale in range(self._next, min(nonce, self._fill)):
+                self._cache.pop(stale, None)
+            if nonce >= self._next:
+                self._next = nonce + 1
+                self._fill = max(self._fill, self._next)
+                self._cond.notify()
+            if ks is not None:
+                self.hits += 1
+                return ks
+            self.misses += 1
+        return chacha20_keystream(self.key_bytes, nonce, self.length, self.counter)
+
+    def encrypt(self, data, nonce):
+        return keystream_xor(data, self.take(nonce))
+
+    def stats(self):
+        with self._cond:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "cached": len(self._cache),
+                "depth": self.depth,
+            }
+
+    def _generate(self, start, stop):
+        nonces = range(start, stop)
+        if np is not None:
+            nblocks = (self.length + 63) // 64
+            ks = chacha20_keystream_batch(self.key_bytes, list(nonces), nblocks, self.counter)
+            return [bytes(row[: self.length]) for row in ks]
+        return [
+            chacha20_keystream(self.key_bytes, n, self.length, self.counter) for n in nonces
+        ]
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and self._fill >= self._next + self.depth:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                start, stop = self._fill, self._next + self.depth
+                self._fill = stop
+
+            # Generate outside the lock so take() never waits on crypto
+            blocks = self._generate(start, stop)
+
+            with self._cond:
+                for nonce, ks in zip(range(start, stop), blocks):
+                    if nonce >= self._next:
+                        self._cache[nonce] = ks
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Array-backed motor subsystem for the firmware simulator.
+
+Every motor's PID state and plant state lives in one NumPy array per
+field, so a tick updates all motors (a robot, a fleet, or one motor per
+point of a gain sweep) with a handful of whole-array operations.
+"""
+import math
+
+import numpy as np
+
+# firmware/src/motor_control.c
+PID_KP = 1.0
+PID_KI = 0.1
+PID_KD = 0.05
+MAX_INTEGRAL = 100.0
+CONTROL_HZ = 50
+PWM_MAX = 1000
+
+# First-order motor/drive plant: tau * dv/dt = vel_per_duty * pwm - v
+PLANT_TAU_S = 0.1
+VEL_PER_DUTY = 0.02  # rad/s at steady state per PWM count (20 rad/s at full duty)
+
+
+class MotorArray:
+    """N motors stepped together: motor_control.c PID plus a plant model.
+
+    Gains and plant parameters may be scalars or length-N arrays, so one
+    instance can run a whole KP/KI/KD sweep. State arrays (``target``,
+    ``velocity``, ``integral``, ``prev_error``, ``pwm``) are public and
+    may be written between steps.
+    """
+
+    def __init__(self, n=2, kp=PID_KP, ki=PID_KI, kd=PID_KD, max_integral=MAX_INTEGRAL,
+                 control_hz=CONTROL_HZ, tau_s=PLANT_TAU_S, vel_per_duty=VEL_PER_DUTY,
+                 dtype=np.float32):
+        # float32 by default, like the MCU
+        self.n = n
+        self.dtype = dtype
+        self.control_hz = control_hz
+        self.kp = self._param(kp)
+        self.ki = self._param(ki)
+        self.kd = self._param(kd)
+        self.max_integral = self._param(max_integral)
+        self.vel_per_duty = self._param(vel_per_duty)
+        # Exact discretisation of the first-order lag over one tick
+        tau = np.asarray(tau_s, dtype=np.float64)
+        self.alpha = self._param(-np.expm1(-1.0 / (control_hz * tau)))
+
+        self.target = np.zeros(n, dtype=dtype)
+        self.velocity = np.zeros(n, dtype=dtype)
+        self.integral = np.zeros(n, dtype=dtype)
+        self.prev_error = np.zeros(n, dtype=dtype)
+        self.pwm = np.zeros(n, dtype=np.int16)
+        self.ticks = 0
+
+        self._err = np.empty(n, dtype=dtype)
+        self._out = np.empty(n, dtype=dtype)
+        self._tmp = np.empty(n, dtype=dtype)
+
+    def _param(self, value):
+        return np.broadcast_to(np.asarray(value, dtype=self.dtype), (self.n,)).copy()
+
+    def reset(self):
+        for a in (self.target, self.velocity, self.integral, self.prev_error, self.pwm):
+            a[:] = 0
+        self.ticks = 0
+
+    def step(self, ticks=1, targets=None, record=False):
+        """Advance every motor ``ticks`` control periods.
+
+        ``targets`` is an optional ``(ticks, n)`` setpoint schedule (rows
+        are applied at the start of each tick). Returns the last PWM
+        array, or with ``record`` a dict of ``(ticks, n)`` ``pwm`` and
+        ``velocity`` histories.
+        """
+        dt = self.dtype(1.0 / self.control_hz)
+        hz = self.dtype(self.control_hz)
+        err, out, tmp = self._err, self._out, self._tmp
+        if record:
+            pwm_hist = np.empty((ticks, self.n), dtype=np.int16)
+            vel_hist = np.empty((ticks, self.n), dtype=self.dtype)
+
+        for k in range(ticks):
+            if targets is not None:
+                self.target[:] = targets[k]
+
+            # motor_control_pid_update()
+            np.subtract(self.target, self.velocity, out=err)
+            np.multiply(err, dt, out=tmp)
+            self.integral += tmp
+            np.clip(self.integral, -self.max_integral, self.max_integral, out=self.integral)
+            # Summed in the C order: KP * e + KI * i + KD * d
+            np.multiply(self.kp, err, out=out)
+            np.multiply(self.ki, self.integral, out=tmp)
+            out += tmp
+            np.subtract(err, self.prev_error, out=tmp)
+            tmp *= hz  # derivative
+            self.prev_error[:] = err
+            tmp *= self.kd
+            out += tmp
+            np.clip(out, -PWM_MAX, PWM_MAX, out=out)
+            self.pwm[:] = out  # truncates toward zero like the (int16_t) cast
+
+            # Plant: first-order lag towards vel_per_duty * pwm
+            np.multiply(self.vel_per_duty, self.pwm, out=tmp)
+            tmp -= self.velocity
+            tmp *= self.alpha
+            self.velocity += tmp
+
+            if record:
+                pwm_hist[k] = self.pwm
+                vel_hist[k] = self.velocity
+        self.ticks += ticks
+
+        if record:
+            return {"pwm": pwm_hist, "velocity": vel_hist}
+        return self.pwm
+
+
+def sweep_gains(kp, ki, kd, target=1.0, seconds=10.0, **kwargs):
+    """Step response of every (kp, ki, kd) combination, one motor each.
+
+    Returns a dict with the flattened gain grids and, per combination, the
+    integral of absolute error (IAE), overshoot and final error.
+    """
+    grid = np.meshgrid(
+        np.atleast_1d(kp), np.atleast_1d(ki), np.atleast_1d(kd), indexing="ij"
+    )
+    kp, ki, kd = (g.reshape(-1) for g in grid)
+    control_hz = kwargs.get("control_hz", CONTROL_HZ)
+    motors = MotorArray(len(kp), kp, ki, kd, **kwargs)
+    motors.target[:] = target
+
+    iae = np.zeros(len(kp))
+    peak = np.zeros(len(kp))
+    chunk = 256
+    remaining = int(math.ceil(seconds * control_hz))
+    while remaining:
+        n = min(chunk, remaining)
+        vel = motors.step(n, record=True)["velocity"].astype(np.float64)
+        iae += np.abs(target - vel).sum(axis=0) / control_hz
+        peak = np.maximum(peak, vel.max(axis=0) if target >= 0 else -vel.min(axis=0))
+        remaining -= n
+    return {
+        "kp": kp,
+        "ki": ki,
+        "kd": kd,
+        "iae": iae,
+        "overshoot": np.maximum(peak - abs(target), 0.0),
+        "final_error": target - motors.velocity.astype(np.float64),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Vectorized PID gain sweep on the motor plant model")
+    parser.add_argument("--kp", type=float, nargs=3, default=[0.5, 50.0, 40], metavar=("LO", "HI", "N"))
+    parser.add_argument("--ki", type=float, nargs=3, default=[0.0, 50.0, 40], metavar=("LO", "HI", "N"))
+    parser.add_argument("--kd", type=float, nargs="*", default=[PID_KD])
+    parser.add_argument("--target", type=float, default=1.0, help="step setpoint (rad/s)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    kp = np.linspace(args.kp[0], args.kp[1], int(args.kp[2]))
+    ki = np.linspace(args.ki[0], args.ki[1], int(args.ki[2]))
+    t0 = time.perf_counter()
+    res = sweep_gains(kp, ki, args.kd, args.target, args.seconds)
+    dt = time.perf_counter() - t0
+    print(f"{len(res['kp'])} gain sets x {args.seconds:.0f} s simulated in {dt:.2f}s")
+    for i in np.argsort(res["iae"])[: args.top]:
+        print(
+            f"  KP={res['kp'][i]:.2f} KI={res['ki'][i]:.2f} KD={res['kd'][i]:.2f}: "
+            f"IAE {res['iae'][i]:.3f}, overshoot {res['overshoot'][i]:.3f}, "
+            f"final error {res['final_error'][i]:+.4f}"
+        )
+    ref = sweep_gains(PID_KP, PID_KI, PID_KD, args.target, args.seconds)
+    print(
+        f"  firmware KP={PID_KP} KI={PID_KI} KD={PID_KD}: IAE {ref['iae'][0]:.3f}, "
+        f"final error {ref['final_error'][0]:+.4f}"
+    )
@@ -0,0 +1,56 @@
+class ReplayWindow:
+    """IPsec-style anti-replay window (firmware/src/replay_window.c).
+
+    A frame is accepted if its seq is above the highest accepted one
+    (``top``), or falls within ``size`` of it and has not been seen yet.
+    The bitmap is a ring of 32-bit words indexed by ``seq >> 5``, with one
+    spare word, so both accepting and rejecting are O(1) and advancing only
+    clears the words it skips over (RFC 6479).
+    """
+
+    def __init__(self, size=64):
+        if size < 1:
+            raise ValueError("replay window size must be at least 1")
+        self.size = size
+        self.nwords = (size + 31) // 32 + 1
+        self.words = [0] * self.nwords
+        self.words[0] = 1  # seq 0 is never valid
+        self.top = 0
+        self.accepted = 0
+        self.advances = 0
+        self.duplicates = 0
+        self.too_old = 0
+
+    def accept(self, seq):
+        # Check and record seq; call only for authenticated frames
+        words = self.words
+        top = self.top
+        if seq > top:
+            old = top >> 5
+            for i in range(1, min((seq >> 5) - old, self.nwords) + 1):
+                words[(old + i) % self.nwords] = 0
+            self.top = seq
+            self.advances += 1
+        elif top - seq >= self.size:
+            self.too_old += 1
+            return False
+
+        index = (seq >> 5) % self.nwords
+        bit = 1 << (seq & 31)
+        if words[index] & bit:
+            self.duplicates += 1
+            return False
+        words[index] |= bit
+        self.accepted += 1
+        return True
+
+    def stats(self):
+        return {
+            "window": self.size,
+            "top": self.top,
+            "accepted": self.accepted,
+            "out_of_order": self.accepted - self.advances,
+            "advances": self.advances,
+            "duplicates": self.duplicates,
+            "too_old": self.too_old,
+        }
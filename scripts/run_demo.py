@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 
+import argparse
+import json
+import logging
+import random
 import time
 import struct
+from array import array
+from collections import namedtuple
 
 # Import components
 import os
@@ -12,8 +18,21 @@ lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(os.path.join(lib_path, "policy"))
 sys.path.append(os.path.join(lib_path, "scripts"))
 
-from compiler import compile_policy
-from chacha20 import chacha20_encrypt
+from compiler import compile_policy_cached, PolicyWatcher
+from policy_vm import run_policy, decision_classes
+from chacha20 import chacha20_keystream_batch
+from siphash import siphash24_batch
+from frame_codec import (
+    FRAME_CMD, FRAME_LEN, PKT_LEN, PKT_OFF, PKT_DTYPE, VERSION_BATCH, VERSION_SINGLE,
+    FrameDecoder, FrameEncoder, Packet, unpack_records,
+)
+from sim_clock import EventScheduler
+from motor_sim import MotorArray
+from replay_window import ReplayWindow
+from spsc_ring import SpscRing
+from stage_timers import StageTimers
+from timer_wheel import TimerWheel
+import numpy as np
 
 CHACHA_KEY = struct.pack(
     "<8I",
@@ -29,239 +48,558 @@ CHACHA_KEY = struct.pack(
 
 # Simulated firmware components (translated from C)
 
+log = logging.getLogger("boreal.sim")
+
+PKT_STRUCT = struct.Struct("<IHHIIHH18hQ")  # pkt_t as 25 fields + MAC
+
+# Policy decision; instances are cached and shared, never mutated
+Action = namedtuple("Action", "act v0")
+
+DEFAULT_POLICY = os.path.join(lib_path, "policy", "policy.dsl")
+
 
 class SimulatedFirmware:
-    def __init__(self):
+    def __init__(self, policy_path=DEFAULT_POLICY, replay_window=64, mac_key=None, chacha_key=None,
+                 q_size=8):
         # Shared secret
-        self.MAC_KEY = struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
-        self.CHACHA_KEY = CHACHA_KEY
+        self.MAC_KEY = mac_key or struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
+        self.CHACHA_KEY = chacha_key or CHACHA_KEY
         self.MAGIC_WORD = 0xB0A1E1A1
-        self.last_seq = 0
-
-        # Policy bytecode (loaded from local file)
-        policy_path = os.path.join(
-            os.path.dirname(__file__), "..", "policy", "policy.dsl"
-        )
-        bc = compile_policy(policy_path)
-        self.POLICY_BC = bc
-        self.POLICY_LEN = len(bc)
+        self.replay = ReplayWindow(replay_window)  # REPLAY_WINDOW in protocol.h
+        self.rx = FrameDecoder(self.MAC_KEY, self.CHACHA_KEY)
+        self.last_move_ms = None  # vm.c gate_allow state (None until the first MOVE)
+        self.counters = {"accepted": 0, "denied": 0, "auth_failed": 0, "rejected": 0}
+        self.refresh_log_level()
+
+        # Receive-path latency per stage; set timers.enabled to switch off
+        self.timers = StageTimers(("mac_verify", "decrypt", "vm", "gate"))
+        self.rx.timers = self.timers
+
+        # Policy bytecode (compiled once per source hash, then cached)
+        self.policy_path = policy_path
+        self.policy_watcher = None
         self.prev_act_id = 0
+        self.decision_hits = 0
+        self.decision_misses = 0
+        self.POLICY_BC = compile_policy_cached(policy_path)
 
-        # Motor control simulation
-        self.motors = [
-            {"velocity": 0.0, "target": 0.0, "integral": 0.0, "error": 0.0}
-            for _ in range(2)
-        ]
-        self.KP = 1.0
-        self.KI = 0.1
-        self.KD = 0.05
-        self.MAX_INTEGRAL = 100.0
-        self.CONTROL_HZ = 50
+        # Firmware clock: watchdog deadline and control tick; see advance().
+        # The MOVE rate limit is not on it: vm.c gates on packet t_ms, and
+        # replays through process_frames() never advance this clock.
+        self.wheel = TimerWheel(tick_ms=1)
 
-        # Watchdog
-        self.watchdog_timer = 0
-        self.MAX_CYCLES = 200 * 100  # 200ms @ 100Hz simulation
+        # Motor control simulation: left/right PID + drive plant
+        self.CONTROL_HZ = 50
+        self.motors = MotorArray(2, control_hz=self.CONTROL_HZ)
+        self.control_tick = self.wheel.timer(self.update_motors)
+        self.control_tick.every(1000 / self.CONTROL_HZ)
+
+        # Watchdog (TIMEOUT_MS in boreal_watchdog.v)
+        self.WATCHDOG_TIMEOUT_MS = 200
+        self.MAX_CYCLES = self.WATCHDOG_TIMEOUT_MS // self.wheel.tick_ms
+        self.watchdog = self.wheel.timer(self.watchdog_expired)
+        self.watchdog_pet_tick = 0
         self.safe_state = True  # Start safe
-
-        # Packet buffer
-        self.rx_queue = []
-
-    def siphash24_sim(self, data, key):
-        # Simplified SipHash for simulation
-        h = int.from_bytes(key, "little") ^ int.from_bytes(data[:8], "little")
-        h = (h * 0x9E3779B185EBCA87) & 0xFFFFFFFFFFFFFFFF
-        h ^= h >> 32
-        return h
+        self.watchdog_trips = 0
+
+        # Core 1 -> core 0 ring (RX_Q / Q_SIZE in main.c)
+        self.rx_queue = SpscRing(q_size, PKT_LEN)
+
+    def set_log_level(self, level):
+        log.setLevel(level)
+        self.refresh_log_level()
+
+    def refresh_log_level(self):
+        # Per-frame logging is guarded by these flags, so a disabled level
+        # costs one attribute test and no formatting
+        self.log_debug = log.isEnabledFor(logging.DEBUG)
+        self.log_info = log.isEnabledFor(logging.INFO)
+        self.log_warning = log.isEnabledFor(logging.WARNING)
+
+    @property
+    def last_seq(self):
+        return self.replay.top
+
+    @property
+    def POLICY_BC(self):
+        return self._vm[0]
+
+    @property
+    def POLICY_LEN(self):
+        return len(self._vm[0])
+
+    @POLICY_BC.setter
+    def POLICY_BC(self, bc):
+        # Build the new bytecode and decision tables off to the side, then
+        # publish them with one reference swap so a concurrent decision_vm
+        # sees either the old policy or the new one, never a mix.
+        self._vm = self._build_decision_tables(bytes(bc))
+
+    def watch_policy(self, interval=0.5):
+        # Hot reload: recompile on DSL edits and swap into this simulator
+        if self.policy_watcher is None:
+            self.policy_watcher = PolicyWatcher(
+                self.policy_path, self._reload_policy, interval
+            ).start()
+        return self.policy_watcher
+
+    def _reload_policy(self, bc):
+        if bytes(bc) != self.POLICY_BC:
+            self.POLICY_BC = bc
+
+    @staticmethod
+    def _build_decision_tables(bc):
+        thresholds, intents, req_acts = decision_classes(bc)
+
+        # conf_q15 -> bucket index, as a flat table for O(1) lookup
+        conf_bucket = array("H")
+        for bucket, end in enumerate(thresholds + [65536]):
+            conf_bucket.extend(array("H", [bucket]) * (end - len(conf_bucket)))
+        return bc, conf_bucket, intents, req_acts, {}
+
+    def decision_cache_stats(self):
+        total = self.decision_hits + self.decision_misses
+        return {
+            "hits": self.decision_hits,
+            "misses": self.decision_misses,
+            "hit_rate": self.decision_hits / total if total else 0.0,
+            "entries": len(self._vm[4]),
+        }
 
     def decision_vm(self, p):
-        act = {"act": 0, "v0": 0}
-        pc = 0
-        steps = 0
-        cond_failed = False
-        while pc < self.POLICY_LEN and steps < 32:
-            op = self.POLICY_BC[pc]
-            pc += 1
-            if op == 0x01:  # OP_IF
-                i = self.POLICY_BC[pc] | (self.POLICY_BC[pc + 1] << 8)
-                c = self.POLICY_BC[pc + 2] | (self.POLICY_BC[pc + 3] << 8)
-                pc += 4
-                cond_failed = False
-                if not (p["intent_id"] == i and p["conf_q15"] >= c):
-                    cond_failed = True
-            elif op == 0x04:  # OP_REQUIRE_PREV
-                req_act = self.POLICY_BC[pc]
-                pc += 1
-                if self.prev_act_id != req_act and self.prev_act_id != 0:
-                    cond_failed = True
-            elif op == 0x02:  # OP_ACT
-                act_id = self.POLICY_BC[pc]
-                v0 = self.POLICY_BC[pc + 1] | (self.POLICY_BC[pc + 2] << 8)
-                if v0 > 0x7FFF:
-                    v0 -= 0x10000
-                pc += 3
-                if not cond_failed:
-                    act["act"] = act_id
-                    act["v0"] = v0
-                    self.prev_act_id = act_id
-                    return act
-            elif op == 0x03:  # OP_DENY
-                act["act"] = 0
-                self.prev_act_id = 0
-                return act
-            elif op == 0xFF:  # OP_END
-                break
-            steps += 1
+        bc, conf_bucket, intents, req_acts, cache = self._vm
+        intent, conf, prev = p.intent_id, p.conf_q15, self.prev_act_id
+        key = (
+            intent if intent in intents else -1,
+            conf_bucket[conf],
+            prev if prev in req_acts else -1,
+        )
+        hit = cache.get(key)
+        if hit is None:
+            self.decision_misses += 1
+            act_id, v0, new_prev = self.interpret_vm(intent, conf, prev, bc)
+            hit = cache[key] = (Action(act_id, v0), new_prev)
+        else:
+            self.decision_hits += 1
+        act, new_prev = hit
+        if new_prev is not None:
+            self.prev_act_id = new_prev
         return act
 
+    def interpret_vm(self, intent_id, conf_q15, prev_act_id, bc=None):
+        # Uncached reference path (mirrors vm.c); see policy_vm.run_policy
+        return run_policy(self.POLICY_BC if bc is None else bc, intent_id, conf_q15, prev_act_id)
+
     def gate_allow(self, act, p):
-        if act["act"] == 0:
+        if act.act == 0:
             return False
-        # Rate limit MOVE to 50Hz
-        if act["act"] == 2:
-            # Simplified: assume allowed
-            pass
+        # Rate limit MOVE to 50Hz (20ms of packet time); the delta is a
+        # signed u32 difference as in vm.c, so an older, reordered MOVE is denied
+        if act.act == 2:
+            last = self.last_move_ms
+            if last is not None and ((p.t_ms - last + 0x80000000) & 0xFFFFFFFF) - 0x80000000 < 20:
+                return False
+            self.last_move_ms = p.t_ms
         return True
 
-    def motor_control_pid(self, motor_id):
-        motor = self.motors[motor_id]
-        error = motor["target"] - motor["velocity"]
-        motor["integral"] += error / self.CONTROL_HZ
-        if motor["integral"] > self.MAX_INTEGRAL:
-            motor["integral"] = self.MAX_INTEGRAL
-        if motor["integral"] < -self.MAX_INTEGRAL:
-            motor["integral"] = -self.MAX_INTEGRAL
-        derivative = (error - motor["error"]) * self.CONTROL_HZ
-        motor["error"] = error
-        output = self.KP * error + self.KI * motor["integral"] + self.KD * derivative
-        output = max(-1000, min(1000, output))
-        return int(output)
-
     def motor_control_execute(self, act):
-        if act["act"] == 1:  # STOP
-            self.motors[0]["target"] = 0.0
-            self.motors[1]["target"] = 0.0
-        elif act["act"] == 2:  # MOVE
-            vel = act["v0"] / 100.0
-            self.motors[0]["target"] = vel
-            self.motors[1]["target"] = vel
-        elif act["act"] == 3:  # TURN
-            turn = act["v0"] / 100.0
-            self.motors[0]["target"] = turn
-            self.motors[1]["target"] = -turn
+        target = self.motors.target
+        if act.act == 1:  # STOP
+            target[0] = target[1] = 0.0
+        elif act.act == 2:  # MOVE
+            target[0] = target[1] = act.v0 / 100.0
+        elif act.act == 3:  # TURN
+            target[0] = act.v0 / 100.0
+            target[1] = -target[0]
 
     def process_packet(self, pkt):
-        # Authenticate
-        # The payload for MAC calculation is the header + ciphertext (first 25 unpacked elements)
-        payload_for_mac = struct.pack("<IHHIIHH18h", *pkt[:25])
-        calc_mac = self.siphash24_sim(payload_for_mac, self.MAC_KEY)
-        if calc_mac != pkt[25]:  # pkt[25] is the MAC checksum
-            print("MAC verification failed!")
-            return
+        # Legacy entry point: pkt_t unpacked into 25 fields + MAC
+        return self.process_frame(PKT_STRUCT.pack(*pkt))
+
+    def process_frame(self, frame):
+        """Authenticate, decrypt and act on one raw ``pkt_t`` (or SPI frame).
+
+        Returns the policy's Action (a list of them for a batch frame), or
+        None when the frame was rejected before reaching the VM.
+        """
+        timed = self.timers.enabled
+        if timed:
+            t0 = time.perf_counter_ns()
+        if self._malformed(frame):
+            self.counters["rejected"] += 1
+            if self.log_warning:
+                log.warning("Malformed frame!")
+            return None
+        p = self.rx.decode(frame)
+        if p is None:
+            self.counters["auth_failed"] += 1
+            if self.log_warning:
+                log.warning("MAC verification failed!")
+            return None
+        act = self.handle_packet(p)
+        if timed:
+            self.timers.record("frame", time.perf_counter_ns() - t0)
+        return act
 
-        # Anti-replay
-        magic, version, model, seq_num, t_ms = pkt[0:5]
-        if magic != self.MAGIC_WORD or seq_num <= self.last_seq:
-            print("Invalid packet or replay!")
-            return
-        self.last_seq = seq_num
-
-        # Decrypt Policy Body
-        # The ciphertext is the last 40 bytes of the payload_for_mac (which is 56 bytes total)
-        # The format string for payload_for_mac is "<IHHIIHH18h"
-        # I (4 bytes) + HH (4 bytes) + II (8 bytes) = 16 bytes for header
-        # HH18h (40 bytes) for encrypted part
-        ciphertext = payload_for_mac[16:56]
-        plaintext = chacha20_encrypt(ciphertext, self.CHACHA_KEY, seq_num, 0)
-        decrypted_fields = struct.unpack("<HH18h", plaintext)
-
-        p = {
-            "magic": magic,
-            "version": version,
-            "model_id": model,
-            "seq": seq_num,
-            "t_ms": t_ms,
-            "intent_id": decrypted_fields[0],
-            "conf_q15": decrypted_fields[1],
-            "aux": decrypted_fields[2:],
-        }
+    def _malformed(self, frame):
+        # Wrong length or SPI header: dropped before the MAC check, as on core 1
+        if frame is None:
+            frame = self.rx.buf
+        elif len(frame) == PKT_LEN:
+            return False
+        return len(frame) != FRAME_LEN or frame[0] != FRAME_CMD or frame[1] != PKT_LEN
+
+    def core1_receive(self, frame, t=0.0):
+        """Core 1: queue a ``pkt_t`` (or SPI frame) for core 0; False if dropped.
+
+        Only "cmd 0x01, len 64" SPI frames are queued; a full ring drops
+        the new frame, as in main.c.
+        """
+        if len(frame) == FRAME_LEN:
+            if frame[0] != FRAME_CMD or frame[1] != PKT_LEN:
+                return False
+            frame = memoryview(frame)[PKT_OFF:]
+        return self.rx_queue.push(frame, t)
+
+    def core0_poll(self, t=0.0):
+        """Core 0: pop the oldest queued frame and process it in place.
+
+        Returns False when the ring is empty.
+        """
+        rx = self.rx
+        if not self.rx_queue.pop_into(rx.pkt, t):
+            return False
+        rx.buf[0] = FRAME_CMD
+        rx.buf[1] = PKT_LEN
+        self.process_frame(None)
+        return True
 
+    def process_frames(self, buf, stride=PKT_LEN):
+        """Batch fast path for replays and load tests.
+
+        ``buf`` holds back-to-back ``pkt_t`` records, or SPI frames with
+        ``stride=FRAME_LEN`` (frames without the [0x01, 64] header are
+        skipped, as on core 1). Packets are handled in order exactly as
+        process_frame() would. Returns the number of accepted intents.
+        Anti-replay, VM and gate are timed together, once per batch, as
+        "vm/batch"; "vm" and "gate" only see single frames.
+        """
+        accepted = self.counters["accepted"]
+        packets = [p for p in self.decode_frames(buf, stride) if p is not None]
+        timed = self.timers.enabled and packets
+        if timed:
+            t0 = time.perf_counter_ns()
+        for p in packets:
+            self.handle_packet(p, timed=False)
+        if timed:
+            self.timers.record("vm/batch", time.perf_counter_ns() - t0)
+        return self.counters["accepted"] - accepted
+
+    def decode_frames(self, buf, stride=PKT_LEN):
+        """Authenticate and decrypt a buffer of frames in one NumPy batch.
+
+        Returns one Packet per frame, None where the MAC check failed.
+        """
+        rows = np.frombuffer(buf, dtype=np.uint8)
+        if stride not in (PKT_LEN, FRAME_LEN) or len(rows) % stride:
+            raise ValueError(f"buffer is not a whole number of {stride}-byte frames")
+        rows = rows.reshape(-1, stride)
+        if stride == FRAME_LEN:
+            rows = rows[(rows[:, 0] == FRAME_CMD) & (rows[:, 1] == PKT_LEN), PKT_OFF:]
+        n = len(rows)
+        timed = self.timers.enabled and n
+        if timed:
+            t0 = time.perf_counter_ns()
+
+        ok = (siphash24_batch(self.MAC_KEY, rows[:, :56]) == rows[:, 56:]).all(axis=1)
+        if timed:
+            # One sample per batch, apart from the per-frame stages
+            t1 = time.perf_counter_ns()
+            self.timers.record("mac_verify/batch", t1 - t0)
+        failed = len(ok) - int(np.count_nonzero(ok))
+        if failed:
+            self.counters["auth_failed"] += failed
+            if self.log_warning:
+                log.warning("MAC verification failed on %d frame(s)!", failed)
+
+        rows = np.array(rows)  # private copy, decrypted in place
+        rec = rows.view(PKT_DTYPE).reshape(-1)
+        rows[:, 16:56] ^= chacha20_keystream_batch(self.CHACHA_KEY, rec["seq"])[:, :40]
+        if timed:
+            self.timers.record("decrypt/batch", time.perf_counter_ns() - t1)
+
+        packets = []
+        aux = rec["aux"]
+        for i, (good, magic, version, model_id, seq, t_ms, intent_id, conf_q15) in enumerate(zip(
+            ok.tolist(), rec["magic"].tolist(), rec["version"].tolist(), rec["model_id"].tolist(),
+            rec["seq"].tolist(), rec["t_ms"].tolist(), rec["intent_id"].tolist(),
+            rec["conf_q15"].tolist(),
+        )):
+            if not good:
+                packets.append(None)
+                continue
+            p = Packet(aux[i])
+            p.magic, p.version, p.model_id, p.seq, p.t_ms = magic, version, model_id, seq, t_ms
+            if version == VERSION_BATCH:
+                p.records = unpack_records(rows[i, 16:56].tobytes())
+            else:
+                p.intent_id, p.conf_q15 = intent_id, conf_q15
+            packets.append(p)
+        return packets
+
+    def handle_packet(self, p, timed=True):
+        # Core 0 after authentication/decryption: anti-replay, VM, gate
+        # ("vm" latency includes the anti-replay check)
+        tm = self.timers if timed and self.timers.enabled else None
+        if tm:
+            tm.start()
+        # Anti-replay
+        if p.magic != self.MAGIC_WORD or not self.replay.accept(p.seq):
+            self.counters["rejected"] += 1
+            if self.log_warning:
+                log.warning("Invalid packet or replay!")
+            return None
+
+        if p.version == VERSION_SINGLE:
+            return self.execute_intent(p, tm)
+        if p.version == VERSION_BATCH and p.records is not None:
+            # Each record in order, as if it were its own single-intent frame
+            acts = []
+            for intent_id, conf_q15 in p.records:
+                p.intent_id, p.conf_q15 = intent_id, conf_q15
+                acts.append(self.execute_intent(p, tm))
+            return acts
+        self.counters["rejected"] += 1
+        if self.log_warning:
+            log.warning("Unknown packet version %d or malformed batch!", p.version)
+        return None
+
+    def execute_intent(self, p, tm=None):
         # VM Policy
         act = self.decision_vm(p)
-        if self.gate_allow(act, p):
+        if tm:
+            tm.lap("vm")
+        allowed = self.gate_allow(act, p)
+        if tm:
+            tm.lap("gate")
+        if allowed:
             # Actuate
-            if act["act"] == 1:
-                print(f"Brake engaged (GPIO {act['act']}: {act['v0']})")
+            if act.act == 1:
+                if self.log_info:
+                    log.info("Brake engaged (GPIO %d: %d)", act.act, act.v0)
             else:
                 self.motor_control_execute(act)
-                print(f"Motor control: act={act['act']}, value={act['v0']}")
-            # Pet watchdog
-            self.watchdog_timer = 0
-            self.safe_state = False
+                if self.log_info:
+                    log.info("Motor control: act=%d, value=%d", act.act, act.v0)
+            self.pet_watchdog()
+            self.counters["accepted"] += 1
         else:
-            print("Action denied by safety gate!")
-
-    def update_motors(self):
-        for i in range(2):
-            pwm = self.motor_control_pid(i)
-            print(
-                f"Motor {i}: target={self.motors[i]['target']:.2f}, vel={self.motors[i]['velocity']:.2f}, PWM={pwm}"
-            )
-
-    def update_watchdog(self):
-        if not self.safe_state:
-            self.watchdog_timer += 1
-            if self.watchdog_timer >= self.MAX_CYCLES:
-                self.safe_state = True
-                print("WATCHDOG TRIGGERED: SAFE STATE ENGAGED!")
-
+            self.counters["denied"] += 1
+            if self.log_info:
+                log.info("Action denied by safety gate!")
+        return act
 
-def ai_inference():
-    # Simulate AI decisions
-    intents = [
-        (1, 0, "STOP"),  # Intent 1: STOP
-        (2, 30000, "APPROACH"),  # Intent 2: APPROACH
-        (3, 20000, "TURN_LEFT"),  # Intent 3: TURN_LEFT
-    ]
-    return intents[int(time.time() * 2) % len(intents)]
+    def update_motors(self, ticks=1):
+        pwm = self.motors.step(ticks)
+        if self.log_debug:
+            m = self.motors
+            for i in range(m.n):
+                log.debug("Motor %d: target=%.2f, vel=%.2f, PWM=%d", i, m.target[i], m.velocity[i], pwm[i])
+
+    def advance(self, now_ms):
+        # Run the control ticks and watchdog expiry due by now_ms (firmware time)
+        self.wheel.advance(now_ms)
+
+    @property
+    def watchdog_timer(self):
+        # The RTL's timer register: ticks since the last pet, saturating at MAX_CYCLES
+        if self.safe_state:
+            return 0
+        return min(self.wheel.tick - self.watchdog_pet_tick, self.MAX_CYCLES)
+
+    def pet_watchdog(self):
+        # As boreal_watchdog.v: the timer counts up to MAX_CYCLES after a pet
+        # and safe state engages on the tick after that. A pet only records
+        # the tick; the armed deadline is pushed back when it comes due.
+        self.watchdog_pet_tick = self.wheel.tick
+        self.safe_state = False
+        if not self.watchdog.pending:
+            self.watchdog.arm((self.MAX_CYCLES + 1) * self.wheel.tick_ms)
+
+    def watchdog_expired(self):
+        deadline = self.watchdog_pet_tick + self.MAX_CYCLES + 1
+        if deadline > self.wheel.tick:  # petted since this deadline was armed
+            self.watchdog.arm_at(deadline * self.wheel.tick_ms)
+            return
+        self.safe_state = True
+        self.watchdog_trips += 1
+        log.warning("WATCHDOG TRIGGERED: SAFE STATE ENGAGED!")
+
+
+AI_PERIOD_MS = 100  # 10 Hz inference, as in the original demo loop
+
+INTENTS = [
+    (1, 0, "STOP"),  # Intent 1: STOP
+    (2, 30000, "APPROACH"),  # Intent 2: APPROACH
+    (3, 20000, "TURN_LEFT"),  # Intent 3: TURN_LEFT
+]
+
+
+def ai_inference(t_s=None, rng=None):
+    # Simulate AI decisions: cycle every 0.5 s, or draw from a seeded RNG
+    if rng is not None:
+        intent_id, conf, name = rng.choice(INTENTS)
+        return intent_id, max(0, min(32767, conf + rng.randint(-2000, 2000))), name
+    if t_s is None:
+        t_s = time.time()
+    return INTENTS[int(t_s * 2) % len(INTENTS)]
+
+
+def run_simulation(duration_s=None, seed=None, realtime=False, firmware=None,
+                   ai_period_ms=AI_PERIOD_MS, latency_ms=1, chunk=None,
+                   stats_every_s=None, on_stats=None, replay_rate=0.0, corrupt_rate=0.0):
+    """Drive a SimulatedFirmware from an EventScheduler's virtual clock.
+
+    AI inference runs every ``ai_period_ms`` and its frame is processed
+    ``latency_ms`` later. The firmware's timer wheel (motor control at
+    CONTROL_HZ, watchdog deadline) runs on the same clock and is only woken
+    when a timer is due. Frame timestamps are virtual time, so the 20 ms
+    MOVE gate runs on it as well. With a ``seed`` intents come from
+    ``random.Random(seed)``, and runs are reproducible either way. Frames
+    are encoded and authenticated ``chunk`` periods at a time in NumPy
+    batches. Every ``stats_every_s`` simulated seconds ``on_stats`` is
+    called with the firmware's StageTimers. For soak tests a fraction
+    ``corrupt_rate`` of frames get a flipped bit on the wire and a fraction
+    ``replay_rate`` is delivered a second time one period later. Returns a
+    summary dict.
+    """
+    firmware = firmware or SimulatedFirmware()
+    rng = None if seed is None else random.Random(seed)
+    # Separate stream, so enabling faults leaves the intents unchanged
+    faults = random.Random(None if seed is None else ~seed)
+    injected = {"corrupted": 0, "replayed": 0}
+    sched = EventScheduler(realtime=realtime)
+    encoder = FrameEncoder(firmware.MAC_KEY, firmware.CHACHA_KEY)
+    chunk = chunk or (1 if realtime else 4096)
+    end_ms = None if duration_s is None else int(duration_s * 1000)
+    sent = 0
+
+    wake = [None]  # earliest pending wheel wake-up
+
+    def arm_wakeup():
+        t = firmware.wheel.next_expiry()
+        if t is not None and (wake[0] is None or t < wake[0] or wake[0] < sched.now_ms):
+            wake[0] = t
+            sched.call_at(t, run_timers)
+
+    def run_timers():
+        firmware.advance(sched.now_ms)
+        if wake[0] is not None and wake[0] <= sched.now_ms:
+            wake[0] = None
+        arm_wakeup()
+
+    def deliver(p, name):
+        firmware.advance(sched.now_ms)
+        if firmware.log_info:
+            log.info("\nAI Decision: %s (ID %d, conf %d)", name, p.intent_id, p.conf_q15)
+        firmware.handle_packet(p)
+        arm_wakeup()
+
+    def plan(start_ms):
+        # AI Brain + host for the next `chunk` periods, one encode batch
+        nonlocal sent
+        times = [start_ms + k * ai_period_ms for k in range(chunk)]
+        if end_ms is not None:
+            times = [t for t in times if t <= end_ms]
+        if not times:
+            return
+        decisions = [ai_inference(t / 1000.0, rng) for t in times]
+        frames = encoder.encode_batch(
+            range(sent + 1, sent + 1 + len(times)), times,
+            [d[0] for d in decisions], [d[1] for d in decisions], [[30]] * len(times),
+        )
+        sent += len(times)
+        if corrupt_rate:
+            for i in range(len(times)):
+                if faults.random() < corrupt_rate:
+                    frames[i, faults.randrange(PKT_LEN)] ^= 1 << faults.randrange(8)
+                    injected["corrupted"] += 1
+        # Brainstem: authenticated/decrypted up front, handled on arrival
+        for t, p, d in zip(times, firmware.decode_frames(frames), decisions):
+            if p is not None:
+                sched.call_at(t + latency_ms, deliver, p, d[2])
+                if replay_rate and faults.random() < replay_rate:
+                    sched.call_at(t + ai_period_ms + latency_ms, deliver, p, d[2])
+                    injected["replayed"] += 1
+        sched.call_at(times[-1] + ai_period_ms, plan, times[-1] + ai_period_ms)
+
+    sched.call_at(0, plan, 0)
+    arm_wakeup()
+    if stats_every_s and on_stats is not None:
+        period = int(stats_every_s * 1000)
+        sched.call_every(period, on_stats, firmware.timers, start_ms=period)
+
+    t0 = time.perf_counter()
+    sched.run(end_ms)
+    wall = time.perf_counter() - t0
+    return {
+        "seed": seed,
+        "sim_seconds": sched.now_ms / 1000.0,
+        "wall_seconds": round(wall, 3),
+        "speedup": round(sched.now_ms / 1000.0 / wall, 1) if wall else None,
+        "events": sched.events,
+        "timers_fired": firmware.wheel.fired,
+        "frames_sent": sent,
+        "faults": injected,
+        "rx": dict(firmware.counters),
+        "watchdog_trips": firmware.watchdog_trips,
+        "safe_state": firmware.safe_state,
+        "replay": firmware.replay.stats(),
+        "prev_act_id": firmware.prev_act_id,
+        "motor_targets": [round(float(v), 4) for v in firmware.motors.target],
+        "motor_velocities": [round(float(v), 4) for v in firmware.motors.velocity],
+        "decision_cache": firmware.decision_cache_stats(),
+        "latency": firmware.timers.snapshot() if firmware.timers.enabled else None,
+    }
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Boreal firmware simulator demo")
+    parser.add_argument("--fast", action="store_true", help="virtual time, as fast as the CPU allows")
+    parser.add_argument(
+        "--duration", type=float,
+        help="simulated seconds (default: run forever, or 3600 with --fast)",
+    )
+    parser.add_argument("--seed", type=int, help="draw intents from a seeded RNG")
+    parser.add_argument("--headless", action="store_true", help="print only the final summary")
+    parser.add_argument("--no-timers", action="store_true", help="disable per-stage latency timers")
+    parser.add_argument(
+        "--stats-every", type=float, metavar="S",
+        help="dump per-stage latency to stderr every S simulated seconds",
+    )
+    parser.add_argument("--stats-format", choices=("text", "json"), default="text")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     firmware = SimulatedFirmware()
+    if args.headless:
+        firmware.set_log_level(logging.ERROR)
+    firmware.timers.enabled = not args.no_timers
 
-    seq = 0
-    while True:
-        # AI Brain: Decide intent
-        intent_id, conf, intent_name = ai_inference()
-        print(f"\nAI Decision: {intent_name} (ID {intent_id}, conf {conf})")
-
-        # Cerebellum: Motion planning (simplified)
-        aux_data = [30]  # Some aux data
-        aux_padded = (aux_data + [0] * 18)[:18]
-
-        # Host: Sign and send packet
-        seq += 1
-        plaintext = struct.pack("<HH18h", intent_id, conf, *aux_padded)
-        ciphertext = chacha20_encrypt(plaintext, CHACHA_KEY, seq, 0)
-
-        header = struct.pack(
-            "<IHHII", 0xB0A1E1A1, 1, 1, seq, int(time.time() * 1000) & 0xFFFFFFFF
-        )
-        payload = header + ciphertext
-
-        mac = firmware.siphash24_sim(payload, firmware.MAC_KEY)
-
-        # To simulate the SPI packet, we unpack it back into 25 independent struct elements
-        # followed by the 8-byte MAC checksum.
-        pkt = list(struct.unpack("<IHHIIHH18hQ", payload + mac.to_bytes(8, "little")))
-
-        # Brainstem: Process in firmware
-        firmware.process_packet(pkt)
-
-        # Update motors and watchdog
-        firmware.update_motors()
-        firmware.update_watchdog()
-
-        time.sleep(0.1)  # 10 Hz demo loop
+    def dump_stats(timers):
+        if args.stats_format == "json":
+            print(json.dumps(timers.snapshot()), file=sys.stderr, flush=True)
+        else:
+            print(timers.format() + "\n", file=sys.stderr, flush=True)
+
+    duration = args.duration
+    if duration is None and args.fast:
+        duration = 3600.0
+    summary = run_simulation(
+        duration, args.seed, realtime=not args.fast, firmware=firmware,
+        stats_every_s=args.stats_every, on_stats=dump_stats,
+    )
+    print(json.dumps(summary, indent=2))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+import heapq
+import time
+
+
+class EventScheduler:
+    """Discrete-event scheduler on a virtual millisecond clock.
+
+    Events run in (time, insertion order), so a run depends only on what
+    was scheduled, never on host speed. By default the clock jumps straight
+    to the next event; with ``realtime=True`` the loop sleeps until each
+    event's wall-clock deadline instead.
+    """
+
+    def __init__(self, start_ms=0, realtime=False):
+        self.now_ms = start_ms
+        self.realtime = realtime
+        self.events = 0
+        self._queue = []
+        self._seq = 0
+
+    def call_at(self, t_ms, fn, *args):
+        heapq.heappush(self._queue, (t_ms, self._seq, fn, args))
+        self._seq += 1
+
+    def call_later(self, delay_ms, fn, *args):
+        self.call_at(self.now_ms + delay_ms, fn, *args)
+
+    def call_every(self, period_ms, fn, *args, start_ms=None):
+        # Re-armed from the scheduled time, so periods never drift
+        def tick(t_ms):
+            fn(*args)
+            self.call_at(t_ms + period_ms, tick, t_ms + period_ms)
+
+        first = self.now_ms if start_ms is None else start_ms
+        self.call_at(first, tick, first)
+
+    def run(self, until_ms=None):
+        """Run events up to and including ``until_ms`` (forever if None)."""
+        queue = self._queue
+        pop = heapq.heappop
+        wall0 = time.monotonic() - self.now_ms / 1000.0
+        while queue:
+            t_ms, _, fn, args = queue[0]
+            if until_ms is not None and t_ms > until_ms:
+                break
+            pop(queue)
+            if self.realtime:
+                delay = wall0 + t_ms / 1000.0 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.now_ms = t_ms
+            fn(*args)
+            self.events += 1
+        if until_ms is not None and until_ms > self.now_ms:
+            self.now_ms = until_ms
+
+    def __len__(self):
+        return len(self._queue)
@@ -1,29 +1,118 @@
 import struct
 
+try:
+    import numpy as np
+except ImportError:  # batch path is optional on the robot
+    np = None
+
+M64 = 0xFFFFFFFFFFFFFFFF
+
 def rotl(x, b): return ((x << b) | (x >> (64 - b))) & 0xFFFFFFFFFFFFFFFF
 
 def siphash24(key: bytes, data: bytes) -> bytes:
+    # Rounds are inlined and all message words are unpacked in one call, so a
+    # frame costs no closure, no per-word slice and no per-word unpack.
     k0, k1 = struct.unpack("<QQ", key)
     v0 = 0x736f6d6570736575 ^ k0; v1 = 0x646f72616e646f6d ^ k1
     v2 = 0x6c7967656e657261 ^ k0; v3 = 0x7465646279746573 ^ k1
 
-    def sipround():
-        nonlocal v0, v1, v2, v3
-        v0=(v0+v1)&0xFFFFFFFFFFFFFFFF; v1=rotl(v1,13); v1^=v0; v0=rotl(v0,32)
-        v2=(v2+v3)&0xFFFFFFFFFFFFFFFF; v3=rotl(v3,16); v3^=v2
-        v0=(v0+v3)&0xFFFFFFFFFFFFFFFF; v3=rotl(v3,21); v3^=v0
-        v2=(v2+v1)&0xFFFFFFFFFFFFFFFF; v1=rotl(v1,17); v1^=v2; v2=rotl(v2,32)
-
     length = len(data)
-    for i in range(0, length - (length % 8), 8):
-        m = struct.unpack("<Q", data[i:i+8])[0]
-        v3 ^= m; sipround(); sipround(); v0 ^= m
-
-    left = length % 8
-    b = (length << 56) & 0xFFFFFFFFFFFFFFFF
+    nwords = length >> 3
+    left = length & 7
+    b = (length << 56) & M64
     if left > 0: b |= int.from_bytes(data[length - left:], 'little')
 
-    v3 ^= b; sipround(); sipround(); v0 ^= b
-    v2 ^= 0xff; sipround(); sipround(); sipround(); sipround()
-    
+    for m in struct.unpack_from("<%dQ" % nwords, data) + (b,):
+        v3 ^= m
+        v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+        v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+        v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+        v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+        v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+        v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+        v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+        v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+        v0 ^= m
+
+    v2 ^= 0xff
+    v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+    v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+    v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+    v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+    v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+    v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+    v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+    v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+    v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+    v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+    v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+    v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+    v0=(v0+v1)&M64; v1=((v1<<13)|(v1>>51))&M64; v1^=v0; v0=((v0<<32)|(v0>>32))&M64
+    v2=(v2+v3)&M64; v3=((v3<<16)|(v3>>48))&M64; v3^=v2
+    v0=(v0+v3)&M64; v3=((v3<<21)|(v3>>43))&M64; v3^=v0
+    v2=(v2+v1)&M64; v1=((v1<<17)|(v1>>47))&M64; v1^=v2; v2=((v2<<32)|(v2>>32))&M64
+
     return struct.pack("<Q", v0 ^ v1 ^ v2 ^ v3)
+
+
+# ---------------------------------------------------------------------------
+# NumPy batch path: one uint64 lane per frame, SIPROUNDs applied to all lanes.
+# ---------------------------------------------------------------------------
+
+def _rotl_np(x, b): return (x << b) | (x >> (64 - b))
+
+def _sipround_np(v):
+    v0, v1, v2, v3 = v
+    v0 += v1; v1 = _rotl_np(v1, 13); v1 ^= v0; v0 = _rotl_np(v0, 32)
+    v2 += v3; v3 = _rotl_np(v3, 16); v3 ^= v2
+    v0 += v3; v3 = _rotl_np(v3, 21); v3 ^= v0
+    v2 += v1; v1 = _rotl_np(v1, 17); v1 ^= v2; v2 = _rotl_np(v2, 32)
+    v[:] = v0, v1, v2, v3
+
+def siphash24_batch(key: bytes, frames):
+    """SipHash-2-4 of N equal-length frames.
+
+    ``frames`` is an ``(N, L)`` uint8 array or a sequence of N bytes objects
+    of length L. Returns an ``(N, 8)`` uint8 array; row ``i`` equals
+    ``siphash24(key, frames[i])``.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for siphash24_batch")
+    if isinstance(frames, np.ndarray):
+        buf = frames
+    else:
+        frames = list(frames)
+        if not frames:
+            return np.empty((0, 8), dtype=np.uint8)
+        width = len(frames[0])
+        if any(len(f) != width for f in frames):
+            raise ValueError("batch frames must all have the same length")
+        buf = np.frombuffer(b"".join(frames), dtype=np.uint8).reshape(len(frames), width)
+    if buf.dtype != np.uint8 or buf.ndim != 2:
+        raise ValueError("frames must be a 2-D uint8 array or equal-length bytes")
+
+    n, length = buf.shape
+    nwords = length >> 3
+    left = length & 7
+    words = np.ascontiguousarray(buf[:, :nwords * 8]).view("<u8").astype(np.uint64)
+
+    b = np.full(n, (length << 56) & M64, dtype=np.uint64)
+    for i in range(left):
+        b |= buf[:, nwords * 8 + i].astype(np.uint64) << (8 * i)
+
+    k0, k1 = struct.unpack("<QQ", key)
+    v = [np.full(n, 0x736f6d6570736575 ^ k0, dtype=np.uint64),
+         np.full(n, 0x646f72616e646f6d ^ k1, dtype=np.uint64),
+         np.full(n, 0x6c7967656e657261 ^ k0, dtype=np.uint64),
+         np.full(n, 0x7465646279746573 ^ k1, dtype=np.uint64)]
+
+    for j in range(nwords + 1):
+        m = words[:, j] if j < nwords else b
+        v[3] ^= m; _sipround_np(v); _sipround_np(v); v[0] ^= m
+
+    v[2] ^= np.uint64(0xff)
+    for _ in range(4):
+        _sipround_np(v)
+
+    out = (v[0] ^ v[1] ^ v[2] ^ v[3]).astype("<u8")
+    return out.view(np.uint8).reshape(n, 8)
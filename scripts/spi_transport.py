@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import os
+import struct
+import time
+
+FRAME_CMD = 0x01
+PKT_LEN = 64
+
+
+class SpiTransport:
+    """Base class for host -> Boreal frame transports.
+
+    Backends implement ``_xfer(buf, nframes)``; the base class times every
+    transfer so wire throughput can be compared across backends and speeds.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.transfers = 0
+        self.frames = 0
+        self.bytes = 0
+        self.busy_ns = 0
+        self.max_ns = 0
+        self.last_ns = 0
+
+    def open(self):
+        return self
+
+    def close(self):
+        pass
+
+    def transfer(self, frame):
+        return self._timed(frame, 1)
+
+    def transfer_many(self, frames):
+        # One transfer for the whole batch; backends may split it further
+        frames = list(frames)
+        if not frames:
+            return None
+        return self._timed(b"".join(frames), len(frames))
+
+    def _timed(self, buf, nframes):
+        t0 = time.perf_counter_ns()
+        rx = self._xfer(buf, nframes)
+        dt = time.perf_counter_ns() - t0
+        self.transfers += 1
+        self.frames += nframes
+        self.bytes += len(buf)
+        self.busy_ns += dt
+        self.last_ns = dt
+        if dt > self.max_ns:
+            self.max_ns = dt
+        return rx
+
+    def _xfer(self, buf, nframes):
+        raise NotImplementedError
+
+    def stats(self):
+        busy_s = self.busy_ns / 1e9
+        return {
+            "transport": self.name,
+            "transfers": self.transfers,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "busy_s": busy_s,
+            "mean_transfer_us": self.busy_ns / self.transfers / 1e3 if self.transfers else 0.0,
+            "max_transfer_us": self.max_ns / 1e3,
+            "frames_per_s": self.frames / busy_s if busy_s else 0.0,
+            "wire_bytes_per_s": self.bytes / busy_s if busy_s else 0.0,
+        }
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SpidevTransport(SpiTransport):
+    name = "spidev"
+
+    # spidev's default bufsiz; larger batches are split into several xfer2 calls
+    MAX_XFER = 4096
+
+    def __init__(self, bus=0, device=0, max_speed_hz=10_000_000, mode=0):
+        super().__init__()
+        self.bus = bus
+        self.device = device
+        self.max_speed_hz = max_speed_hz
+        self.mode = mode
+        self.spi = None
+
+    def open(self):
+        import spidev
+
+        self.spi = spidev.SpiDev()
+        self.spi.open(self.bus, self.device)
+        self.spi.max_speed_hz = self.max_speed_hz
+        self.spi.mode = self.mode
+        return self
+
+    def close(self):
+        if self.spi:
+            self.spi.close()
+            self.spi = None
+
+    def set_speed(self, max_speed_hz):
+        self.max_speed_hz = max_speed_hz
+        if self.spi:
+            self.spi.max_speed_hz = max_speed_hz
+
+    def _xfer(self, buf, nframes):
+        if len(buf) <= self.MAX_XFER:
+            return self.spi.xfer2(buf)
+        # Back-to-back frames in one chip-select; chunk on frame boundaries
+        step = len(buf) // nframes
+        chunk = (self.MAX_XFER // step) * step
+        rx = []
+        for i in range(0, len(buf), chunk):
+            rx += self.spi.xfer2(buf[i : i + chunk])
+        return rx
+
+
+class LoopbackTransport(SpiTransport):
+    """Feeds frames straight into an in-process SimulatedFirmware."""
+
+    name = "loopback"
+
+    def __init__(self, firmware=None):
+        super().__init__()
+        self.firmware = firmware
+
+    def open(self):
+        if self.firmware is None:
+            from run_demo import SimulatedFirmware
+
+            self.firmware = SimulatedFirmware()
+        return self
+
+    def _xfer(self, buf, nframes):
+        # Mirror core 1: only "cmd 0x01, len 64" frames reach the firmware
+        if nframes > 1:
+            self.firmware.process_frames(buf, 2 + PKT_LEN)
+        elif buf[0] == FRAME_CMD and buf[1] == PKT_LEN:
+            self.firmware.process_frame(memoryview(buf)[2:])
+        return None
+
+
+class FileTransport(SpiTransport):
+    """Appends raw SPI frames to a file or named pipe for capture."""
+
+    name = "file"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.fd = None
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _xfer(self, buf, nframes):
+        os.write(self.fd, buf)
+        return None
+
+
+def make_transport(spec="spidev:0.0", **kwargs):
+    """Build a transport from ``spidev[:BUS.DEV]``, ``loopback`` or ``file:PATH``."""
+    kind, _, arg = spec.partition(":")
+    if kind == "spidev":
+        bus, _, dev = (arg or "0.0").partition(".")
+        return SpidevTransport(int(bus), int(dev or 0), **kwargs)
+    if kind == "loopback":
+        return LoopbackTransport(kwargs.get("firmware"))
+    if kind == "file":
+        if not arg:
+            raise ValueError("file transport needs a path: file:PATH")
+        return FileTransport(arg)
+    raise ValueError(f"Unknown transport '{spec}'")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from frame_codec import FrameEncoder
+
+    parser = argparse.ArgumentParser(description="Measure frame throughput per transport")
+    parser.add_argument("transport", nargs="?", default="spidev:0.0")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1, help="frames per transfer")
+    parser.add_argument(
+        "--speeds", type=int, nargs="*", default=[10_000_000],
+        help="max_speed_hz values to sweep (spidev only)",
+    )
+    args = parser.parse_args()
+
+    MAC_KEY = struct.pack("<QQ", 0xA3B1C2D3E4F56789, 0x1020304050607080)
+    CHACHA_KEY = struct.pack(
+        "<8I", 0x01020304, 0x05060708, 0x090A0B0C, 0x0D0E0F10,
+        0x11121314, 0x15161718, 0x191A1B1C, 0x1D1E1F20,
+    )
+    encoder = FrameEncoder(MAC_KEY, CHACHA_KEY)
+
+    for speed in args.speeds if args.transport.startswith("spidev") else [None]:
+        kwargs = {"max_speed_hz": speed} if speed else {}
+        with make_transport(args.transport, **kwargs) as transport:
+            t0 = time.perf_counter()
+            seq = 0
+            while seq < args.frames:
+                batch = []
+                for _ in range(min(args.batch, args.frames - seq)):
+                    seq += 1
+                    batch.append(bytes(encoder.encode(seq, seq * 20, 5, 32767, (0,))))
+                transport.transfer_many(batch)
+            wall = time.perf_counter() - t0
+            stats = transport.stats()
+        label = f"{args.transport} @ {speed} Hz" if speed else args.transport
+        print(
+            f"{label}: {stats['frames'] / wall:.0f} frames/s end-to-end, "
+            f"{stats['frames_per_s']:.0f} frames/s on the wire, "
+            f"{stats['mean_transfer_us']:.1f} us/transfer (max {stats['max_transfer_us']:.1f})"
+        )
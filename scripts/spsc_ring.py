@@ -0,0 +1,83 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stage_timers import LatencyHistogram
+
+
+class SpscRing:
+    """Single-producer/single-consumer frame ring, as RX_Q in firmware/src/main.c.
+
+    ``slots`` preallocated frame buffers indexed by ``w`` (producer) and
+    ``r`` (consumer). As in the firmware, one slot always stays empty: the
+    ring is full when ``(w + 1) % slots == r``, so it holds ``slots - 1``
+    frames and a push onto a full ring drops the new frame. Each side only
+    writes its own index, and the producer publishes ``w`` after the slot
+    is filled, so one producer thread and one consumer thread may run
+    concurrently without a lock.
+
+    Timestamps passed to push()/pop_into() are in seconds and feed the
+    dwell-time histogram; ``depth`` counts the occupancy seen by each push.
+    """
+
+    def __init__(self, slots=8, slot_size=64):
+        if slots < 2:
+            raise ValueError("ring needs at least 2 slots (one is always empty)")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.buf = bytearray(slots * slot_size)
+        self.view = memoryview(self.buf)
+        self.stamp = [0.0] * slots
+        self.w = 0
+        self.r = 0
+        self.pushed = 0
+        self.popped = 0
+        self.drops = 0
+        self.depth = [0] * slots  # occupancy seen by each push attempt
+        self.dwell = LatencyHistogram()  # push -> pop, ns
+
+    def __len__(self):
+        return (self.w - self.r) % self.slots
+
+    def push(self, frame, t=0.0):
+        # Core 1: copy into the write slot, then publish w
+        w = self.w
+        nxt = w + 1 if w + 1 < self.slots else 0
+        self.depth[(w - self.r) % self.slots] += 1
+        if nxt == self.r:
+            self.drops += 1
+            return False
+        off = w * self.slot_size
+        self.view[off : off + self.slot_size] = frame
+        self.stamp[w] = t
+        self.w = nxt
+        self.pushed += 1
+        return True
+
+    def pop_into(self, dst, t=0.0):
+        """Core 0: copy the oldest frame into ``dst`` and free its slot; False if empty."""
+        r = self.r
+        if r == self.w:
+            return False
+        off = r * self.slot_size
+        dst[:] = self.view[off : off + self.slot_size]
+        self.dwell.record(max(0, int((t - self.stamp[r]) * 1e9)))
+        self.r = r + 1 if r + 1 < self.slots else 0
+        self.popped += 1
+        return True
+
+    def stats(self):
+        attempts = sum(self.depth)
+        return {
+            "slots": self.slots,
+            "capacity": self.slots - 1,
+            "pushed": self.pushed,
+            "popped": self.popped,
+            "drops": self.drops,
+            "drop_rate": round(self.drops / attempts, 6) if attempts else 0.0,
+            "max_depth": max((d for d, n in enumerate(self.depth) if n), default=0),
+            "mean_depth": round(sum(d * n for d, n in enumerate(self.depth)) / attempts, 3) if attempts else 0.0,
+            "depth_histogram": list(self.depth),
+            "dwell": self.dwell.summary(),
+        }
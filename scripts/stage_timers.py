@@ -0,0 +1,187 @@
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # binned in pure Python instead
+    np = None
+
+# Log-linear buckets: values below 2**SUB_BITS ns get a bucket each, every
+# power of two above that is split into 2**(SUB_BITS - 1) linear buckets,
+# so a bucket's upper bound is within 12.5% of any value it holds.
+SUB_BITS = 4
+SUB_HALF = 1 << (SUB_BITS - 1)
+MAX_SHIFT = 40  # up to 2**44 ns (~4.9 h); longer samples land in the last bucket
+NUM_BUCKETS = (1 << SUB_BITS) + MAX_SHIFT * SUB_HALF
+PENDING = 4096  # samples buffered per histogram before binning
+
+_now_ns = time.perf_counter_ns
+
+
+def bucket_index(ns):
+    if ns < (1 << SUB_BITS):
+        return max(ns, 0)
+    shift = ns.bit_length() - SUB_BITS
+    if shift > MAX_SHIFT:
+        return NUM_BUCKETS - 1
+    return (1 << SUB_BITS) + (shift - 1) * SUB_HALF + (ns >> shift) - SUB_HALF
+
+
+def bucket_upper(index):
+    # Largest value (ns) that falls into bucket ``index``
+    if index < (1 << SUB_BITS):
+        return index
+    shift, sub = divmod(index - (1 << SUB_BITS), SUB_HALF)
+    shift += 1
+    return ((sub + SUB_HALF + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Fixed-memory log-bucketed histogram of nanosecond samples.
+
+    ``record()`` only appends to a bounded pending buffer; samples are
+    binned PENDING at a time (vectorized when NumPy is available), which
+    keeps the per-sample cost at a list append. Readers fold the pending
+    samples into a copy, so a summary may be taken from another thread.
+    """
+
+    __slots__ = ("counts", "count", "total", "max", "pending")
+
+    def __init__(self):
+        self.reset()
+
+    def record(self, ns):
+        self.pending.append(ns)
+        if len(self.pending) >= PENDING:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, array("q")
+        self._add(pending)
+
+    def _add(self, samples):
+        counts, count, total, peak = self._fold(samples)
+        self.counts, self.count, self.total, self.max = counts, count, total, peak
+
+    def _fold(self, samples):
+        # (counts, count, total, max) with ``samples`` added; self is unchanged
+        counts = self.counts
+        if not samples:
+            return counts, self.count, self.total, self.max
+        if np is not None:
+            ns = np.frombuffer(samples, dtype=np.int64).clip(0, None)
+            shift = np.frexp(ns.astype(np.float64))[1] - SUB_BITS
+            small = shift <= 0
+            shift[small] = 0
+            idx = (1 << SUB_BITS) + (shift - 1) * SUB_HALF + (ns >> shift) - SUB_HALF
+            idx[small] = ns[small]
+            idx[shift > MAX_SHIFT] = NUM_BUCKETS - 1
+            counts = counts + np.bincount(idx, minlength=NUM_BUCKETS).astype(np.uint64)
+            return counts, self.count + len(ns), self.total + int(ns.sum()), max(self.max, int(ns.max()))
+        counts = array("Q", counts)
+        for ns in samples:
+            counts[bucket_index(ns)] += 1
+        return counts, self.count + len(samples), self.total + sum(samples), max(self.max, max(samples))
+
+    def reset(self):
+        self.pending = array("q")
+        self.counts = np.zeros(NUM_BUCKETS, dtype=np.uint64) if np is not None else array("Q", bytes(8 * NUM_BUCKETS))
+        self.count = self.total = self.max = 0
+
+    def summary(self, percentiles=(50, 99, 99.9)):
+        counts, count, total, peak = self._fold(array("q", self.pending))
+        out = {
+            "count": count,
+            "mean_us": round(total / count / 1e3, 3) if count else 0.0,
+        }
+        for q in percentiles:
+            out[f"p{q:g}_us".replace(".", "")] = round(_percentile(counts, count, peak, q) / 1e3, 3)
+        out["max_us"] = round(peak / 1e3, 3)
+        return out
+
+
+def _percentile(counts, count, peak, q):
+    # Upper bound (ns) of the bucket holding the q-th percentile, capped at max
+    if not count:
+        return 0
+    rank = q / 100.0 * count
+    seen = 0
+    for i, c in enumerate(counts.tolist()):
+        seen += c
+        if c and seen >= rank:
+            return min(bucket_upper(i), peak)
+    return peak
+
+
+class StageTimers:
+    """Per-stage latency histograms, switchable at runtime via ``enabled``.
+
+    A pipeline calls ``start()`` and then ``lap(stage)`` after each stage;
+    the time since the previous mark goes into that stage's histogram.
+    Marks are not thread-safe: give each thread that laps its own instance.
+    Callers check ``enabled`` first so a disabled timer costs one attribute
+    test per stage. Work done for a whole batch is recorded once per batch,
+    under its own stage name (``"<stage>/batch"``), never spread over items.
+    """
+
+    def __init__(self, stages=(), enabled=True):
+        self.enabled = enabled
+        self.hists = {stage: LatencyHistogram() for stage in stages}
+        self._t = 0
+
+    def hist(self, stage):
+        h = self.hists.get(stage)
+        if h is None:
+            h = self.hists[stage] = LatencyHistogram()
+        return h
+
+    def start(self):
+        self._t = _now_ns()
+
+    def lap(self, stage):
+        now = _now_ns()
+        h = self.hists.get(stage) or self.hist(stage)
+        h.pending.append(now - self._t)
+        if len(h.pending) >= PENDING:
+            h.flush()
+        self._t = now
+
+    def record(self, stage, ns):
+        self.hist(stage).record(ns)
+
+    def reset(self):
+        for h in self.hists.values():
+            h.reset()
+
+    def export(self):
+        """Compact, picklable state: ``{stage: (counts bytes, count, total, max)}``."""
+        out = {}
+        for stage, h in self.hists.items():
+            counts, count, total, peak = h._fold(array("q", h.pending))
+            out[stage] = (array("Q", counts.tolist()).tobytes(), count, total, peak)
+        return out
+
+    def merge(self, exported):
+        # Add another instance's export() into these histograms
+        for stage, (counts, count, total, peak) in exported.items():
+            h = self.hist(stage)
+            h.flush()
+            merged = array("Q", h.counts.tolist())
+            for i, c in enumerate(array("Q", counts)):
+                merged[i] += c
+            h.counts = np.array(merged, dtype=np.uint64) if np is not None else merged
+            h.count += count
+            h.total += total
+            h.max = max(h.max, peak)
+
+    def snapshot(self):
+        return {stage: h.summary() for stage, h in self.hists.items()}
+
+    def format(self):
+        rows = [f"{'stage':<18}{'count':>10}{'mean':>10}{'p50':>10}{'p99':>10}{'p999':>10}{'max':>10}  (us)"]
+        for stage, s in self.snapshot().items():
+            rows.append(
+                f"{stage:<18}{s['count']:>10}{s['mean_us']:>10.1f}{s['p50_us']:>10.1f}"
+                f"{s['p99_us']:>10.1f}{s['p999_us']:>10.1f}{s['max_us']:>10.1f}"
+            )
+        return "\n".join(rows)
@@ -0,0 +1,143 @@
+import math
+
+
+class Timer:
+    """One timer on a TimerWheel; ``fn(*args)`` runs when it expires.
+
+    ``arm()`` (re)starts it, so petting a watchdog is a single arm() call,
+    and ``every()`` makes it periodic. Both are O(1), as is ``cancel()``.
+    """
+
+    __slots__ = ("wheel", "fn", "args", "tick", "period")
+
+    def __init__(self, wheel, fn, *args):
+        self.wheel = wheel
+        self.fn = fn
+        self.args = args
+        self.tick = None  # expiry, in wheel ticks; None when not armed
+        self.period = None  # ticks, for periodic timers
+
+    @property
+    def pending(self):
+        return self.tick is not None
+
+    @property
+    def deadline_ms(self):
+        return None if self.tick is None else self.tick * self.wheel.tick_ms
+
+    def arm(self, delay_ms):
+        # Expires on the first tick at least delay_ms from now; replaces any earlier arm()
+        self.period = None
+        self.wheel._insert(self, self.wheel.tick + math.ceil(delay_ms / self.wheel.tick_ms))
+
+    def arm_at(self, t_ms):
+        self.period = None
+        self.wheel._insert(self, max(self.wheel.tick, math.ceil(t_ms / self.wheel.tick_ms)))
+
+    def every(self, period_ms, start_ms=None):
+        # Re-armed from the scheduled tick, so periods never drift
+        wheel = self.wheel
+        period = max(1, round(period_ms / wheel.tick_ms))
+        first = wheel.tick if start_ms is None else max(wheel.tick, math.ceil(start_ms / wheel.tick_ms))
+        wheel._insert(self, first)
+        self.period = period
+
+    def cancel(self):
+        if self.tick is not None:
+            self.wheel._remove(self)
+        self.period = None
+
+
+class TimerWheel:
+    """Hashed timer wheel on a millisecond clock.
+
+    A timer due at tick ``t`` hangs in slot ``t % slots``; a bitmap of the
+    non-empty slots lets ``advance()`` jump straight to the next slot that
+    holds anything, so an idle stretch costs nothing however long it is.
+    Timers more than one revolution out share a slot with nearer ones and
+    are skipped until their turn. Timers due on the same tick fire in the
+    order they were armed.
+
+    The wheel has no clock of its own: the owner calls ``advance(now_ms)``
+    whenever time moves (and may sleep until ``next_expiry()``).
+    """
+
+    def __init__(self, slots=256, tick_ms=1, start_ms=0):
+        self.nslots = slots
+        self.tick_ms = tick_ms
+        self.tick = math.floor(start_ms / tick_ms)
+        self.slots = [{} for _ in range(slots)]  # timer -> None, in arm order
+        self.occupied = 0  # bit i set while slots[i] is non-empty
+        self.pending = 0
+        self.fired = 0
+
+    @property
+    def now_ms(self):
+        return self.tick * self.tick_ms
+
+    def timer(self, fn, *args):
+        return Timer(self, fn, *args)
+
+    def _insert(self, timer, tick):
+        if timer.tick is not None:
+            self._remove(timer)
+        i = tick % self.nslots
+        self.slots[i][timer] = None
+        self.occupied |= 1 << i
+        timer.tick = tick
+        self.pending += 1
+
+    def _remove(self, timer):
+        i = timer.tick % self.nslots
+        slot = self.slots[i]
+        del slot[timer]
+        if not slot:
+            self.occupied &= ~(1 << i)
+        timer.tick = None
+        self.pending -= 1
+
+    def _next_tick(self, limit=None):
+        # Earliest armed tick (>= self.tick), or None if there is none up to limit
+        if not self.pending:
+            return None
+        n = self.nslots
+        s0 = self.tick % n
+        bits = ((self.occupied >> s0) | (self.occupied << (n - s0))) & ((1 << n) - 1)
+        while bits:
+            k = (bits & -bits).bit_length() - 1
+            tick = self.tick + k
+            if limit is not None and tick > limit:
+                return None
+            for timer in self.slots[(s0 + k) % n]:
+                if timer.tick == tick:
+                    return tick
+            bits &= bits - 1
+        # Everything armed is at least one revolution away
+        tick = min(t.tick for slot in self.slots for t in slot)
+        return None if limit is not None and tick > limit else tick
+
+    def next_expiry(self):
+        """Time (ms) of the earliest armed timer, or None."""
+        tick = self._next_tick()
+        return None if tick is None else tick * self.tick_ms
+
+    def advance(self, now_ms):
+        """Fire, in deadline order, every timer due at or before ``now_ms``."""
+        target = math.floor(now_ms / self.tick_ms)
+        while True:
+            tick = self._next_tick(target)
+            if tick is None:
+                break
+            self.tick = tick
+            slot = self.slots[tick % self.nslots]
+            for timer in [t for t in slot if t.tick == tick]:
+                if timer.tick != tick:  # cancelled or re-armed by an earlier callback
+                    continue
+                period = timer.period
+                self._remove(timer)
+                if period is not None:
+                    self._insert(timer, tick + period)
+                self.fired += 1
+                timer.fn(*timer.args)
+        if target > self.tick:
+            self.tick = target
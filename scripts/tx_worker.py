@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LatestWinsMailbox:
+    """Bounded mailbox where a newer item replaces a pending one with the same key.
+
+    With the default ``capacity=1`` and a single key every put supersedes the
+    pending command. When full, the oldest pending key is dropped.
+    """
+
+    def __init__(self, capacity=1):
+        self.capacity = max(1, capacity)
+        self.coalesced = 0
+        self.dropped = 0
+        self._slots = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item, key=None):
+        with self._cond:
+            if key in self._slots:
+                self.coalesced += 1
+                self._slots.move_to_end(key)
+            elif len(self._slots) >= self.capacity:
+                self._slots.popitem(last=False)
+                self.dropped += 1
+            self._slots[key] = (time.monotonic(), item)
+            self._cond.notify()
+
+    def wait(self, timeout=None):
+        with self._cond:
+            if not self._slots and not self._closed:
+                self._cond.wait(timeout)
+            return bool(self._slots)
+
+    def pop(self):
+        # Returns (enqueue_time, item) for the oldest pending key, or None
+        with self._cond:
+            if not self._slots:
+                return None
+            return self._slots.popitem(last=False)[1]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._slots)
+
+
+class TransmitWorker:
+    """Drains a LatestWinsMailbox into ``send_fn`` on a dedicated thread.
+
+    Transmissions are spaced at least ``1 / max_rate_hz`` apart; commands that
+    arrive during that gap coalesce in the mailbox so only the freshest one
+    goes out. ``send_fn(*item)`` is only ever called from the worker thread.
+    """
+
+    def __init__(self, send_fn, max_rate_hz=50.0, capacity=1, timers=None):
+        self.send_fn = send_fn
+        self.timers = timers  # optional StageTimers: "queue" wait and "total" per command
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz > 0 else 0.0
+        self.mailbox = LatestWinsMailbox(capacity)
+        self.sent = 0
+        self.errors = 0
+        self.last_error = None
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+        self._next_tx = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="spi-tx", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.mailbox.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, *item, key=None):
+        self.mailbox.put(item, key)
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "coalesced": self.mailbox.coalesced,
+            "dropped": self.mailbox.dropped,
+            "errors": self.errors,
+            "pending": len(self.mailbox),
+            "latency_mean_ms": 1e3 * self.latency_sum / self.sent if self.sent else 0.0,
+            "latency_max_ms": 1e3 * self.latency_max,
+            "latency_last_ms": 1e3 * self.latency_last,
+        }
+
+    def _run(self):
+        while self._running:
+            if not self.mailbox.wait(0.1):
+                continue
+
+            # Hold off until the rate limit allows, letting newer commands coalesce
+            delay = self._next_tx - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            entry = self.mailbox.pop()
+            if entry is None:
+                continue
+
+            t_enqueue, item = entry
+            t_send = time.monotonic()
+            self._next_tx = t_send + self.min_interval
+            try:
+                self.send_fn(*item)
+            except Exception as exc:  # keep the worker alive on SPI errors
+                self.errors += 1
+                self.last_error = exc
+            else:
+                # Only completed transmits count as sent and are timed
+                latency = time.monotonic() - t_enqueue
+                tm = self.timers
+                if tm is not None and tm.enabled:
+                    tm.record("queue", int((t_send - t_enqueue) * 1e9))
+                    tm.record("total", int(latency * 1e9))
+                self.sent += 1
+                self.latency_sum += latency
+                self.latency_last = latency
+                if latency > self.latency_max:
+                    self.latency_max = latency
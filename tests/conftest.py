@@ -0,0 +1,78 @@
+import ctypes
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "policy"))
+sys.path.append(os.path.join(ROOT, "scripts"))
+
+FIRMWARE = os.path.join(ROOT, "firmware")
+
+from compiler import BOUNDS, compile_policy, compile_source  # noqa: E402
+
+
+def random_policy_source(rng, n_rules):
+    # Rules over a few intents with shared thresholds and REQUIRE_PREV chains
+    lines = []
+    for _ in range(n_rules):
+        lines.append(f"IF intent == {rng.randint(0, 6)} AND conf >= {rng.choice([0, 1000, 15000, 20000])}")
+        for _ in range(rng.choice([0, 0, 1, 2])):
+            lines.append(f"REQUIRE_PREV {rng.randint(1, 3)}")
+        act = rng.randint(1, 3)
+        lines.append(f"ACT {act} {rng.randint(*BOUNDS[act])}")
+    lines.append("DEFAULT DENY")
+    return "\n".join(lines)
+
+
+@pytest.fixture(scope="session")
+def policies():
+    """policy.dsl and seeded random policies, in both bytecode layouts.
+
+    Some random policies run past the 32-step budget in the linear layout,
+    so cut-off rules are covered too.
+    """
+    out = {"policy.dsl": compile_policy(os.path.join(ROOT, "policy", "policy.dsl"), dispatch=False)}
+    out["policy.dsl/dispatch"] = compile_policy(os.path.join(ROOT, "policy", "policy.dsl"), dispatch=True)
+    for seed in range(10):
+        source = random_policy_source(random.Random(seed), 3 + 2 * seed)
+        out[f"random{seed}"] = compile_source(source, dispatch=False)
+        out[f"random{seed}/dispatch"] = compile_source(source, dispatch=True)
+    return out
+
+
+@pytest.fixture(scope="session")
+def build_firmware(tmp_path_factory):
+    """Compile firmware/src files into a shared library for ctypes.
+
+    ``build_firmware(["vm.c"], policy_bc=bc)`` builds against a private copy
+    of firmware/include with policy_bin.h regenerated from ``bc``, so every
+    build carries its own policy and its own static VM/gate state. Tests
+    using it are skipped when no C compiler is installed.
+    """
+    cc = shutil.which(os.environ.get("CC", "cc"))
+    if cc is None:
+        pytest.skip("no C compiler")
+
+    def build(sources, policy_bc=None, defines=()):
+        out = tmp_path_factory.mktemp("fw")
+        shutil.copytree(os.path.join(FIRMWARE, "include"), out / "include")
+        if policy_bc is not None:
+            (out / "include" / "policy_bin.h").write_text(
+                f"const uint8_t POLICY_BC[] = {{{', '.join(hex(b) for b in policy_bc)}}};\n"
+                f"const size_t POLICY_LEN = {len(policy_bc)};\n"
+            )
+        os.mkdir(out / "src")
+        srcs = [str(shutil.copy(os.path.join(FIRMWARE, "src", s), out / "src")) for s in sources]
+        lib = str(out / "libfw.so")
+        subprocess.run(
+            [cc, "-shared", "-fPIC", "-O1", "-o", lib, *srcs, *(f"-D{d}" for d in defines)],
+            check=True,
+        )
+        return ctypes.CDLL(lib)
+
+    return build
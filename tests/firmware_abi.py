@@ -0,0 +1,32 @@
+"""ctypes mirrors of the firmware structs in firmware/include/protocol.h."""
+import ctypes
+
+
+class Pkt(ctypes.Structure):
+    _pack_ = 1
+    _fields_ = [
+        ("magic", ctypes.c_uint32), ("version", ctypes.c_uint16), ("model_id", ctypes.c_uint16),
+        ("seq", ctypes.c_uint32), ("t_ms", ctypes.c_uint32), ("intent_id", ctypes.c_uint16),
+        ("conf_q15", ctypes.c_uint16), ("aux", ctypes.c_int16 * 18), ("mac", ctypes.c_uint64),
+    ]
+
+
+class Action(ctypes.Structure):
+    _fields_ = [("act", ctypes.c_uint8), ("v0", ctypes.c_int16)]
+
+
+def replay_window_t(window=64):
+    # replay_window_t as built with -DREPLAY_WINDOW=window
+    words = (window + 31) // 32 + 1
+
+    class ReplayWindow(ctypes.Structure):
+        _fields_ = [
+            ("top", ctypes.c_uint32), ("bitmap", ctypes.c_uint32 * words),
+            ("advances", ctypes.c_uint32), ("duplicates", ctypes.c_uint32),
+            ("too_old", ctypes.c_uint32),
+        ]
+
+    return ReplayWindow
+
+
+assert ctypes.sizeof(Pkt) == 64
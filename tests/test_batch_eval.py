@@ -0,0 +1,44 @@
+import numpy as np
+
+from batch_eval import evaluate_batch
+from policy_vm import run_policy
+
+
+def run_sequential(bc, intent_id, conf_q15, prev):
+    # One reference-VM call per record, prev_act_id carried along
+    acts, values = [], []
+    for i, c in zip(intent_id.tolist(), conf_q15.tolist()):
+        act, v0, new_prev = run_policy(bc, i, c, prev)
+        acts.append(act)
+        values.append(v0)
+        if new_prev is not None:
+            prev = new_prev
+    return acts, values, prev
+
+
+def test_matches_per_record_vm(policies):
+    rng = np.random.default_rng(0)
+    for name, bc in policies.items():
+        intent_id = rng.integers(0, 9, 3000)
+        conf_q15 = rng.choice([0, 999, 1000, 14999, 15000, 20000, 32767, 65535], 3000)
+        for prev in (0, 1, 2, 7):
+            acts, values, final = evaluate_batch(bc, intent_id, conf_q15, prev)
+            expected = run_sequential(bc, intent_id, conf_q15, prev)
+            assert (acts.tolist(), values.tolist(), final) == expected, name
+
+
+def test_chunks_carry_state(policies):
+    # A chunk boundary must not reset prev_act_id
+    rng = np.random.default_rng(1)
+    bc = policies["policy.dsl"]
+    intent_id = rng.choice([2, 3, 5], 1000)
+    conf_q15 = rng.integers(0, 32768, 1000)
+    whole = evaluate_batch(bc, intent_id, conf_q15)
+    chunked = evaluate_batch(bc, intent_id, conf_q15, chunk=7)
+    assert np.array_equal(whole[0], chunked[0]) and np.array_equal(whole[1], chunked[1])
+    assert whole[2] == chunked[2]
+
+
+def test_empty_log(policies):
+    acts, values, prev = evaluate_batch(policies["policy.dsl"], [], [], 3)
+    assert len(acts) == len(values) == 0 and prev == 3
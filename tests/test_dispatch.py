@@ -0,0 +1,68 @@
+import ctypes
+import itertools
+import random
+
+import pytest
+
+from compiler import MAX_STEPS, compile_source
+from firmware_abi import Action, Pkt
+from policy_vm import run_policy
+
+
+def firmware_vm(build_firmware, bc):
+    lib = build_firmware(["vm.c"], policy_bc=bc)
+    lib.decision_vm.restype = Action
+    lib.decision_vm.argtypes = [ctypes.POINTER(Pkt)]
+    return lib
+
+
+def assert_parity(lib, bc, inputs):
+    # prev_act_id lives in vm.c's static state, so the Python side carries it too
+    prev = 0
+    pkt = Pkt()
+    for intent_id, conf_q15 in inputs:
+        pkt.intent_id, pkt.conf_q15 = intent_id, conf_q15
+        out = lib.decision_vm(ctypes.byref(pkt))
+        act, v0, new_prev = run_policy(bc, intent_id, conf_q15, prev)
+        assert (out.act, out.v0) == (act, v0), (intent_id, conf_q15, prev)
+        if new_prev is not None:
+            prev = new_prev
+
+
+def random_inputs(seed, n=400):
+    rng = random.Random(seed)
+    return [(rng.randint(0, 8), rng.choice([0, 999, 1000, 15000, 20000, 32767])) for _ in range(n)]
+
+
+def test_firmware_matches_reference_vm(build_firmware, policies):
+    for name, bc in policies.items():
+        assert_parity(firmware_vm(build_firmware, bc), bc, random_inputs(name))
+
+
+def test_layouts_agree_within_budget(policies):
+    # Where no rule is cut off, the jump table must not change a decision
+    source = "\n".join(
+        f"IF intent == {i} AND conf >= {c}\nACT 2 {i}" for i, c in [(1, 0), (4, 500), (2, 9), (4, 0)]
+    ) + "\nDEFAULT DENY"
+    linear, dispatch = compile_source(source, dispatch=False), compile_source(source, dispatch=True)
+    for intent, conf, prev in itertools.product(range(6), (0, 9, 499, 500), (0, 1, 2)):
+        assert run_policy(linear, intent, conf, prev) == run_policy(dispatch, intent, conf, prev)
+
+
+@pytest.mark.parametrize("bc", [
+    bytes([0x05, 1, 0, 1, 0, 9, 0, 0x50, 0, 0x03, 0xFF]),  # entry past the end
+    bytes([0x05, 1, 0, 1, 0, 0x50, 0, 9, 0, 0x03, 0xFF]),  # default past the end
+    bytes([0x05, 1, 0, 4, 0, 9, 0, 9, 0, 0x03, 0xFF]),  # table runs past the end
+    bytes([0x05, 1, 0]),  # truncated header
+])
+def test_out_of_range_dispatch_denies(build_firmware, bc):
+    lib = firmware_vm(build_firmware, bc)
+    for intent_id in (0, 1, 2, 4):
+        assert run_policy(bc, intent_id, 100, 3) == (0, 0, 0)
+    assert_parity(lib, bc, [(i, 100) for i in range(6)])
+
+
+def test_auto_layout_switch_warns():
+    source = "\n".join(f"IF intent == {i} AND conf >= 0\nACT 1 1" for i in range(MAX_STEPS)) + "\nDEFAULT DENY"
+    with pytest.warns(UserWarning, match="dispatch layout"):
+        assert compile_source(source)[0] == 0x05
@@ -0,0 +1,82 @@
+import ctypes
+import logging
+
+import pytest
+
+from firmware_abi import Action as CAction, Pkt
+from frame_codec import FrameEncoder, Packet
+from run_demo import Action, SimulatedFirmware
+
+STOP, MOVE = 5, 2  # policy.dsl: MOVE needs prev_act_id 0 or STOP
+
+# (t_ms, allowed) for MOVEs in arrival order: a delayed MOVE older than the
+# last one is denied and must not pull the 20 ms window back with it
+MOVES = [
+    (6010, True),
+    (6000, False),
+    (6025, False),
+    (6030, True),
+    (0xFFFFFFF0, False),  # 2^32 - 6030 ms back, not forward
+    (6049, False),
+    (6050, True),
+]
+WRAP = [(0xFFFFFFF0, True), (4, True), (0xFFFFFFFA, False), (10, False), (24, True)]
+
+
+@pytest.fixture
+def firmware():
+    fw = SimulatedFirmware()
+    fw.set_log_level(logging.ERROR)
+    return fw
+
+
+def sim_gate(fw, moves):
+    out = []
+    for t_ms, _ in moves:
+        p = Packet()
+        p.t_ms = t_ms
+        out.append(fw.gate_allow(Action(MOVE, 30), p))
+    return out
+
+
+def firmware_gate(lib, moves):
+    out = []
+    for t_ms, _ in moves:
+        pkt = Pkt()
+        pkt.t_ms = t_ms
+        act = CAction(MOVE, 30)
+        out.append(bool(lib.gate_allow(ctypes.byref(act), ctypes.byref(pkt))))
+    return out
+
+
+@pytest.mark.parametrize("moves", [MOVES, WRAP])
+def test_move_rate_limit(firmware, build_firmware, moves):
+    expected = [allowed for _, allowed in moves]
+    assert sim_gate(firmware, moves) == expected
+    assert firmware_gate(build_firmware(["vm.c"]), moves) == expected
+
+
+def test_first_move_is_allowed_at_any_time(firmware, build_firmware):
+    # Packet time is wall-clock ms truncated to u32, so it may start past 2^31
+    moves = [(0x90000000, True), (0x90000005, False)]
+    assert sim_gate(firmware, moves) == [True, False]
+    assert firmware_gate(build_firmware(["vm.c"]), moves) == [True, False]
+
+
+def test_reordered_frames(firmware):
+    # The replay window accepts seq 2 after seq 4; its MOVE is 10 ms older
+    enc = FrameEncoder(firmware.MAC_KEY, firmware.CHACHA_KEY)
+    sent = {1: (5990, STOP), 2: (6000, MOVE), 3: (6005, STOP), 4: (6010, MOVE),
+            5: (6020, STOP), 6: (6025, MOVE), 7: (6028, STOP), 8: (6030, MOVE)}
+    acts = {}
+    for seq in (1, 4, 3, 2, 5, 6, 7, 8):
+        t_ms, intent = sent[seq]
+        before = firmware.counters["accepted"]
+        act = firmware.process_frame(bytes(enc.encode(seq, t_ms, intent, 32767)))
+        acts[seq] = (act.act, firmware.counters["accepted"] > before)
+
+    assert acts[4] == (MOVE, True)
+    assert acts[2] == (MOVE, False)  # the VM allows it, the gate does not
+    assert acts[6] == (MOVE, False)  # 15 ms after 6010
+    assert acts[8] == (MOVE, True)
+    assert firmware.last_move_ms == 6030
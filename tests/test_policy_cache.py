@@ -0,0 +1,58 @@
+import glob
+import os
+
+import pytest
+
+import compiler
+from compiler import compile_policy, compile_policy_cached, validate_bytecode
+
+POLICY = os.path.join(os.path.dirname(compiler.__file__), "policy.dsl")
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    compiler._memory_cache.clear()
+    yield
+    compiler._memory_cache.clear()
+
+
+def test_compiled_policies_validate():
+    validate_bytecode(compile_policy(POLICY))
+    validate_bytecode(compile_policy(POLICY, dispatch=True))
+
+
+@pytest.mark.parametrize("bc", [
+    b"\x02\x02\x64\x00\x03\xff",  # ACT 2 100: out of BOUNDS
+    b"\x09\x03\xff",  # unknown opcode
+    b"\x01\x01",  # truncated IF
+    b"\x03",  # no END
+    b"\x05\x00\x00\x01\x00\x50\x00\x09\x00\x03\xff",  # default past the end
+    b"\x05\x00\x00\x01\x00\x09\x00\x07\x00\x03\xff",  # target inside the table
+])
+def test_malformed_bytecode_is_rejected(bc):
+    with pytest.raises(ValueError):
+        validate_bytecode(bc)
+
+
+def test_tampered_disk_entry_is_recompiled(tmp_path):
+    expected = compile_policy_cached(POLICY, str(tmp_path))
+    (cache_file,) = glob.glob(str(tmp_path / "*.bin"))
+    with open(cache_file, "wb") as f:
+        f.write(b"\x02\x02\x64\x00\x03\xff")
+    compiler._memory_cache.clear()
+
+    with pytest.warns(UserWarning, match="invalid cached policy"):
+        assert compile_policy_cached(POLICY, str(tmp_path)) == expected
+    with open(cache_file, "rb") as f:
+        assert f.read() == expected
+
+
+def test_memory_cache_is_per_cache_dir_and_bounded(tmp_path, monkeypatch):
+    compile_policy_cached(POLICY, str(tmp_path / "a"))
+    compile_policy_cached(POLICY, str(tmp_path / "b"))
+    assert os.listdir(tmp_path / "b")
+    assert len(compiler._memory_cache) == 2
+
+    monkeypatch.setattr(compiler, "MEMORY_CACHE_ENTRIES", 2)
+    compile_policy_cached(POLICY, str(tmp_path / "c"))
+    assert [k[1] for k in compiler._memory_cache] == [str(tmp_path / "b"), str(tmp_path / "c")]
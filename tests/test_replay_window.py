@@ -0,0 +1,51 @@
+import ctypes
+import random
+
+import pytest
+
+from firmware_abi import replay_window_t
+from replay_window import ReplayWindow
+
+
+def seq_stream(seed, n=5000):
+    # Mostly in order, with reordering, duplicates, stale frames and jumps
+    rng = random.Random(seed)
+    top, out = 0, []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.6:
+            top += rng.randint(1, 3)
+            out.append(top)
+        elif r < 0.8:
+            out.append(max(0, top - rng.randint(0, 80)))
+        elif r < 0.95:
+            out.append(max(0, top - rng.randint(0, 300)))
+        else:
+            top += rng.choice([31, 32, 33, 64, 65, 200, 5000])
+            out.append(top)
+    return out
+
+
+@pytest.mark.parametrize("window", [1, 32, 64, 100])
+def test_matches_firmware(build_firmware, window):
+    lib = build_firmware(["replay_window.c"], defines=[f"REPLAY_WINDOW={window}"])
+    c_window = replay_window_t(window)()
+    lib.replay_init(ctypes.byref(c_window))
+    py_window = ReplayWindow(window)
+
+    for seq in seq_stream(window) + [0, 0xFFFFFFFF, 0xFFFFFFFF, 0xFFFFFFFE, 5]:
+        c_ok = bool(lib.replay_accept(ctypes.byref(c_window), ctypes.c_uint32(seq)))
+        assert py_window.accept(seq) == c_ok, seq
+        assert py_window.top == c_window.top
+    assert (py_window.advances, py_window.duplicates, py_window.too_old) == (
+        c_window.advances, c_window.duplicates, c_window.too_old
+    )
+
+
+def test_window_semantics():
+    w = ReplayWindow(64)
+    assert not w.accept(0)
+    assert w.accept(100) and not w.accept(100)
+    assert w.accept(37) and not w.accept(36)  # 63 behind: in, 64 behind: out
+    assert w.accept(99) and w.accept(101)
+    assert w.stats()["out_of_order"] == 2
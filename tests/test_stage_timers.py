@@ -0,0 +1,29 @@
+from stage_timers import LatencyHistogram, StageTimers, bucket_index, bucket_upper
+
+
+def test_bucket_bounds():
+    for ns in list(range(100)) + [10**k + d for k in range(2, 12) for d in (-1, 0, 1)]:
+        upper = bucket_upper(bucket_index(ns))
+        assert ns <= upper <= ns * 1.125 + 1
+
+
+def test_percentiles_come_from_samples():
+    h = LatencyHistogram()
+    for us in range(1, 1001):
+        h.record(us * 1000)
+    s = h.summary()
+    assert s["count"] == 1000
+    assert 500 <= s["p50_us"] <= 500 * 1.125
+    assert 990 <= s["p99_us"] <= 1000
+    assert s["max_us"] == 1000.0
+
+
+def test_merge_adds_exports():
+    a, b = StageTimers(("vm",)), StageTimers(("vm",))
+    a.record("vm", 1000)
+    b.record("vm", 3000)
+    b.record("vm/batch", 50000)
+    a.merge(b.export())
+    snap = a.snapshot()
+    assert snap["vm"]["count"] == 2 and snap["vm"]["max_us"] == 3.0
+    assert snap["vm/batch"]["count"] == 1
@@ -0,0 +1,99 @@
+import itertools
+
+from policy_vm import policy_conditions, run_policy
+from verifier import CONF_MAX, decision_map, diff_policies, reachable_acts
+
+PREVS = list(range(9)) + [255]
+
+
+def sample_inputs(*policies):
+    # Every named intent plus unnamed ones, every threshold and its neighbours
+    conds, req_acts = {}, set()
+    for bc in policies:
+        c, r = policy_conditions(bc)
+        for intent, thresholds in c.items():
+            conds.setdefault(intent, set()).update(thresholds)
+        req_acts |= r
+    confs = {0, 1, 12345, CONF_MAX}
+    for t in set().union(*conds.values()):
+        confs.update(x for x in (t - 1, t, t + 1) if 0 <= x <= CONF_MAX)
+    intents = sorted(set(range(9)) | set(conds) | {0xFFFF})
+    return itertools.product(intents, sorted(confs), PREVS)
+
+
+def covers(region_intent, region_prevs, named, req_acts, intent, prev):
+    if region_intent is None and intent in named or region_intent not in (None, intent):
+        return False
+    if region_prevs is None or prev in region_prevs:
+        return True
+    return None in region_prevs and prev not in req_acts
+
+
+def test_decision_map_matches_brute_force(policies):
+    for name, bc in policies.items():
+        conds, req_acts = policy_conditions(bc)
+        req_acts = req_acts | {0}
+        regions = decision_map(bc)
+        for intent, conf, prev in sample_inputs(bc):
+            hits = [
+                r for r in regions
+                if r.conf_lo <= conf <= r.conf_hi and covers(r.intent, r.prevs, conds, req_acts, intent, prev)
+            ]
+            assert len(hits) == 1, (name, intent, conf, prev)
+            r = hits[0]
+            assert (r.act, r.v0, r.next_prev) == run_policy(bc, intent, conf, prev), (name, intent, conf, prev)
+
+
+def brute_force_reachable(bc, start_prev, avoid, inputs):
+    seen, found, frontier = {start_prev}, set(), [start_prev]
+    while frontier:
+        nxt = []
+        for prev in frontier:
+            for intent, conf in inputs:
+                act, _, new_prev = run_policy(bc, intent, conf, prev)
+                if act in avoid:
+                    continue
+                found.add(act)
+                state = prev if new_prev is None else new_prev
+                if state not in seen:
+                    seen.add(state)
+                    nxt.append(state)
+        frontier = nxt
+    return found
+
+
+def test_reachable_acts_matches_brute_force(policies):
+    for name, bc in policies.items():
+        inputs = sorted({(i, c) for i, c, _ in sample_inputs(bc)})
+        for start_prev, avoid in itertools.product((0, 1, 2, 9), ((), (1,), (1, 3))):
+            found = reachable_acts(bc, start_prev, avoid)
+            assert set(found) == brute_force_reachable(bc, start_prev, set(avoid), inputs), name
+            for act, path in found.items():
+                # Each witness replays to its act without an avoided act on the way
+                prev = start_prev
+                for intent, conf in path:
+                    got, _, new_prev = run_policy(bc, intent, conf, prev)
+                    assert got not in avoid
+                    prev = prev if new_prev is None else new_prev
+                assert got == act, (name, act, path)
+
+
+def test_diff_policies_matches_brute_force(policies):
+    names = sorted(policies)
+    for old_name, new_name in zip(names, names[1:]):
+        old, new = policies[old_name], policies[new_name]
+        conds, req_acts = policy_conditions(old)
+        conds2, req_acts2 = policy_conditions(new)
+        named = set(conds) | set(conds2)
+        req_acts = req_acts | req_acts2 | {0}
+        changes = diff_policies(old, new)
+        for intent, conf, prev in sample_inputs(old, new):
+            hits = [
+                c for c in changes
+                if c.conf_lo <= conf <= c.conf_hi and covers(c.intent, c.prevs, named, req_acts, intent, prev)
+            ]
+            before, after = run_policy(old, intent, conf, prev), run_policy(new, intent, conf, prev)
+            if before == after:
+                assert not hits, (old_name, new_name, intent, conf, prev)
+            else:
+                assert [(c.old, c.new) for c in hits] == [(before, after)], (old_name, new_name, intent, conf, prev)